@@ -2,15 +2,33 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import Config
-from utils.database import db
+from utils.database import db, normalize_database_uri, engine_options, configure_engine
 import os
 
-def create_app(config_class=Config):
+# config, database and migrations only: command-line scripts use this so they
+# neither start background workers nor touch the serving processes' grading jobs
+def create_cli_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     
     db.init_app(app)
     
+    # create database tables and run migrations
+    import model  # registers the tables before create_all
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        # a failed migration stops startup instead of serving on a half-migrated schema
+        from utils.migrations import create_tables, run_migrations
+        create_tables()
+        run_migrations()
+    
+    return app
+
+def create_app(config_class=Config):
+    app = create_cli_app(config_class)
+    
     # Configure CORS to connect frontend and backend 
     CORS(
         app,
@@ -21,28 +39,94 @@ def create_app(config_class=Config):
         ],
         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
         allow_headers=['Content-Type', 'Authorization', 'X-Requested-With'],
+        expose_headers=['ETag', 'Link', 'X-Next-Cursor'],
         supports_credentials=True,
         max_age=86400
     )
     
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
-    # register blueprints
-    from routes import auth_bp, exam_bp, answer_bp, proctoring_bp, transcript_bp
-    app.register_blueprint(auth_bp, url_prefix='/api')
-    app.register_blueprint(exam_bp, url_prefix='/api')
-    app.register_blueprint(answer_bp, url_prefix='/api')
-    app.register_blueprint(proctoring_bp, url_prefix='/api')
-    app.register_blueprint(transcript_bp, url_prefix='/api')
+    # register the configured blueprints; routes not served here are never imported
+    from routes import load_blueprint
+    from routes.health import health_bp
+    for name in app.config['APP_BLUEPRINTS']:
+        app.register_blueprint(load_blueprint(name), url_prefix='/api')
+    app.register_blueprint(health_bp)
     
-    # create database tables and run migrations
+    # only the extensions (and background threads) the served blueprints use
+    blueprints = set(app.config['APP_BLUEPRINTS'])
     with app.app_context():
-        db.create_all()
-        from utils.database import ensure_answer_finalized_column
-        try:
-            ensure_answer_finalized_column()
-        except Exception as e:
-            print(f"Startup migration helper error: {e}")
+        # ordered question lists per exam
+        if blueprints & {'exam', 'answer'}:
+            from utils.exam_cache import ExamContentCache
+            app.extensions['exam_cache'] = ExamContentCache()
+
+        # proctoring event store + suspicion aggregator; answer flushes it when an attempt finishes
+        if blueprints & {'proctoring', 'answer'}:
+            from utils.proctoring_events import ProctoringMonitor
+            app.extensions['proctoring_monitor'] = ProctoringMonitor(
+                decay=app.config['PROCTOR_SUSPICION_DECAY'],
+                flag_threshold=app.config['PROCTOR_FLAG_THRESHOLD'],
+                min_interval_ms=app.config['PROCTOR_INTERVAL_MIN_MS'],
+                max_interval_ms=app.config['PROCTOR_INTERVAL_MAX_MS'],
+                flush_size=app.config['PROCTOR_EVENT_FLUSH_SIZE'],
+                flush_seconds=app.config['PROCTOR_EVENT_FLUSH_SECONDS']
+            )
+
+        if blueprints & {'transcript', 'answer'}:
+            # open speech-to-text streams for /transcript/audio
+            from utils.audio_stream import AudioStreamRegistry
+            app.extensions['audio_streams'] = AudioStreamRegistry(app.config['STREAM_IDLE_TIMEOUT_SECONDS'])
+
+            # coalesced /transcript/append writes; recover fragments a crashed worker journaled
+            from utils.transcript_buffer import TranscriptBuffer
+            app.extensions['transcript_buffer'] = TranscriptBuffer(
+                app,
+                durability=app.config['TRANSCRIPT_DURABILITY'],
+                flush_interval_ms=app.config['TRANSCRIPT_FLUSH_INTERVAL_MS'],
+                flush_max_fragments=app.config['TRANSCRIPT_FLUSH_MAX_FRAGMENTS'],
+                journal_dir=app.config['TRANSCRIPT_JOURNAL_DIR'],
+                journal_compact_bytes=app.config['TRANSCRIPT_JOURNAL_COMPACT_BYTES'],
+                journal_fsync=app.config['TRANSCRIPT_JOURNAL_FSYNC']
+            )
+            try:
+                app.extensions['transcript_buffer'].replay_journals()
+            except Exception as e:
+                print(f"Transcript journal replay error: {e}")
+
+        if 'answer' in blueprints:
+            # answer audio storage, background transcoding and retention
+            from utils.audio_store import create_audio_store
+            from utils.audio_maintenance import AudioMaintenance
+            app.extensions['audio_store'] = create_audio_store(app.config)
+            app.extensions['audio_maintenance'] = AudioMaintenance(
+                app,
+                app.extensions['audio_store'],
+                codec=app.config['AUDIO_TRANSCODE'],
+                opus_bitrate=app.config['AUDIO_OPUS_BITRATE'],
+                retention_days=app.config['AUDIO_RETENTION_DAYS'],
+                sweep_seconds=app.config['AUDIO_RETENTION_SWEEP_SECONDS']
+            )
+
+            # background grading workers; pick up jobs interrupted by a restart
+            from utils.grading_queue import GradingQueue
+            app.extensions['grading_queue'] = GradingQueue(
+                app,
+                max_workers=app.config['GRADING_MAX_WORKERS'],
+                max_attempts=app.config['GRADING_MAX_ATTEMPTS'],
+                retry_delay=app.config['GRADING_RETRY_DELAY_SECONDS'],
+                lease_seconds=app.config['GRADING_LEASE_SECONDS']
+            )
+            try:
+                app.extensions['grading_queue'].resume_pending()
+            except Exception as e:
+                print(f"Grading queue resume error: {e}")
+
+        # load (and with 'eager' / 'background' exercise) the models the served routes use;
+        # /healthz reports ready once this has finished
+        from utils.warmup import Warmup
+        app.extensions['warmup'] = Warmup(app, app.config['STARTUP_WARMUP'], app.config['APP_BLUEPRINTS'])
+        app.extensions['warmup'].start()
     
     return app
 
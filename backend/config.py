@@ -4,5 +4,93 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-change-this'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///speakeval.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = 'uploads'
-    EVAL_SIMILARITY_THRESHOLD = float(os.environ.get("EVAL_SIMILARITY_THRESHOLD", "0.80"))
\ No newline at end of file
+    # SQLite profile: applied on every new connection
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # Postgres profile: connection pool
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+    UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
+    AUDIO_STORE = os.environ.get("AUDIO_STORE", "local")  # 'local', 's3'
+    AUDIO_S3_BUCKET = os.environ.get("AUDIO_S3_BUCKET")
+    AUDIO_S3_PREFIX = os.environ.get("AUDIO_S3_PREFIX", "answers/")
+    AUDIO_S3_ENDPOINT_URL = os.environ.get("AUDIO_S3_ENDPOINT_URL")
+    AUDIO_S3_REGION = os.environ.get("AUDIO_S3_REGION")
+    AUDIO_CHUNK_BYTES = int(os.environ.get("AUDIO_CHUNK_BYTES", "65536"))
+    AUDIO_MAX_BYTES = int(os.environ.get("AUDIO_MAX_BYTES", str(50 * 1024 * 1024)))
+    AUDIO_TRANSCODE = os.environ.get("AUDIO_TRANSCODE", "flac")  # 'flac', 'opus', 'none'
+    AUDIO_OPUS_BITRATE = os.environ.get("AUDIO_OPUS_BITRATE", "24k")
+    AUDIO_FFMPEG_BIN = os.environ.get("AUDIO_FFMPEG_BIN", "ffmpeg")
+    AUDIO_RETENTION_DAYS = float(os.environ.get("AUDIO_RETENTION_DAYS", "0"))  # 0 keeps audio forever
+    AUDIO_RETENTION_SWEEP_SECONDS = float(os.environ.get("AUDIO_RETENTION_SWEEP_SECONDS", "3600"))
+    EVAL_SIMILARITY_THRESHOLD = float(os.environ.get("EVAL_SIMILARITY_THRESHOLD", "0.80"))
+    LEXICAL_PREFILTER = os.environ.get("LEXICAL_PREFILTER", "1") == "1"
+    SBERT_MODEL_NAME = os.environ.get("SBERT_MODEL_NAME", "all-MiniLM-L6-v2")
+    EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "2048"))
+    EMBEDDING_CACHE_PERSIST = os.environ.get("EMBEDDING_CACHE_PERSIST", "1") == "1"
+    SCORING_MAX_BATCH_SIZE = int(os.environ.get("SCORING_MAX_BATCH_SIZE", "32"))
+    SCORING_MAX_WAIT_MS = float(os.environ.get("SCORING_MAX_WAIT_MS", "5"))
+    SCORING_TIMEOUT_SECONDS = float(os.environ.get("SCORING_TIMEOUT_SECONDS", "30"))
+    GRADING_MAX_WORKERS = int(os.environ.get("GRADING_MAX_WORKERS", "4"))
+    GRADING_MAX_ATTEMPTS = int(os.environ.get("GRADING_MAX_ATTEMPTS", "3"))
+    GRADING_RETRY_DELAY_SECONDS = float(os.environ.get("GRADING_RETRY_DELAY_SECONDS", "2"))
+    GRADING_LEASE_SECONDS = float(os.environ.get("GRADING_LEASE_SECONDS", "600"))
+    STT_BACKEND = os.environ.get("STT_BACKEND", "google")  # 'google', 'vosk', 'whisper_cpp'
+    STT_MODEL_PATH = os.environ.get("STT_MODEL_PATH")
+    STT_POOL_SIZE = int(os.environ.get("STT_POOL_SIZE", "2"))
+    STT_LANGUAGE = os.environ.get("STT_LANGUAGE", "en-US")
+    STT_PRELOAD = os.environ.get("STT_PRELOAD", "1") == "1"
+    STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "preload")  # 'none', 'preload', 'eager', 'background'
+    APP_BLUEPRINTS = [name.strip() for name in os.environ.get(
+        "APP_BLUEPRINTS", "auth,exam,answer,proctoring,transcript").split(",") if name.strip()]
+    AUDIO_PREPROCESS = os.environ.get("AUDIO_PREPROCESS", "1") == "1"
+    AUDIO_TARGET_SAMPLE_RATE = int(os.environ.get("AUDIO_TARGET_SAMPLE_RATE", "16000"))
+    AUDIO_TARGET_DBFS = float(os.environ.get("AUDIO_TARGET_DBFS", "-20"))
+    AUDIO_VAD_MARGIN_DB = float(os.environ.get("AUDIO_VAD_MARGIN_DB", "12"))
+    AUDIO_VAD_FLOOR_DBFS = float(os.environ.get("AUDIO_VAD_FLOOR_DBFS", "-50"))
+    AUDIO_VAD_MAX_GAIN_DB = float(os.environ.get("AUDIO_VAD_MAX_GAIN_DB", "40"))
+    AUDIO_VAD_PAD_MS = float(os.environ.get("AUDIO_VAD_PAD_MS", "200"))
+    AUDIO_VAD_MAX_PAUSE_MS = float(os.environ.get("AUDIO_VAD_MAX_PAUSE_MS", "400"))
+    INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "local")  # 'local' or 'remote' (serve_inference.py)
+    INFERENCE_URL = os.environ.get("INFERENCE_URL", "http://127.0.0.1:5100")
+    INFERENCE_TIMEOUT_SECONDS = float(os.environ.get("INFERENCE_TIMEOUT_SECONDS", "30"))
+    INFERENCE_MAX_IN_FLIGHT = int(os.environ.get("INFERENCE_MAX_IN_FLIGHT", "16"))
+    INFERENCE_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("INFERENCE_QUEUE_TIMEOUT_SECONDS", "5"))
+    INFERENCE_RETRY_AFTER_SECONDS = int(os.environ.get("INFERENCE_RETRY_AFTER_SECONDS", "2"))
+    INFERENCE_HOST = os.environ.get("INFERENCE_HOST", "127.0.0.1")
+    INFERENCE_PORT = int(os.environ.get("INFERENCE_PORT", "5100"))
+    INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))  # 0 = one per CPU
+    INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "64"))
+    INFERENCE_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("INFERENCE_REQUEST_TIMEOUT_SECONDS", "25"))
+    INFERENCE_TORCH_THREADS = int(os.environ.get("INFERENCE_TORCH_THREADS", "1"))
+    INFERENCE_PRELOAD = os.environ.get("INFERENCE_PRELOAD", "1") == "1"
+    STREAM_SEGMENT_SECONDS = float(os.environ.get("STREAM_SEGMENT_SECONDS", "5"))
+    STREAM_IDLE_TIMEOUT_SECONDS = float(os.environ.get("STREAM_IDLE_TIMEOUT_SECONDS", "120"))
+    STREAM_READ_BYTES = int(os.environ.get("STREAM_READ_BYTES", "32768"))
+    PROCTOR_POOL_SIZE = int(os.environ.get("PROCTOR_POOL_SIZE", "2"))
+    PROCTOR_BATCH_MAX = int(os.environ.get("PROCTOR_BATCH_MAX", "16"))
+    PROCTOR_BATCH_WAIT_MS = float(os.environ.get("PROCTOR_BATCH_WAIT_MS", "20"))
+    PROCTOR_SUSPICION_DECAY = float(os.environ.get("PROCTOR_SUSPICION_DECAY", "0.8"))
+    PROCTOR_FLAG_THRESHOLD = float(os.environ.get("PROCTOR_FLAG_THRESHOLD", "4.0"))
+    PROCTOR_INTERVAL_MIN_MS = int(os.environ.get("PROCTOR_INTERVAL_MIN_MS", "1000"))
+    PROCTOR_INTERVAL_MAX_MS = int(os.environ.get("PROCTOR_INTERVAL_MAX_MS", "15000"))
+    PROCTOR_EVENT_FLUSH_SIZE = int(os.environ.get("PROCTOR_EVENT_FLUSH_SIZE", "200"))
+    PROCTOR_EVENT_FLUSH_SECONDS = float(os.environ.get("PROCTOR_EVENT_FLUSH_SECONDS", "5"))
+    EXAMS_PAGE_SIZE = int(os.environ.get("EXAMS_PAGE_SIZE", "50"))
+    EXAMS_PAGE_MAX = int(os.environ.get("EXAMS_PAGE_MAX", "200"))
+    ANALYTICS_SUMMARY_TABLES = os.environ.get("ANALYTICS_SUMMARY_TABLES", "1") == "1"
+    ANALYTICS_PASS_RATIO = float(os.environ.get("ANALYTICS_PASS_RATIO", "0.5"))
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "500"))
+    TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+    TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "300"))
+    TRANSCRIPT_DURABILITY = os.environ.get("TRANSCRIPT_DURABILITY", "journal")
+    TRANSCRIPT_FLUSH_INTERVAL_MS = float(os.environ.get("TRANSCRIPT_FLUSH_INTERVAL_MS", "2000"))
+    TRANSCRIPT_FLUSH_MAX_FRAGMENTS = int(os.environ.get("TRANSCRIPT_FLUSH_MAX_FRAGMENTS", "8"))
+    TRANSCRIPT_JOURNAL_DIR = os.environ.get("TRANSCRIPT_JOURNAL_DIR", "transcript_journal")
+    TRANSCRIPT_JOURNAL_FSYNC = os.environ.get("TRANSCRIPT_JOURNAL_FSYNC", "1") == "1"
+    TRANSCRIPT_JOURNAL_COMPACT_BYTES = int(os.environ.get("TRANSCRIPT_JOURNAL_COMPACT_BYTES", "1048576"))
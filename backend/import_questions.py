@@ -0,0 +1,55 @@
+import argparse
+import sys
+
+from app import create_cli_app
+from model import Exam, User
+from utils.content_version import EXAMS, bump_version
+from utils.database import db
+from utils.question_import import detect_format, import_questions
+
+# python import_questions.py bank.csv --exam-id 3
+# python import_questions.py bank.jsonl --title "Biology" --duration 30 --educator educator@example.com
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-import a CSV/JSONL question bank')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'jsonl'])
+    parser.add_argument('--exam-id', type=int)
+    parser.add_argument('--title')
+    parser.add_argument('--description', default='')
+    parser.add_argument('--duration', type=int, default=30)
+    parser.add_argument('--educator', help='educator email, required with --title')
+    parser.add_argument('--chunk-size', type=int)
+    parser.add_argument('--no-embed', action='store_true', help='skip expected-answer embeddings')
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        sys.exit('Cannot tell the file format; pass --format csv|jsonl')
+
+    app = create_cli_app()
+    with app.app_context():
+        if args.exam_id:
+            exam = db.session.get(Exam, args.exam_id)
+            if exam is None:
+                sys.exit(f"Exam {args.exam_id} not found")
+        else:
+            educator = User.query.filter_by(email=args.educator or '', role='educator').first()
+            if not args.title or educator is None:
+                sys.exit('Pass --exam-id, or --title with an existing --educator email')
+            exam = Exam(title=args.title, description=args.description,
+                        educator_id=educator.id, duration_minutes=args.duration)
+            db.session.add(exam)
+            bump_version(EXAMS)
+            db.session.commit()
+
+        with open(args.path, 'rb') as f:
+            summary = import_questions(exam.id, f, fmt,
+                                       args.chunk_size or app.config['IMPORT_CHUNK_SIZE'],
+                                       embed=not args.no_embed)
+
+    print(f"Imported {summary['imported']} questions into exam {summary['exam_id']}, skipped {summary['skipped']}")
+    for err in summary['errors']:
+        print(f"  line {err['line']}: {err['error']}")
+
+if __name__ == '__main__':
+    main()
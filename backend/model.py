@@ -17,6 +17,10 @@ class Exam(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_active = db.Column(db.Boolean, default=True)
 
+    __table_args__ = (
+        db.Index('ix_exam_educator_active', 'educator_id', 'is_active'),
+    )
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
@@ -24,6 +28,11 @@ class Question(db.Model):
     expected_answer = db.Column(db.Text, nullable=False)
     points = db.Column(db.Integer, default=10)
     order = db.Column(db.Integer, nullable=False)
+    scoring_policy = db.Column(db.Text)  # JSON, see utils/scoring_policy.py; NULL = global threshold
+
+    __table_args__ = (
+        db.Index('ix_question_exam_order', 'exam_id', 'order'),
+    )
 
 class ExamAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,6 +42,12 @@ class ExamAttempt(db.Model):
     completed_at = db.Column(db.DateTime)
     total_score = db.Column(db.Float)
     status = db.Column(db.String(20), default='in_progress')  # 'in_progress', 'completed', 'flagged'
+    suspicion_score = db.Column(db.Float, default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_exam_attempt_student', 'student_id'),
+        db.Index('ix_exam_attempt_exam_status', 'exam_id', 'status'),
+    )
 class Answer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     attempt_id = db.Column(db.Integer, db.ForeignKey('exam_attempt.id'), nullable=False)
@@ -42,4 +57,71 @@ class Answer(db.Model):
     similarity_score = db.Column(db.Float)
     points_awarded = db.Column(db.Integer)
     finalized = db.Column(db.Boolean, default=False)
+    audio_seconds = db.Column(db.Float)   # length of the uploaded recording
+    speech_seconds = db.Column(db.Float)  # what was left for speech-to-text after silence trimming
+    late_text = db.Column(db.Text)  # transcript fragments flushed after the answer was graded
+    scored_by = db.Column(db.String(16))  # grading tier that decided it: exact/token/empty/semantic
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # one answer row per question per attempt; backs the get-or-create upsert
+    __table_args__ = (
+        db.Index('uq_answer_attempt_question', 'attempt_id', 'question_id', unique=True),
+        db.Index('ix_answer_question_finalized', 'question_id', 'finalized'),
+    )
+
+# persisted expected-answer embedding (sidecar to Question, one row per question)
+class QuestionEmbedding(db.Model):
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    answer_hash = db.Column(db.String(64), nullable=False)
+    model_name = db.Column(db.String(100), nullable=False)
+    dim = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+# background grading of an uploaded audio answer (see utils/grading_queue.py)
+class GradingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    answer_id = db.Column(db.Integer, db.ForeignKey('answer.id'), nullable=False)
+    audio_file_path = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # 'queued', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    owner = db.Column(db.String(64))  # GradingQueue that claimed the running job
+    lease_until = db.Column(db.DateTime)  # a running job past its lease is requeued at startup
+    last_error = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+# append-only proctoring verdicts; flags is a bitmask (see utils/proctoring_events.py)
+class ProctoringEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('exam_attempt.id'), nullable=False, index=True)
+    flags = db.Column(db.SmallInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+# logged-out tokens, kept until they would have expired (see utils/token_cache.py)
+class RevokedToken(db.Model):
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+# change counters for cached content: 'exams' backs the GET /exams ETag, 'exam:<id>' utils/exam_cache.py
+class ContentVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# running totals over finished attempts of an exam, kept in step by utils/analytics.py
+class ExamStats(db.Model):
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), primary_key=True)
+    finished = db.Column(db.Integer, nullable=False, default=0)
+    flagged = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    duration_sum = db.Column(db.Float, nullable=False, default=0.0)
+    duration_count = db.Column(db.Integer, nullable=False, default=0)
+    max_points = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+# score histogram of finished attempts; bucket b covers [10b%, 10(b+1)%) of max points
+class ExamScoreBucket(db.Model):
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), primary_key=True)
+    bucket = db.Column(db.SmallInteger, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
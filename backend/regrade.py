@@ -0,0 +1,57 @@
+import argparse
+import json
+
+from app import create_cli_app
+from utils.regrade import regrade
+
+# python regrade.py --dry-run                      # what a re-grade would change
+# python regrade.py --threshold 0.6 --rescore-only # new threshold, keep stored similarities
+# python regrade.py --model all-mpnet-base-v2 --workers 4
+def main():
+    parser = argparse.ArgumentParser(description='Re-grade finalized answers')
+    parser.add_argument('--exam-id', type=int)
+    parser.add_argument('--threshold', type=float, help='defaults to EVAL_SIMILARITY_THRESHOLD')
+    parser.add_argument('--model', help='SBERT model to score with; defaults to SBERT_MODEL_NAME')
+    parser.add_argument('--rescore-only', action='store_true', help='re-apply the threshold to stored similarities')
+    parser.add_argument('--no-lexical', action='store_true', help='score every answer with SBERT')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing them')
+    parser.add_argument('--show', type=int, default=20, help='diff rows to print')
+    args = parser.parse_args()
+
+    app = create_cli_app()
+    with app.app_context():
+        threshold = args.threshold if args.threshold is not None else app.config['EVAL_SIMILARITY_THRESHOLD']
+        model_name = args.model or app.config['SBERT_MODEL_NAME']
+        model = None
+        if not args.rescore_only and args.workers <= 1:
+            if model_name == app.config['SBERT_MODEL_NAME']:
+                from service import _get_sbert
+                model = _get_sbert()
+            else:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_name)
+        lexical = None
+        if app.config['LEXICAL_PREFILTER'] and not args.no_lexical:
+            from service import _get_lexical_prefilter
+            lexical = _get_lexical_prefilter()
+
+        summary = regrade(
+            model=model, model_name=model_name, threshold=threshold, exam_id=args.exam_id,
+            chunk_size=args.chunk_size, workers=args.workers, dry_run=args.dry_run,
+            rescore_only=args.rescore_only, lexical=lexical,
+            progress=lambda s: print(f"\rscanned {s['scanned']}, changed {s['changed']}", end='', flush=True)
+        )
+
+    print()
+    for diff in summary['diffs'][:args.show]:
+        print(json.dumps(diff))
+    verb = 'would change' if args.dry_run else 'changed'
+    print(f"{summary['scanned']} answers scanned; {verb} {summary['changed']} answers, "
+          f"{summary['attempts']} attempt totals, {summary['points_delta']:+d} points overall")
+    if not args.dry_run and args.model and args.model != app.config['SBERT_MODEL_NAME']:
+        print(f"Set SBERT_MODEL_NAME={args.model} so live grading matches the re-graded scores")
+
+if __name__ == '__main__':
+    main()
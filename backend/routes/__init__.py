@@ -1,7 +1,26 @@
-from .auth import auth_bp
-from .exam import exam_bp
-from .answer import answer_bp
-from .proctoring import proctoring_bp
-from .transcript import transcript_bp
+# blueprints are imported on demand so a pod serving a subset (Config.APP_BLUEPRINTS)
+# never imports the dependencies of the routes it does not serve
+from importlib import import_module
 
-__all__ = ['auth_bp', 'exam_bp', 'answer_bp', 'proctoring_bp', 'transcript_bp']
+BLUEPRINTS = {
+    'auth': ('.auth', 'auth_bp'),
+    'exam': ('.exam', 'exam_bp'),
+    'answer': ('.answer', 'answer_bp'),
+    'proctoring': ('.proctoring', 'proctoring_bp'),
+    'transcript': ('.transcript', 'transcript_bp'),
+}
+
+def load_blueprint(name):
+    if name not in BLUEPRINTS:
+        raise ValueError(f"Unknown blueprint '{name}' (choose from {', '.join(BLUEPRINTS)})")
+    module, attr = BLUEPRINTS[name]
+    return getattr(import_module(module, __name__), attr)
+
+# keeps `from routes import auth_bp` working
+def __getattr__(attr):
+    for name, (_, bp_attr) in BLUEPRINTS.items():
+        if bp_attr == attr:
+            return load_blueprint(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
+
+__all__ = ['auth_bp', 'exam_bp', 'answer_bp', 'proctoring_bp', 'transcript_bp', 'load_blueprint']
@@ -1,30 +1,49 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
-from model import ExamAttempt, Question, Answer
-from service import verify_token
-from service import semantic_similarity, award_points
-from service import speech_to_text
+from flask import Blueprint, request, jsonify, current_app
+from model import ExamAttempt, Question, Answer, GradingJob
+from service import score_answer
 from utils.database import db
+from utils.decorators import token_required
+from utils.answers import get_or_create_draft_answer
+from utils.analytics import snapshot, record_attempt
+from utils.audio_store import AudioTooLarge, UnsupportedAudio
+from utils.inference import InferenceError
 from datetime import datetime, timezone
-import os
 
 answer_bp = Blueprint('answer', __name__)
 
-def get_or_create_draft_answer(attempt_id: int, question_id: int) -> Answer:
-    
-    ans = Answer.query.filter_by(attempt_id=attempt_id, question_id=question_id).first()
-    if ans is None:
-        ans = Answer(
-            attempt_id=attempt_id,
-            question_id=question_id,
-            spoken_text='',
-            similarity_score=None,
-            points_awarded=None,
-            finalized=False
-        )
-        db.session.add(ans)
-        db.session.commit()
-    return ans
+# inference busy or down (remote sidecar or local SBERT batcher): the answer stays a draft and the client retries
+@answer_bp.errorhandler(InferenceError)
+def inference_unavailable(e):
+    db.session.rollback()
+    print(f"Inference unavailable: {e}")
+    response = jsonify({'error': 'Grading is temporarily unavailable, please retry'})
+    response.headers['Retry-After'] = str(current_app.config['INFERENCE_RETRY_AFTER_SECONDS'])
+    return response, 503
+
+# a proctoring flag survives completion
+def finished_status(attempt: ExamAttempt) -> str:
+    monitor = current_app.extensions['proctoring_monitor']
+    monitor.flush()
+    monitor.forget(attempt.id)
+    db.session.refresh(attempt)
+    return 'flagged' if attempt.status == 'flagged' else 'completed'
+
+# stamp the attempt finished and fold it into the exam's analytics summary, in one commit
+def finish_attempt(attempt: ExamAttempt, total_score: int) -> None:
+    status = finished_status(attempt)
+    before = snapshot(attempt)
+    attempt.completed_at = datetime.now(timezone.utc)
+    attempt.total_score = int(total_score)
+    attempt.status = status
+    if current_app.config['ANALYTICS_SUMMARY_TABLES']:
+        content = current_app.extensions['exam_cache'].get(attempt.exam_id)
+        try:
+            with db.session.begin_nested():
+                record_attempt(attempt, before, content.max_points if content else 0,
+                               current_app.config['ANALYTICS_PASS_RATIO'])
+        except Exception as e:
+            print(f"Analytics summary update error: {e}")
+    db.session.commit()
 
 # finalize an attempt and return result 
 def end_exam_internal(attempt_id, user_id):
@@ -40,24 +59,19 @@ def end_exam_internal(attempt_id, user_id):
         'points_awarded': int(a.points_awarded or 0)
     } for a in answers if a.finalized]
 
-    attempt.completed_at = datetime.now(timezone.utc)
-    attempt.total_score = int(total_score)
-    attempt.status = 'completed'
-    db.session.commit()
+    finish_attempt(attempt, total_score)
 
     return jsonify({
         'total_score': int(total_score),
-        'status': 'completed',
+        'status': attempt.status,
         'breakdown': breakdown
     }), 200
 
 # evaluate answer using nlp
 @answer_bp.route('/evaluate-answer', methods=['POST'])
+@token_required
 def evaluate_answer():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.json or {}
     attempt_id = data.get('attempt_id')
@@ -71,29 +85,20 @@ def evaluate_answer():
     if not attempt or attempt.student_id != user_id:
         return jsonify({'error': 'Invalid attempt or access denied'}), 403
 
-    question = db.session.get(Question, question_id)
+    content = current_app.extensions['exam_cache'].get(attempt.exam_id)
+    question = content.question(question_id) if content else None
     if not question:
         return jsonify({'error': 'Question not found'}), 404
 
-    similarity = semantic_similarity(spoken_text, question.expected_answer)
-    awarded = award_points(similarity, question.points)
-
-    answer = Answer.query.filter_by(attempt_id=attempt_id, question_id=question_id).first()
-    if not answer:
-        answer = Answer(
-            attempt_id=attempt_id,
-            question_id=question_id,
-            spoken_text=spoken_text,
-            similarity_score=similarity,
-            points_awarded=awarded,
-            finalized=True
-        )
-        db.session.add(answer)
-    else:
-        answer.spoken_text = spoken_text
-        answer.similarity_score = similarity
-        answer.points_awarded = awarded
-        answer.finalized = True
+    similarity, awarded, tier = score_answer(spoken_text, question)
+
+    current_app.extensions['transcript_buffer'].discard(attempt_id, question.id)
+    answer = get_or_create_draft_answer(attempt_id, question.id)
+    answer.spoken_text = spoken_text
+    answer.similarity_score = similarity
+    answer.points_awarded = awarded
+    answer.scored_by = tier
+    answer.finalized = True
 
     db.session.commit()
 
@@ -101,24 +106,28 @@ def evaluate_answer():
         'spoken_text': spoken_text,
         'similarity_score': similarity,
         'points_awarded': int(awarded),
+        'scored_by': tier,
         'max_points': int(question.points),
         'is_correct': awarded == int(question.points)
     })
 
+# multipart 'audio' file, or the raw audio as the request body with ids in the query string
 @answer_bp.route('/submit-answer', methods=['POST'])
+@token_required
 def submit_answer():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
-
-    if 'audio' not in request.files:
+    user_id = request.user_id
+
+    if 'audio' in request.files:
+        audio_stream = request.files['audio'].stream
+        attempt_id = request.form.get('attempt_id')
+        question_id = request.form.get('question_id')
+    elif request.mimetype.startswith('audio/') or request.mimetype == 'application/octet-stream':
+        audio_stream = request.stream
+        attempt_id = request.args.get('attempt_id')
+        question_id = request.args.get('question_id')
+    else:
         return jsonify({'error': 'No audio file provided'}), 400
 
-    audio_file = request.files['audio']
-    attempt_id = request.form.get('attempt_id')
-    question_id = request.form.get('question_id')
-
     if not attempt_id or not question_id:
         return jsonify({'error': 'Missing attempt_id or question_id in form'}), 400
 
@@ -126,57 +135,74 @@ def submit_answer():
     if not attempt or attempt.student_id != user_id:
         return jsonify({'error': 'Invalid attempt or access denied'}), 403
 
-    filename = secure_filename(f"answer_{attempt_id}_{question_id}.wav")
-    filepath = os.path.join('uploads', filename)
-    audio_file.save(filepath)
-
-    spoken_text = speech_to_text(filepath)
-    if not spoken_text:
-        return jsonify({'error': 'Could not process audio'}), 400
-
-    question = db.session.get(Question, question_id)
+    # only questions of the attempt's own exam
+    content = current_app.extensions['exam_cache'].get(attempt.exam_id)
+    question = content.question(question_id) if content else None
     if not question:
         return jsonify({'error': 'Question not found'}), 404
 
-    similarity = semantic_similarity(spoken_text, question.expected_answer)
-    awarded = award_points(similarity, question.points)
-
-    answer = Answer.query.filter_by(attempt_id=attempt_id, question_id=question_id).first()
-    if answer:
-        answer.spoken_text = spoken_text
-        answer.audio_file_path = filepath
-        answer.similarity_score = similarity
-        answer.points_awarded = awarded
-        answer.finalized = True
-    else:
-        answer = Answer(
-            attempt_id=attempt_id,
-            question_id=question_id,
-            spoken_text=spoken_text,
-            audio_file_path=filepath,
-            similarity_score=similarity,
-            points_awarded=awarded,
-            finalized=True
-        )
-        db.session.add(answer)
-
+    try:
+        stored = current_app.extensions['audio_store'].save(audio_stream)
+    except AudioTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UnsupportedAudio as e:
+        return jsonify({'error': str(e)}), 415
+
+    # grading (speech-to-text + SBERT) runs in the background worker pool
+    answer = get_or_create_draft_answer(int(attempt_id), question.id)
+    answer.audio_file_path = stored.key
+    job = GradingJob(answer_id=answer.id, audio_file_path=stored.key, status='queued')
+    db.session.add(job)
     db.session.commit()
+    current_app.extensions['grading_queue'].enqueue(job.id)
 
     return jsonify({
-        'spoken_text': spoken_text,
-        'similarity_score': similarity,
-        'points_awarded': int(awarded),
-        'max_points': int(question.points),
-        'is_correct': awarded == int(question.points)
-    })
+        'answer_id': answer.id,
+        'job_id': job.id,
+        'status': job.status
+    }), 202
+
+# poll the grading result of an uploaded answer
+@answer_bp.route('/answers/<int:answer_id>/status', methods=['GET'])
+@token_required
+def answer_status(answer_id):
+    user_id = request.user_id
+
+    answer = db.session.get(Answer, answer_id)
+    attempt = db.session.get(ExamAttempt, answer.attempt_id) if answer else None
+    if not attempt or attempt.student_id != user_id:
+        return jsonify({'error': 'Answer not found or access denied'}), 404
+
+    job = (GradingJob.query
+           .filter_by(answer_id=answer.id)
+           .order_by(GradingJob.id.desc())
+           .first())
+
+    result = {
+        'answer_id': answer.id,
+        'job_id': job.id if job else None,
+        'status': job.status if job else ('done' if answer.finalized else 'pending'),
+        'attempts': job.attempts if job else 0,
+        'error': job.last_error if job and job.status == 'failed' else None,
+        'audio_seconds': answer.audio_seconds,
+        'speech_seconds': answer.speech_seconds
+    }
+    if answer.finalized:
+        question = db.session.get(Question, answer.question_id)
+        result.update({
+            'spoken_text': answer.spoken_text or '',
+            'similarity_score': answer.similarity_score,
+            'points_awarded': int(answer.points_awarded or 0),
+            'max_points': int(question.points),
+            'is_correct': int(answer.points_awarded or 0) == int(question.points)
+        })
+    return jsonify(result), 200
 
 # finish and display result 
 @answer_bp.route('/complete-exam', methods=['POST'])
+@token_required
 def complete_exam():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.json or {}
     attempt_id = data.get('attempt_id')
@@ -190,24 +216,18 @@ def complete_exam():
     answers = Answer.query.filter_by(attempt_id=attempt_id).all()
     total_score = sum(int(a.points_awarded or 0) for a in answers if a.finalized)
 
-    attempt.completed_at = datetime.now(timezone.utc)
-    attempt.total_score = int(total_score)
-    attempt.status = 'completed'
-
-    db.session.commit()
+    finish_attempt(attempt, total_score)
 
     return jsonify({
         'total_score': int(total_score),
-        'status': 'completed'
+        'status': attempt.status
     })
 
 # skip the question grade - 0
 @answer_bp.route('/skip-question', methods=['POST'])
+@token_required
 def skip_question():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.get_json() or {}
     attempt_id = data.get('attempt_id')
@@ -219,41 +239,33 @@ def skip_question():
     if not attempt or attempt.student_id != user_id:
         return jsonify({'error': 'Invalid attempt or access denied'}), 403
 
-    question = db.session.get(Question, question_id)
+    content = current_app.extensions['exam_cache'].get(attempt.exam_id)
+    question = content.question(question_id) if content else None
     if not question:
         return jsonify({'error': 'Question not found'}), 404
 
     answer = get_or_create_draft_answer(attempt_id, question_id)
+    current_app.extensions['audio_streams'].pop(attempt_id, question_id)
+    current_app.extensions['transcript_buffer'].discard(attempt_id, question_id)
     answer.spoken_text = ''
     answer.similarity_score = 0.0
     answer.points_awarded = 0
     answer.finalized = True
     db.session.commit()
 
-    next_q = (Question.query
-              .filter(Question.exam_id == question.exam_id)
-              .filter(Question.order > question.order)
-              .order_by(Question.order)
-              .first())
+    next_q = content.next_after(question.id)
 
     return jsonify({
         'message': 'Question skipped',
         'points_awarded': 0,
-        'next_question': {
-            'id': next_q.id,
-            'question_text': next_q.question_text,
-            'points': next_q.points,
-            'order': next_q.order
-        } if next_q else None
+        'next_question': next_q.public() if next_q else None
     }), 200
 
 # move to the next question after grading this 
 @answer_bp.route('/move-next', methods=['POST'])
+@token_required
 def move_next():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.get_json() or {}
     attempt_id = data.get('attempt_id')
@@ -267,51 +279,55 @@ def move_next():
     if not attempt or attempt.student_id != user_id:
         return jsonify({'error': 'Invalid attempt or access denied'}), 403
 
-    question = db.session.get(Question, question_id)
+    content = current_app.extensions['exam_cache'].get(attempt.exam_id)
+    question = content.question(question_id) if content else None
     if not question:
         return jsonify({'error': 'Question not found'}), 404
 
+    # write any buffered /transcript/append fragments before reading the draft
+    current_app.extensions['transcript_buffer'].flush(attempt_id, question_id, discard=True)
     answer = get_or_create_draft_answer(attempt_id, question_id)
+    # an open audio stream already holds most of the transcript; flush its tail
+    streamed_text = current_app.extensions['audio_streams'].finish(attempt_id, question_id)
     if answer.finalized:
         current_text = answer.spoken_text or ''
+    elif provided_text is not None:
+        current_text = provided_text.strip()
+    elif streamed_text is not None:
+        current_text = streamed_text.strip()
     else:
-        current_text = (provided_text if provided_text is not None else (answer.spoken_text or '')).strip()
+        current_text = (answer.spoken_text or '').strip()
+
+    # keep the transcript in the draft so a retry after a 503 still has it
+    if not answer.finalized and answer.spoken_text != current_text:
+        answer.spoken_text = current_text
+        db.session.commit()
 
-    similarity = semantic_similarity(current_text, question.expected_answer) if current_text else 0.0
-    awarded = award_points(similarity, question.points)
+    similarity, awarded, tier = score_answer(current_text, question)
 
     answer.spoken_text = current_text
     answer.similarity_score = similarity
     answer.points_awarded = int(awarded)
+    answer.scored_by = tier
     answer.finalized = True
     db.session.commit()
 
-    next_q = (Question.query
-              .filter(Question.exam_id == question.exam_id)
-              .filter(Question.order > question.order)
-              .order_by(Question.order)
-              .first())
+    next_q = content.next_after(question.id)
 
     return jsonify({
         'spoken_text': current_text,
         'similarity_score': similarity,
         'points_awarded': int(awarded),
+        'scored_by': tier,
         'is_correct': awarded == int(question.points),
-        'next_question': {
-            'id': next_q.id,
-            'question_text': next_q.question_text,
-            'points': next_q.points,
-            'order': next_q.order
-        } if next_q else None
+        'next_question': next_q.public() if next_q else None
     }), 200
 
 # voice commands to navigate the exam
 @answer_bp.route('/voice-command', methods=['POST'])
+@token_required
 def voice_command():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.get_json() or {}
     attempt_id = data.get('attempt_id')
@@ -332,11 +348,9 @@ def voice_command():
         return jsonify({'error': 'Unknown command'}), 400
 
 @answer_bp.route('/end-exam', methods=['POST'])
+@token_required
 def end_exam():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.json or {}
     attempt_id = data.get('attempt_id')
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from model import User
-from service import generate_token, verify_token
+from service import generate_token, revoke_token
 from utils.database import db
 from utils.decorators import token_required
 
@@ -27,7 +27,7 @@ def register():
     db.session.add(user)
     db.session.commit()
 
-    token = generate_token(user.id)
+    token = generate_token(user.id, user.role, user.name, user.email)
     return jsonify({
         'token': token,
         'user': {
@@ -48,7 +48,7 @@ def login():
 
         user = User.query.filter_by(email=data['email']).first()
         if user and check_password_hash(user.password_hash, data['password']):
-            token = generate_token(user.id)
+            token = generate_token(user.id, user.role, user.name, user.email)
             return jsonify({
                 'token': token,
                 'user': {
@@ -65,20 +65,22 @@ def login():
         return jsonify({'error': 'Server error during login'}), 500
 
 @auth_bp.route('/validate-token', methods=['GET'])
+@token_required
 def validate_token():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'valid': False, 'error': 'invalid_or_expired_token'}), 401
-    
-    user = db.session.get(User, user_id)
+    claims = request.user_claims
     return jsonify({
         'valid': True, 
         'user': {
-            'id': user.id, 
-            'email': user.email, 
-            'name': user.name, 
-            'role': user.role
+            'id': claims['user_id'], 
+            'email': claims['email'], 
+            'name': claims['name'], 
+            'role': claims['role']
         }
     }), 200
 
+# revoke the current token
+@auth_bp.route('/logout', methods=['POST'])
+@token_required
+def logout():
+    revoke_token(request.token)
+    return jsonify({'message': 'Logged out'}), 200
@@ -1,38 +1,93 @@
-from flask import Blueprint, request, jsonify
-from model import User, Exam, Question, ExamAttempt, Answer
-from service import verify_token
+import base64
+import hashlib
+import json
+
+from flask import Blueprint, request, jsonify, current_app, url_for
+from model import Exam, Question, ExamAttempt, Answer
+from service import prewarm_expected_embeddings, invalidate_expected_embedding
 from utils.database import db
 from utils.decorators import token_required
+from utils.content_version import EXAMS, current_version, bump_version, exam_key
+from utils.analytics import exam_analytics
+from utils.scoring_policy import ScoringPolicy
+from utils.question_import import FORMATS as IMPORT_FORMATS, detect_format, import_questions
 
 exam_bp = Blueprint('exam', __name__)
 
+EXAM_LIST_FIELDS = ('id', 'title', 'description', 'duration_minutes', 'created_at')
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str) -> int:
+    return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+
+# GET /exams?limit=&cursor=&fields=a,b -- keyset pages by id, JSON array body,
+# next page in X-Next-Cursor / Link, 304 while the exams version is unchanged
+def list_exams(user_id):
+    fields = request.args.get('fields')
+    fields = [f for f in EXAM_LIST_FIELDS if f in fields.split(',')] if fields else list(EXAM_LIST_FIELDS)
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    max_limit = current_app.config['EXAMS_PAGE_MAX']
+    limit = min(max(request.args.get('limit', current_app.config['EXAMS_PAGE_SIZE'], type=int), 1), max_limit)
+    cursor = request.args.get('cursor')
+    try:
+        after_id = _decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    # educators see their own exams, students every active one
+    scope = f"educator:{user_id}" if request.user_role == 'educator' else 'active'
+    version = current_version(EXAMS)
+    etag = hashlib.sha1(f"{version}|{scope}|{after_id}|{limit}|{','.join(fields)}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    query = Exam.query.with_entities(*(getattr(Exam, f) for f in fields))
+    if request.user_role == 'educator':
+        query = query.filter(Exam.educator_id == user_id)
+    else:
+        query = query.filter(Exam.is_active.is_(True))
+    rows = query.filter(Exam.id > after_id).order_by(Exam.id).limit(limit + 1).all()
+
+    page = []
+    for row in rows[:limit]:
+        item = dict(zip(fields, row))
+        if 'created_at' in item:
+            item['created_at'] = item['created_at'].isoformat() if item['created_at'] else None
+        page.append(item)
+
+    response = jsonify(page)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if len(rows) > limit:
+        next_cursor = _encode_cursor(page[-1]['id'])
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("exam.handle_exams", **args)}>; rel="next"'
+    return response
+
 # list of exams 
 @exam_bp.route('/exams', methods=['GET', 'POST'])
+@token_required
 def handle_exams():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     if request.method == 'GET':
-        user = db.session.get(User, user_id)
-        if user.role == 'educator':
-            exams = Exam.query.filter_by(educator_id=user_id).all()
-        else:
-            exams = Exam.query.filter_by(is_active=True).all()
-
-        return jsonify([{
-            'id': exam.id,
-            'title': exam.title,
-            'description': exam.description,
-            'duration_minutes': exam.duration_minutes,
-            'created_at': (exam.created_at.isoformat() if exam.created_at else None)
-        } for exam in exams])
+        return list_exams(user_id)
 
     elif request.method == 'POST':
         data = request.json
         if not data or 'title' not in data or 'duration_minutes' not in data or 'questions' not in data:
             return jsonify({'error': 'Missing exam fields'}), 400
+        try:
+            policies = [ScoringPolicy.parse(q.get('scoring_policy')) for q in data['questions']]
+        except ValueError as e:
+            return jsonify({'error': f'Invalid scoring_policy: {e}'}), 400
 
         exam = Exam(
             title=data['title'],
@@ -45,31 +100,145 @@ def handle_exams():
         db.session.flush()
 
         # Add questions
+        questions = []
         for i, q_data in enumerate(data['questions']):
             question = Question(
                 exam_id=exam.id,
                 question_text=q_data['question_text'],
                 expected_answer=q_data['expected_answer'],
                 points=q_data.get('points', 10),
-                order=i + 1
+                order=i + 1,
+                scoring_policy=policies[i].to_json() if policies[i] else None
             )
             db.session.add(question)
+            questions.append(question)
 
+        bump_version(EXAMS)
         db.session.commit()
+        current_app.extensions['exam_cache'].invalidate(exam.id)
+
+        # embed expected answers now so the first graded answer doesn't pay for it
+        try:
+            prewarm_expected_embeddings(questions)
+        except Exception as e:
+            print(f"Embedding prewarm error: {e}")
+
         return jsonify({'message': 'Exam created successfully', 'exam_id': exam.id})
 
+# bulk question import (educator only): CSV / JSONL as a multipart 'file' or the raw body;
+# ?exam_id= appends to an existing exam, otherwise ?title=&duration_minutes= creates one
+@exam_bp.route('/exams/import', methods=['POST'])
+@token_required
+def import_exam_questions():
+    user_id = request.user_id
+    if request.user_role != 'educator':
+        return jsonify({'error': 'Access denied'}), 403
+
+    upload = request.files.get('file')
+    if upload is not None:
+        fmt = request.args.get('format') or detect_format(upload.filename, upload.mimetype)
+        stream = upload.stream
+    else:
+        fmt = request.args.get('format') or detect_format(mimetype=request.mimetype)
+        stream = request.stream
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'error': 'Upload a .csv or .jsonl file, or set ?format=csv|jsonl'}), 415
+
+    exam_id = request.args.get('exam_id', type=int)
+    if exam_id:
+        exam = db.session.get(Exam, exam_id)
+        if not exam or exam.educator_id != user_id:
+            return jsonify({'error': 'Access denied'}), 403
+    else:
+        title = request.args.get('title')
+        duration = request.args.get('duration_minutes', type=int)
+        if not title or not duration:
+            return jsonify({'error': 'exam_id or title and duration_minutes required'}), 400
+        exam = Exam(
+            title=title,
+            description=request.args.get('description', ''),
+            educator_id=user_id,
+            duration_minutes=duration
+        )
+        db.session.add(exam)
+        bump_version(EXAMS)
+        db.session.commit()
+
+    summary = import_questions(exam.id, stream, fmt, current_app.config['IMPORT_CHUNK_SIZE'])
+    current_app.extensions['exam_cache'].invalidate(exam.id)
+    return jsonify(summary), 200
+
+# score distribution, pass rate, time to complete and per-question stats (exam owner only);
+# ?live=1 skips the summary tables
+@exam_bp.route('/exams/<int:exam_id>/analytics', methods=['GET'])
+@token_required
+def exam_analytics_view(exam_id):
+    user_id = request.user_id
+
+    content = current_app.extensions['exam_cache'].get(exam_id)
+    if not content:
+        return jsonify({'error': 'Exam not found'}), 404
+    exam = db.session.get(Exam, exam_id)
+    if exam.educator_id != user_id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    use_summary = (current_app.config['ANALYTICS_SUMMARY_TABLES']
+                   and request.args.get('live', '').lower() not in ('1', 'true'))
+    return jsonify(exam_analytics(exam_id, content.max_points,
+                                  current_app.config['ANALYTICS_PASS_RATIO'], use_summary)), 200
+
+# edit a question (educator only)
+@exam_bp.route('/questions/<int:question_id>', methods=['PUT'])
+@token_required
+def update_question(question_id):
+    user_id = request.user_id
+
+    question = db.session.get(Question, question_id)
+    if not question:
+        return jsonify({'error': 'Question not found'}), 404
+
+    exam = db.session.get(Exam, question.exam_id)
+    if not exam or exam.educator_id != user_id:
+        return jsonify({'error': 'Access denied'}), 403
+
+    data = request.json or {}
+    if 'question_text' in data:
+        question.question_text = data['question_text']
+    if 'expected_answer' in data:
+        question.expected_answer = data['expected_answer']
+    if 'points' in data:
+        question.points = data['points']
+    if 'scoring_policy' in data:
+        try:
+            policy = ScoringPolicy.parse(data['scoring_policy'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid scoring_policy: {e}'}), 400
+        question.scoring_policy = policy.to_json() if policy else None
+
+    invalidate_expected_embedding(question.id)
+    bump_version(exam_key(question.exam_id))
+    db.session.commit()
+    current_app.extensions['exam_cache'].invalidate(question.exam_id)
+
+    return jsonify({
+        'id': question.id,
+        'question_text': question.question_text,
+        'expected_answer': question.expected_answer,
+        'points': question.points,
+        'order': question.order,
+        'scoring_policy': json.loads(question.scoring_policy) if question.scoring_policy else None
+    }), 200
+
 # take an exam 
 @exam_bp.route('/exams/<int:exam_id>/start', methods=['POST'])
+@token_required
 def start_exam(exam_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
-    exam = db.session.get(Exam, exam_id)
-    if not exam:
+    content = current_app.extensions['exam_cache'].get(exam_id)
+    if not content:
         return jsonify({'error': 'Exam not found'}), 404
-    if not exam.is_active:
+    if not content.is_active:
         return jsonify({'error': 'Exam is not active'}), 400
 
     attempt = ExamAttempt(
@@ -80,83 +249,59 @@ def start_exam(exam_id):
     db.session.add(attempt)
     db.session.commit()
 
-    questions = Question.query.filter_by(exam_id=exam_id).order_by(Question.order).all()
-
     return jsonify({
         'attempt_id': attempt.id,
         'exam': {
-            'id': exam.id,
-            'title': exam.title,
-            'duration_minutes': exam.duration_minutes
+            'id': content.exam_id,
+            'title': content.title,
+            'duration_minutes': content.duration_minutes
         },
-        'questions': [{
-            'id': q.id,
-            'question_text': q.question_text,
-            'points': q.points,
-            'order': q.order
-        } for q in questions]
+        'questions': content.public_questions()
     })
 
 @exam_bp.route('/attempts/<int:attempt_id>/info', methods=['GET'])
+@token_required
 def attempt_info(attempt_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     attempt = db.session.get(ExamAttempt, attempt_id)
     if not attempt or attempt.student_id != user_id:
         return jsonify({'error': 'Attempt not found or access denied'}), 404
 
-    exam = db.session.get(Exam, attempt.exam_id)
-    questions = Question.query.filter_by(exam_id=exam.id).order_by(Question.order).all()
+    content = current_app.extensions['exam_cache'].get(attempt.exam_id)
 
     return jsonify({
         'attempt_id': attempt.id,
         'exam': {
-            'id': exam.id,
-            'title': exam.title,
-            'duration_minutes': exam.duration_minutes,
-            'description': exam.description
+            'id': content.exam_id,
+            'title': content.title,
+            'duration_minutes': content.duration_minutes,
+            'description': content.description
         },
-        'questions': [{
-            'id': q.id,
-            'question_text': q.question_text,
-            'points': q.points,
-            'order': q.order
-        } for q in questions],
+        'questions': content.public_questions(),
         'started_at': attempt.started_at.isoformat() if attempt.started_at else None,
         'status': attempt.status
     }), 200
 
 @exam_bp.route('/attempts/<int:attempt_id>/current', methods=['GET'])
+@token_required
 def attempt_current(attempt_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     attempt = db.session.get(ExamAttempt, attempt_id)
     if not attempt or attempt.student_id != user_id:
         return jsonify({'error': 'Invalid attempt or access denied'}), 403
 
-    answered_q_ids = [a.question_id for a in Answer.query.filter_by(attempt_id=attempt_id, finalized=True).all()]
-    next_q = (Question.query
-              .filter(Question.exam_id == attempt.exam_id)
-              .filter(~Question.id.in_(answered_q_ids))
-              .order_by(Question.order)
-              .first())
+    answered_q_ids = [qid for (qid,) in (db.session.query(Answer.question_id)
+                                          .filter_by(attempt_id=attempt_id, finalized=True))]
+    content = current_app.extensions['exam_cache'].get(attempt.exam_id)
+    next_q = content.first_unanswered(answered_q_ids)
     
     if not next_q:
         return jsonify({'next_question': None}), 200
     
     return jsonify({
-        'next_question': {
-            'id': next_q.id,
-            'question_text': next_q.question_text,
-            'points': next_q.points,
-            'order': next_q.order
-        }
+        'next_question': next_q.public()
     }), 200
 
 @exam_bp.route('/attempts/<int:attempt_id>/results', methods=['GET'])
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from utils.database import db
+
+health_bp = Blueprint('health', __name__)
+
+# readiness probe: 200 once the startup warm-up has finished without errors and the database answers
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    warmup = current_app.extensions['warmup']
+    body = warmup.status()
+    try:
+        db.session.execute(text('SELECT 1'))
+        body['database'] = 'ok'
+    except Exception as e:
+        db.session.rollback()
+        body['database'] = 'error'
+        body['status'] = 'unavailable'
+        print(f"Health check database error: {e}")
+    ready = warmup.ready and not warmup.failed and body['database'] == 'ok'
+    return jsonify(body), 200 if ready else 503
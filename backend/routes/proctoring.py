@@ -1,25 +1,60 @@
-from flask import Blueprint, request, jsonify
-from service import verify_token, analyze_frame
+from flask import Blueprint, request, jsonify, current_app
+from utils.decorators import token_required
+from service import analyze_frame, analyze_frame_bytes, get_proctoring_engine
 
 proctoring_bp = Blueprint('proctoring', __name__)
 
+BINARY_FRAME_TYPES = ('application/octet-stream', 'image/jpeg', 'image/png', 'image/webp')
+
 # face-check for no face, excessive eye movements away from screen and more than one face in the frame
 @proctoring_bp.route('/proctoring/face-check', methods=['POST'])
+@token_required
 def face_check():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
+
+    # attempt_id comes from the query string for binary uploads, else form/JSON
+    json_data = request.get_json(silent=True) or {}
+    attempt_id = (request.args.get('attempt_id', type=int)
+                  or request.form.get('attempt_id', type=int)
+                  or json_data.get('attempt_id'))
+    monitor = current_app.extensions['proctoring_monitor']
+    state = None
+    if attempt_id:
+        state = monitor.attempt_state(int(attempt_id), user_id)
+        if state is None:
+            return jsonify({'error': 'Invalid attempt or access denied'}), 403
 
-    data = request.json or {}
-    frame_data = data.get('frame')
+    # binary upload: raw image body or multipart 'frame' file; JSON data URL kept for old clients
+    if request.mimetype in BINARY_FRAME_TYPES:
+        frame_bytes = request.get_data(cache=False)
+        if not frame_bytes:
+            return jsonify({'error': 'No frame data provided'}), 400
+        result = analyze_frame_bytes(frame_bytes)
+    elif 'frame' in request.files:
+        frame_bytes = request.files['frame'].read()
+        if not frame_bytes:
+            return jsonify({'error': 'No frame data provided'}), 400
+        result = analyze_frame_bytes(frame_bytes)
+    else:
+        frame_data = json_data.get('frame')
 
-    if not frame_data:
-        return jsonify({'error': 'No frame data provided'}), 400
+        if not frame_data:
+            return jsonify({'error': 'No frame data provided'}), 400
 
-    result = analyze_frame(frame_data)
+        result = analyze_frame(frame_data)
     
     if 'error' in result:
         return jsonify({'error': result['error']}), 500
+
+    if state is not None:
+        result.update(monitor.record(int(attempt_id), state, result))
     
-    return jsonify(result)
\ No newline at end of file
+    return jsonify(result)
+
+# average per-stage timings (decode, resize, forward, cascade) for this worker
+@proctoring_bp.route('/proctoring/stats', methods=['GET'])
+@token_required
+def proctoring_stats():
+    if request.user_role != 'educator':
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify(get_proctoring_engine().stats())
@@ -1,31 +1,20 @@
-from flask import Blueprint, request, jsonify
-from model import ExamAttempt, Answer
-from service import verify_token
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import update
+from model import Answer, ExamAttempt
+from service import get_stt_backend
 from utils.database import db
+from utils.decorators import token_required
+from utils.answers import get_or_create_draft_answer
 
 transcript_bp = Blueprint('transcript', __name__)
 
-def get_or_create_draft_answer(attempt_id: int, question_id: int) -> Answer:
-    ans = Answer.query.filter_by(attempt_id=attempt_id, question_id=question_id).first()
-    if ans is None:
-        ans = Answer(
-            attempt_id=attempt_id,
-            question_id=question_id,
-            spoken_text='',
-            similarity_score=None,
-            points_awarded=None,
-            finalized=False
-        )
-        db.session.add(ans)
-        db.session.commit()
-    return ans
+# PCM rates accepted by /transcript/audio, telephone through studio
+MIN_SAMPLE_RATE, MAX_SAMPLE_RATE = 8000, 48000
 
 @transcript_bp.route('/transcript/append', methods=['POST'])
+@token_required
 def append_transcript():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user_id = verify_token(token)
-    if not user_id:
-        return jsonify({'error': 'Invalid token'}), 401
+    user_id = request.user_id
 
     data = request.json or {}
     attempt_id = data.get('attempt_id')
@@ -43,10 +32,75 @@ def append_transcript():
     if ans.finalized:
         return jsonify({'error': 'Answer already finalized for this question'}), 400
 
-    ans.spoken_text = (ans.spoken_text + (' ' if ans.spoken_text else '') + text_part).strip()
-    db.session.commit()
+    # buffered; written to the answer in batches (see utils/transcript_buffer.py)
+    current = current_app.extensions['transcript_buffer'].append(attempt_id, question_id, ans, text_part)
 
     return jsonify({
         'message': 'Transcript appended',
-        'current_transcript': ans.spoken_text
-    }), 200
\ No newline at end of file
+        'current_transcript': current
+    }), 200
+
+# stream raw 16-bit mono PCM while the student speaks; partial transcript goes into the draft answer
+@transcript_bp.route('/transcript/audio', methods=['POST'])
+@token_required
+def stream_audio():
+    user_id = request.user_id
+
+    attempt_id = request.args.get('attempt_id', type=int)
+    question_id = request.args.get('question_id', type=int)
+    sample_rate = request.args.get('sample_rate', 16000, type=int)
+    final = request.args.get('final', '').lower() in ('1', 'true')
+
+    if not attempt_id or not question_id:
+        return jsonify({'error': 'Missing attempt_id/question_id'}), 400
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        return jsonify({'error': f'sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE} Hz'}), 400
+    if request.mimetype not in ('', 'application/octet-stream', 'audio/l16', 'audio/pcm'):
+        return jsonify({'error': 'Only raw 16-bit mono PCM audio is supported'}), 415
+
+    attempt = db.session.get(ExamAttempt, attempt_id)
+    if not attempt or attempt.student_id != user_id:
+        return jsonify({'error': 'Invalid attempt or access denied'}), 403
+
+    ans = get_or_create_draft_answer(attempt_id, question_id)
+    if ans.finalized:
+        return jsonify({'error': 'Answer already finalized for this question'}), 400
+
+    registry = current_app.extensions['audio_streams']
+    segment_seconds = current_app.config['STREAM_SEGMENT_SECONDS']
+    read_bytes = current_app.config['STREAM_READ_BYTES']
+    session = registry.get_or_open(
+        attempt_id, question_id,
+        lambda: get_stt_backend().open_stream(sample_rate, segment_seconds)
+    )
+
+    # read the body incrementally so chunked uploads are recognised as they arrive
+    with session.lock:
+        while True:
+            chunk = request.stream.read(read_bytes)
+            if not chunk:
+                break
+            session.feed(chunk)
+        transcript = session.stream.text
+        bytes_received = session.bytes_received
+
+    if final:
+        transcript = registry.finish(attempt_id, question_id) or ''
+
+    # the body read can take as long as the student speaks; never overwrite an answer
+    # that was finalized meanwhile
+    written = db.session.execute(
+        update(Answer)
+        .where(Answer.id == ans.id, Answer.finalized.is_not(True))
+        .values(spoken_text=transcript)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not written:
+        return jsonify({'error': 'Answer already finalized for this question'}), 400
+
+    return jsonify({
+        'current_transcript': transcript,
+        'bytes_received': bytes_received,
+        'final': final
+    }), 200
@@ -0,0 +1,29 @@
+import argparse
+
+from config import Config
+from utils.inference_server import InferenceServer
+
+# python serve_inference.py                        # one worker per CPU on 127.0.0.1:5100
+# python serve_inference.py --workers 4 --port 5200
+# then run the web tier with INFERENCE_MODE=remote INFERENCE_URL=http://127.0.0.1:5200
+def main():
+    parser = argparse.ArgumentParser(description='Serve SBERT, speech-to-text and proctoring models over HTTP')
+    parser.add_argument('--host', default=Config.INFERENCE_HOST)
+    parser.add_argument('--port', type=int, default=Config.INFERENCE_PORT)
+    parser.add_argument('--workers', type=int, default=Config.INFERENCE_WORKERS, help='0 = one per CPU')
+    parser.add_argument('--max-pending', type=int, default=Config.INFERENCE_MAX_PENDING)
+    parser.add_argument('--timeout', type=float, default=Config.INFERENCE_REQUEST_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    from service import _configFile, _modelFile
+    config = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    config.update(PROCTOR_CONFIG_FILE=_configFile, PROCTOR_MODEL_FILE=_modelFile)
+
+    server = InferenceServer(config, workers=args.workers, max_pending=args.max_pending,
+                             request_timeout=args.timeout)
+    if config['INFERENCE_PRELOAD']:
+        print(f"Loading models in {server.warm()} workers")
+    server.serve(args.host, args.port)
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,38 @@
 """
 Unified service utilities:
-- Auth (JWT): generate_token, verify_token
-- Evaluation (SBERT similarity + scoring): semantic_similarity, award_points
+- Auth (JWT): generate_token, verify_token, verify_claims, revoke_token
+- Evaluation (SBERT similarity + scoring): semantic_similarity, award_points,
+  expected-answer embedding cache
 - Proctoring (face/eye detection): analyze_frame
-- Speech (speech-to-text): speech_to_text
+- Speech (speech-to-text): speech_to_text via pluggable backends (utils/stt.py)
+
+With INFERENCE_MODE=remote the models live in the inference sidecar
+(serve_inference.py) and the getters below return its client adapters.
 """
 
 from __future__ import annotations
 
-import speech_recognition as sr
-import cv2, os, base64
-import numpy as np
-from io import BytesIO
-from PIL import Image
+import os
+import threading
+import uuid
 from pathlib import Path
 import jwt
 from datetime import datetime, timedelta, timezone
 from flask import current_app
-from sklearn.metrics.pairwise import cosine_similarity
 
-# create jwt token 
-def generate_token(user_id):
+from utils.token_cache import token_digest
+
+# guards lazy model/engine construction against concurrent first requests
+_init_lock = threading.RLock()
+
+# create jwt token; role/name/email claims let routes skip the User lookup
+def generate_token(user_id, role=None, name=None, email=None):
     payload = {
         'user_id': user_id,
+        'role': role,
+        'name': name,
+        'email': email,
+        'jti': uuid.uuid4().hex,
         'exp': datetime.now(timezone.utc) + timedelta(days=1)
     }
     token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
@@ -30,18 +40,100 @@ def generate_token(user_id):
         token = token.decode('utf-8')
     return token
 
-# verify jwt token
-def verify_token(token):
-    if not token:
-        return None
+_token_cache = None
+def _get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        with _init_lock:
+            if _token_cache is None:
+                from utils.token_cache import TokenCache
+                _token_cache = TokenCache(current_app.config['TOKEN_CACHE_SIZE'],
+                                          current_app.config['TOKEN_CACHE_TTL_SECONDS'])
+    return _token_cache
+
+def _decode_token(token):
     try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload.get('user_id')
+        return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def _is_revoked(jti):
+    if not jti:
+        return False
+    if _get_token_cache().is_revoked(jti):
+        return True
+    from model import RevokedToken
+    from utils.database import db
+    return db.session.get(RevokedToken, jti) is not None
+
+# verified claims (user_id, role, name, email, jti, exp) or None; cached per token
+def verify_claims(token):
+    if not token:
+        return None
+    cache = _get_token_cache()
+    digest = token_digest(token)
+    claims = cache.get(digest)
+    if claims is not None:
+        return claims
+
+    payload = _decode_token(token)
+    if not payload or not payload.get('user_id') or _is_revoked(payload.get('jti')):
+        return None
+    claims = {k: payload.get(k) for k in ('user_id', 'role', 'name', 'email', 'jti', 'exp')}
+    # tokens issued before the claims were added
+    if not claims['role']:
+        from model import User
+        from utils.database import db
+        user = db.session.get(User, claims['user_id'])
+        if user is None:
+            return None
+        claims.update(role=user.role, name=user.name, email=user.email)
+    cache.put(digest, claims)
+    return claims
+
+# verify jwt token
+def verify_token(token):
+    claims = verify_claims(token)
+    return claims['user_id'] if claims else None
+
+# log a token out; its jti stays on the revocation list until it expires
+def revoke_token(token):
+    payload = _decode_token(token)
+    if not payload or not payload.get('jti'):
+        return False
+    from model import RevokedToken
+    from utils.database import db
+    now = datetime.now(timezone.utc)
+    expires_at = datetime.fromtimestamp(payload['exp'], timezone.utc)
+    db.session.query(RevokedToken).filter(RevokedToken.expires_at < now).delete()
+    db.session.merge(RevokedToken(jti=payload['jti'], expires_at=expires_at))
+    db.session.commit()
+    _get_token_cache().revoke(payload['jti'], payload['exp'])
+    return True
+
+
+# Inference sidecar (INFERENCE_MODE=remote)
+
+def _remote_inference():
+    return current_app.config['INFERENCE_MODE'] == 'remote'
+
+_inference_client = None
+def _get_inference_client():
+    global _inference_client
+    if _inference_client is None:
+        with _init_lock:
+            if _inference_client is None:
+                from utils.inference import InferenceClient
+                _inference_client = InferenceClient(
+                    current_app.config['INFERENCE_URL'],
+                    timeout=current_app.config['INFERENCE_TIMEOUT_SECONDS'],
+                    max_in_flight=current_app.config['INFERENCE_MAX_IN_FLIGHT'],
+                    queue_timeout=current_app.config['INFERENCE_QUEUE_TIMEOUT_SECONDS']
+                )
+    return _inference_client
+
 
 # Evaluation (SBERT similarity + scoring)
 
@@ -49,34 +141,222 @@ _sbert_model = None
 def _get_sbert():
     global _sbert_model
     if _sbert_model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            _sbert_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            print(f"SBERT load error: {e}")
-            _sbert_model = None
+        with _init_lock:
+            if _sbert_model is None and _remote_inference():
+                from utils.inference import RemoteSentenceModel
+                _sbert_model = RemoteSentenceModel(_get_inference_client())
+            elif _sbert_model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    _sbert_model = SentenceTransformer(current_app.config['SBERT_MODEL_NAME'])
+                except Exception as e:
+                    print(f"SBERT load error: {e}")
+                    _sbert_model = None
     return _sbert_model
 
-def semantic_similarity(student_answer: str, expected_answer: str) -> float:
+_embedding_cache = None
+def _get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _init_lock:
+            if _embedding_cache is None:
+                from utils.embedding_cache import EmbeddingCache
+                _embedding_cache = EmbeddingCache(current_app.config['EMBEDDING_CACHE_SIZE'])
+    return _embedding_cache
+
+def _load_persisted_embedding(question_id, digest):
+    from model import QuestionEmbedding
+    from utils.database import db
+    import numpy as np
+    row = db.session.get(QuestionEmbedding, question_id)
+    if row is None or row.answer_hash != digest or row.model_name != current_app.config['SBERT_MODEL_NAME']:
+        return None
+    return np.frombuffer(row.vector, dtype=np.float32).reshape(-1, row.dim)
+
+# new=True: rows for freshly inserted questions, written with one bulk INSERT
+def _persist_embeddings(items, new=False):
+    from model import QuestionEmbedding
+    from utils.database import db
+    model_name = current_app.config['SBERT_MODEL_NAME']
+    now = datetime.now(timezone.utc)
     try:
-        if not student_answer:
-            return 0.0
+        if new:
+            from sqlalchemy import insert
+            db.session.execute(insert(QuestionEmbedding), [{
+                'question_id': question_id,
+                'answer_hash': digest,
+                'model_name': model_name,
+                'dim': int(vec.shape[-1]),
+                'vector': vec.tobytes(),
+                'updated_at': now
+            } for question_id, digest, vec in items])
+        else:
+            for question_id, digest, vec in items:
+                db.session.merge(QuestionEmbedding(
+                    question_id=question_id,
+                    answer_hash=digest,
+                    model_name=model_name,
+                    dim=int(vec.shape[-1]),
+                    vector=vec.tobytes(),
+                    updated_at=now
+                ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Embedding persist error: {e}")
+
+def _references_digest(references):
+    from utils.embedding_cache import answer_digest
+    # a single reference hashes exactly like the plain expected answer did
+    return answer_digest('\x1e'.join(references))
+
+# cached (k, dim) embeddings of a question's accepted answers (memory -> db -> SBERT)
+def reference_embeddings(question_id, references):
+    references = tuple(references)
+    cache = _get_embedding_cache()
+    digest = _references_digest(references)
+    refs = cache.get(question_id, digest)
+    if refs is not None:
+        return refs
+
+    persist = current_app.config['EMBEDDING_CACHE_PERSIST']
+    if persist:
+        refs = _load_persisted_embedding(question_id, digest)
+        if refs is not None:
+            cache.put(question_id, digest, refs)
+            return refs
+
+    model = _get_sbert()
+    if model is None:
+        return None
+    import numpy as np
+    refs = np.asarray(model.encode(list(references)), dtype=np.float32)
+    cache.put(question_id, digest, refs)
+    if persist:
+        _persist_embeddings([(question_id, digest, refs)])
+    return refs
+
+# cached embedding of a question's expected answer
+def expected_embedding(question_id, expected_answer):
+    refs = reference_embeddings(question_id, (expected_answer,))
+    return None if refs is None else refs[0]
+
+# embed the accepted answers of freshly created questions in one encode call;
+# new=True (bulk imports) bulk-inserts the persisted vectors and leaves the LRU to live traffic
+def prewarm_expected_embeddings(questions, new=False):
+    from utils.scoring_policy import policy_for, reference_texts
+    groups = [(q.id, reference_texts(q.expected_answer, policy_for(q))) for q in questions]
+    groups = [(qid, refs) for qid, refs in groups if refs]
+    if not groups:
+        return 0
+    model = _get_sbert()
+    if model is None:
+        return 0
+    import numpy as np
+    cache = _get_embedding_cache()
+    persist = current_app.config['EMBEDDING_CACHE_PERSIST']
+    vectors = np.asarray(model.encode([t for _, refs in groups for t in refs]), dtype=np.float32)
+    items = []
+    offset = 0
+    for qid, refs in groups:
+        matrix = vectors[offset:offset + len(refs)]
+        offset += len(refs)
+        digest = _references_digest(refs)
+        if not (new and persist):
+            cache.put(qid, digest, matrix)
+        items.append((qid, digest, matrix))
+    if persist:
+        _persist_embeddings(items, new=new)
+    return len(items)
+
+# forget cached embeddings after an educator edits a question
+def invalidate_expected_embedding(question_id):
+    from model import QuestionEmbedding
+    from utils.database import db
+    _get_embedding_cache().invalidate(question_id)
+    row = db.session.get(QuestionEmbedding, question_id)
+    if row is not None:
+        db.session.delete(row)
+
+_scoring_engine = None
+def _get_scoring_engine():
+    global _scoring_engine
+    if _scoring_engine is None:
         model = _get_sbert()
         if model is None:
-            return 0.0
-        student_embedding = model.encode([student_answer])
-        expected_embedding = model.encode([expected_answer])
-        similarity = cosine_similarity(student_embedding, expected_embedding)[0][0]
-        return float(similarity)
-    except Exception as e:
-        print(f"Answer evaluation error: {e}")
+            return None
+        with _init_lock:
+            if _scoring_engine is None:
+                from utils.scoring_engine import ScoringEngine
+                _scoring_engine = ScoringEngine(
+                    model,
+                    max_batch_size=current_app.config['SCORING_MAX_BATCH_SIZE'],
+                    max_wait_ms=current_app.config['SCORING_MAX_WAIT_MS']
+                )
+    return _scoring_engine
+
+# best cosine similarity against the expected answer and the policy's extra accepted references;
+# a failure to score (remote inference down, batcher timeout, model not loaded, encode error)
+# raises an InferenceError so callers retry instead of finalizing 0 points
+def semantic_similarity(student_answer: str, expected_answer: str, question_id: int | None = None,
+                        policy=None) -> float:
+    from utils.inference import InferenceError
+    from utils.scoring_engine import ScoringUnavailable
+    from utils.scoring_policy import reference_texts
+    # the same tuple prewarm_expected_embeddings caches, so the digests match
+    texts = reference_texts(expected_answer, policy)
+    if not student_answer or not texts:
         return 0.0
-# scoring rule: full points if similarity >= threshold, else 0
-def award_points(similarity: float, max_points: int) -> int:
+    try:
+        engine = _get_scoring_engine()
+        if engine is None:
+            raise ScoringUnavailable('SBERT model not loaded')
+        if question_id is not None:
+            reference = reference_embeddings(question_id, texts)
+            if reference is None:
+                raise ScoringUnavailable('SBERT model not loaded')
+        else:
+            reference = engine.model.encode(list(texts))
+        return engine.score(student_answer, reference, timeout=current_app.config['SCORING_TIMEOUT_SECONDS'])
+    except InferenceError:
+        raise
+    except Exception as e:
+        raise ScoringUnavailable(f"Answer evaluation error: {e}") from e
+# scoring rule: the question's policy if it has one, else full points if similarity >= threshold
+def award_points(similarity: float, max_points: int, policy=None, student_answer: str = '') -> int:
     
     threshold = current_app.config['EVAL_SIMILARITY_THRESHOLD']
+    if policy is not None:
+        return policy.award(similarity, student_answer, max_points, threshold)
     return int(max_points) if similarity >= threshold else 0
 
+_lexical_prefilter = None
+def _get_lexical_prefilter():
+    global _lexical_prefilter
+    if _lexical_prefilter is None:
+        with _init_lock:
+            if _lexical_prefilter is None:
+                from utils.lexical_match import LexicalPrefilter
+                _lexical_prefilter = LexicalPrefilter()
+    return _lexical_prefilter
+
+# similarity, points and deciding tier for a student's answer to a Question / CachedQuestion;
+# certain lexical matches (and empty answers) skip SBERT entirely
+def score_answer(student_answer: str, question) -> tuple[float, int, str]:
+    from utils.scoring_policy import policy_for, reference_texts
+    policy = policy_for(question)
+    decision = None
+    if not (student_answer or '').strip():
+        decision = ('empty', 0.0)
+    elif current_app.config['LEXICAL_PREFILTER']:
+        decision = _get_lexical_prefilter().decide(student_answer, reference_texts(question.expected_answer, policy))
+    if decision is not None:
+        tier, similarity = decision
+    else:
+        tier = 'semantic'
+        similarity = semantic_similarity(student_answer, question.expected_answer, question.id, policy)
+    return similarity, award_points(similarity, question.points, policy, student_answer), tier
+
 # Proctoring (face/eye detection)
 def _resolve_model_path(filename: str) -> str:
     candidates = []
@@ -101,89 +381,102 @@ def _resolve_model_path(filename: str) -> str:
 _modelFile = _resolve_model_path("res10_300x300_ssd_iter_140000_fp16.caffemodel")
 _configFile = _resolve_model_path("deploy.prototxt")
 
-_net = None
-def _get_face_net():
-    global _net
-    if _net is None:
-        try:
-            _net = cv2.dnn.readNetFromCaffe(_configFile, _modelFile)
-        except Exception as e:
-            print(f"Warning: Could not load DNN model files:\n  prototxt={_configFile}\n  caffemodel={_modelFile}\n  error={e}")
-            _net = None
-    return _net
+_proctoring_engine = None
+def get_proctoring_engine():
+    global _proctoring_engine
+    if _proctoring_engine is None:
+        with _init_lock:
+            if _proctoring_engine is None and _remote_inference():
+                from utils.inference import RemoteProctoringEngine
+                _proctoring_engine = RemoteProctoringEngine(_get_inference_client())
+            elif _proctoring_engine is None:
+                from utils.proctoring import ProctoringEngine
+                _proctoring_engine = ProctoringEngine(
+                    _configFile, _modelFile,
+                    pool_size=current_app.config['PROCTOR_POOL_SIZE'],
+                    max_batch_size=current_app.config['PROCTOR_BATCH_MAX'],
+                    max_wait_ms=current_app.config['PROCTOR_BATCH_WAIT_MS']
+                )
+    return _proctoring_engine
+
+def warm_proctoring():
+    try:
+        return get_proctoring_engine().warm()
+    except Exception as e:
+        print(f"Warning: Could not load DNN model files:\n  prototxt={_configFile}\n  caffemodel={_modelFile}\n  error={e}")
+        return 0
 
 def analyze_frame(frame_data):
+    """Analyze a frame given as a base64 data URL (legacy JSON upload)."""
+    from utils.inference import InferenceBusy, ModelUnavailable
+    from utils.proctoring import FaceModelUnavailable
     try:
-        header, encoded = frame_data.split(',', 1)
-        img_bytes = base64.b64decode(encoded)
-        img = Image.open(BytesIO(img_bytes))
-        frame = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-
-        net = _get_face_net()
-        if net is None:
-            return {'error': 'Face detection model not loaded'}
-
-        (h, w) = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300),
-                                     (104.0, 177.0, 123.0))
-        net.setInput(blob)
-        detections = net.forward()
-
-        faces = []
-        for i in range(detections.shape[2]):
-            confidence = float(detections[0, 0, i, 2])
-            if confidence > 0.5:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-                startX, startY = max(0, startX), max(0, startY)
-                endX, endY = min(w - 1, endX), min(h - 1, endY)
-                faces.append((startX, startY, endX, endY))
-
-        face_detected = len(faces) > 0
-        multiple_faces = len(faces) > 1
-
-        eye_movement_detected = False
-        eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        for (sx1, sy1, sx2, sy2) in faces:
-            sy, ey = max(0, sy1), min(gray.shape[0], sy2)
-            sx, ex = max(0, sx1), min(gray.shape[1], sx2)
-            if sy >= ey or sx >= ex:
-                continue
-            roi_gray = gray[sy:ey, sx:ex]
-            eyes = eye_cascade.detectMultiScale(roi_gray)
-            if len(eyes) != 2:
-                eye_movement_detected = True
-                break
-
-        return {
-            'face_detected': face_detected,
-            'multiple_faces': multiple_faces,
-            'eye_movement_detected': eye_movement_detected,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }
+        return get_proctoring_engine().analyze_data_url(frame_data)
+    except (FaceModelUnavailable, ModelUnavailable):
+        return {'error': 'Face detection model not loaded'}
+    except InferenceBusy:
+        return {'error': 'Frame analysis busy, retry later'}
+    except Exception as e:
+        print(f"Proctoring error: {e}")
+        return {'error': 'Frame analysis failed'}
+
+def analyze_frame_bytes(frame_bytes):
+    """Analyze a frame given as raw encoded image bytes (binary upload)."""
+    from utils.inference import InferenceBusy, ModelUnavailable
+    from utils.proctoring import FaceModelUnavailable
+    try:
+        return get_proctoring_engine().analyze_bytes(frame_bytes)
+    except (FaceModelUnavailable, ModelUnavailable):
+        return {'error': 'Face detection model not loaded'}
+    except InferenceBusy:
+        return {'error': 'Frame analysis busy, retry later'}
     except Exception as e:
         print(f"Proctoring error: {e}")
         return {'error': 'Frame analysis failed'}
 
 # Speech (speech-to-text)
 
+_stt_backend = None
+def get_stt_backend():
+    global _stt_backend
+    if _stt_backend is None:
+        with _init_lock:
+            if _stt_backend is None and _remote_inference():
+                from utils.inference import RemoteSTTBackend
+                preprocessor = None
+                if current_app.config['AUDIO_PREPROCESS']:
+                    from utils.audio_preprocess import AudioPreprocessor
+                    preprocessor = AudioPreprocessor.from_config(current_app.config)
+                _stt_backend = RemoteSTTBackend(
+                    _get_inference_client(),
+                    pool_size=current_app.config['STT_POOL_SIZE'],
+                    language=current_app.config['STT_LANGUAGE'],
+                    preprocessor=preprocessor
+                )
+            elif _stt_backend is None:
+                from utils.stt import create_stt_backend
+                _stt_backend = create_stt_backend(current_app.config)
+    return _stt_backend
+
 def speech_to_text(audio_file_path):
-    """Convert audio file to text using speech_recognition (Google API)."""
-    recognizer = sr.Recognizer()
+    """Convert audio file to text using the configured STT backend (Config.STT_BACKEND)."""
+    return transcribe_audio(audio_file_path)[0]
+
+def transcribe_audio(audio_file_path):
+    """Transcript plus AudioStats (file vs. speech duration; None when AUDIO_PREPROCESS is off)."""
+    from utils.inference import InferenceError
     try:
-        with sr.AudioFile(audio_file_path) as source:
-            audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio)
-            return text
+        return get_stt_backend().transcribe_file(audio_file_path)
+    except InferenceError:
+        raise
     except Exception as e:
         print(f"Speech recognition error: {e}")
-        return None
+        return None, None
 
 __all__ = [
-    'generate_token', 'verify_token',
-    'semantic_similarity', 'award_points',
-    'analyze_frame',
-    'speech_to_text'
+    'generate_token', 'verify_token', 'verify_claims', 'revoke_token',
+    'semantic_similarity', 'award_points', 'score_answer',
+    'expected_embedding', 'reference_embeddings', 'prewarm_expected_embeddings', 'invalidate_expected_embedding',
+    'analyze_frame', 'analyze_frame_bytes', 'get_proctoring_engine', 'warm_proctoring',
+    'speech_to_text', 'transcribe_audio', 'get_stt_backend'
 ]
@@ -0,0 +1,38 @@
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    from app import create_app
+
+    def make(blueprints):
+        class TestConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 't.db')
+            UPLOAD_FOLDER = str(tmp_path / 'uploads')
+            TRANSCRIPT_JOURNAL_DIR = str(tmp_path / 'journal')
+            STARTUP_WARMUP = 'none'
+            APP_BLUEPRINTS = blueprints
+        return create_app(TestConfig)
+
+    return make
+
+
+def test_only_extensions_of_served_blueprints_start(make_app):
+    assert set(make_app(['auth']).extensions) == {'sqlalchemy', 'warmup'}
+    assert set(make_app(['auth', 'proctoring']).extensions) == {'sqlalchemy', 'warmup', 'proctoring_monitor'}
+    extensions = make_app(['transcript']).extensions
+    assert {'audio_streams', 'transcript_buffer'} <= set(extensions)
+    assert 'grading_queue' not in extensions and 'audio_maintenance' not in extensions
+
+
+def test_healthz_is_unavailable_after_a_failed_warmup_step(make_app):
+    app = make_app(['auth'])
+    client = app.test_client()
+    assert client.get('/healthz').status_code == 200
+
+    app.extensions['warmup'].results['sbert'] = {'error': 'SBERT model not loaded'}
+    response = client.get('/healthz')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'failed'
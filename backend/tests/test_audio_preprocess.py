@@ -0,0 +1,88 @@
+import wave
+
+import numpy as np
+import pytest
+
+from utils.audio_preprocess import AudioPreprocessor, read_wav, resample
+
+RATE = 16000
+
+
+def tone(seconds, dbfs, freq=220.0, rate=RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    return (10 ** (dbfs / 20) * np.sqrt(2) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def noise(seconds, dbfs, seed=0, rate=RATE):
+    return (10 ** (dbfs / 20) * np.random.default_rng(seed).standard_normal(int(seconds * rate))).astype(np.float32)
+
+
+def pcm(x):
+    return (np.clip(x, -1, 1) * 32767).astype('<i2').tobytes()
+
+
+@pytest.fixture
+def pre():
+    return AudioPreprocessor(target_rate=RATE)
+
+
+def test_trims_leading_trailing_silence_and_long_pauses(pre):
+    quiet = lambda s: noise(s, -70)
+    x = np.concatenate([quiet(4), tone(1.5, -20), quiet(5), tone(1.0, -20), quiet(3)])
+    stats = pre.process(x, RATE).stats
+    assert stats.file_seconds == pytest.approx(14.5)
+    # 2.5 s of speech + 200 ms padding at each edge + one pause shortened to 400 ms
+    assert 2.5 < stats.speech_seconds < 4.0
+
+
+def test_recording_without_pauses_is_kept_whole(pre):
+    x = noise(3, -20)
+    assert pre.process(x, RATE).stats.speech_seconds == pytest.approx(3.0, abs=0.05)
+
+
+def test_quiet_speech_is_not_dropped(pre):
+    # -52 dBFS speech, 23 dB above its noise floor, sits under the absolute -50 dBFS floor
+    x = np.concatenate([noise(1, -75), tone(1.5, -52), noise(1, -75)])
+    audio = pre.process(x, RATE)
+    assert audio.stats.speech_seconds > 1.0
+    assert pre.has_speech(pcm(tone(1, -52)), RATE)
+
+
+def test_digital_silence_has_no_speech_but_is_still_recognised(pre):
+    x = np.zeros(2 * RATE, dtype=np.float32)
+    audio = pre.process(x, RATE)
+    assert audio.stats.speech_seconds == 0.0
+    # nothing passed the VAD, so the untrimmed recording goes to the recogniser
+    assert len(audio.pcm) == 2 * len(x)
+    assert not pre.has_speech(pcm(x), RATE)
+
+
+def test_normalizes_loudness_with_peak_limit(pre):
+    out = pre.normalize(tone(1, -40), RATE)
+    rms_db = 20 * np.log10(np.sqrt(np.mean(out ** 2)))
+    assert rms_db == pytest.approx(-20, abs=0.5)
+    assert np.abs(out).max() <= 10 ** (-1 / 20) + 1e-6
+
+
+def test_downmix_and_resample_48k_stereo(pre):
+    x = tone(1, -20, rate=48000)
+    audio = pre.process(np.stack([x, x], axis=1), 48000)
+    assert audio.sample_rate == RATE
+    assert audio.stats.channels == 2 and audio.stats.sample_rate == 48000
+    assert len(resample(x, 48000, RATE)) == RATE
+
+
+@pytest.mark.parametrize('width', [1, 2, 4])
+def test_read_wav_sample_widths(tmp_path, width):
+    x = tone(0.1, -6)
+    ints = {1: ((x * 127) + 128).astype(np.uint8), 2: (x * 32767).astype('<i2'),
+            4: (x * 2147483647).astype('<i4')}[width]
+    path = tmp_path / 'a.wav'
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(width)
+        wf.setframerate(RATE)
+        wf.writeframes(ints.tobytes())
+    samples, rate = read_wav(str(path))
+    assert rate == RATE and samples.shape == (len(x), 1)
+    assert np.allclose(samples[:, 0], x, atol=2e-2)
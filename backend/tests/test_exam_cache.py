@@ -0,0 +1,64 @@
+import pytest
+from flask import Flask
+
+from utils.content_version import bump_version, exam_key
+from utils.database import db
+from utils.exam_cache import ExamContentCache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 't.db')
+    db.init_app(app)
+    with app.app_context():
+        import model  # noqa: F401 -- registers the tables
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def exam(app):
+    from model import Exam, Question
+    exam = Exam(title='T', description='', educator_id=1, duration_minutes=5)
+    db.session.add(exam)
+    db.session.flush()
+    db.session.add(Question(exam_id=exam.id, question_text='capital?', expected_answer='Paris', order=1))
+    db.session.commit()
+    return exam
+
+
+def edit_first_question(exam_id, expected_answer):
+    from model import Question
+    question = Question.query.filter_by(exam_id=exam_id).first()
+    question.expected_answer = expected_answer
+    bump_version(exam_key(exam_id))
+    db.session.commit()
+
+
+def test_edit_in_another_worker_is_seen_on_the_next_get(app, exam):
+    mine, theirs = ExamContentCache(), ExamContentCache()
+    assert mine.get(exam.id).questions[0].expected_answer == 'Paris'
+    assert mine.get(exam.id) is mine.get(exam.id)
+
+    edit_first_question(exam.id, 'Paris, France')  # theirs never invalidates mine
+    theirs.invalidate(exam.id)
+    assert mine.get(exam.id).questions[0].expected_answer == 'Paris, France'
+    assert mine.get(exam.id).version == 1
+
+
+def test_copy_with_an_old_version_is_reloaded(app, exam):
+    cache = ExamContentCache()
+    stale = cache.get(exam.id)
+    edit_first_question(exam.id, 'Paris, France')
+    fresh = cache.get(exam.id)
+    with cache._lock:
+        cache._entries[exam.id] = stale
+    assert cache.get(exam.id).version == fresh.version
+
+
+def test_missing_exam_is_not_cached(app):
+    cache = ExamContentCache()
+    assert cache.get(42) is None
+    assert cache._entries == {}
@@ -0,0 +1,62 @@
+import pytest
+
+from utils.lexical_match import LexicalPrefilter, tokens
+
+
+@pytest.fixture
+def prefilter():
+    return LexicalPrefilter()
+
+
+@pytest.mark.parametrize('answer, references, tier', [
+    ('Paris', ['paris'], 'exact'),
+    ('The Eiffel Tower!', ['eiffel tower'], 'exact'),
+    ("It's Paris", ['Paris'], 'token'),
+    ('I think it is Jupiter', ['Jupiter'], 'token'),
+    ("It's the Eiffel Tower", ['Eiffel Tower'], 'token'),
+    ('the vitamin A', ['Vitamin A'], 'exact'),
+    ('A', ['a'], 'exact'),
+    ('', ['Paris'], 'empty'),
+])
+def test_decided(prefilter, answer, references, tier):
+    decision = prefilter.decide(answer, references)
+    assert decision is not None and decision.tier == tier
+    assert decision.similarity == (0.0 if tier == 'empty' else 1.0)
+
+
+# near misses and synonyms must reach SBERT rather than be decided lexically
+@pytest.mark.parametrize('answer, references', [
+    ('mitosis', ['meiosis']),
+    ('Australia', ['Austria']),
+    ('Saturn or Jupiter', ['Jupiter']),
+    ('not Paris', ['Paris']),
+    ('1000', ['10000']),
+    ('United States', ['USA']),
+    ('automobile', ['car']),
+    ('seventeen', ['17']),
+    ('man bites dog', ['dog bites man']),
+    ('effect', ['affect']),
+    # one edit apart but different words: never accepted lexically
+    ('Ireland', ['Iceland']),
+    ('photons', ['protons']),
+    ('desert', ['dessert']),
+    ('complement', ['compliment']),
+    ('jupitor', ['Jupiter']),
+    # an article inside the reference is content
+    ('vitamin', ['Vitamin A']),
+    ('I think vitamin', ['Vitamin A']),
+])
+def test_undecided(prefilter, answer, references):
+    assert prefilter.decide(answer, references) is None
+
+
+def test_no_references_is_undecided(prefilter):
+    assert prefilter.decide('Paris', []) is None
+    assert prefilter.decide('Paris', ['', None]) is None
+
+
+def test_tokens_normalisation():
+    assert tokens('  The   Capital, of France! ') == ('capital', 'of', 'france')
+    assert tokens('Vitamin A') == ('vitamin', 'a')
+    assert tokens('a') == ('a',)
+
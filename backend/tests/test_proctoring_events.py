@@ -0,0 +1,61 @@
+import pytest
+from flask import Flask
+
+from utils.database import db
+from utils.proctoring_events import ProctoringMonitor
+
+NO_FACE = {'face_detected': False}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 't.db')
+    db.init_app(app)
+    with app.app_context():
+        import model  # noqa: F401 -- registers the tables
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def make_attempt(status):
+    from model import ExamAttempt
+    attempt = ExamAttempt(exam_id=1, student_id=7, status=status)
+    db.session.add(attempt)
+    db.session.commit()
+    return attempt.id
+
+
+def status_and_score(attempt_id):
+    from model import ExamAttempt
+    db.session.expire_all()
+    attempt = db.session.get(ExamAttempt, attempt_id)
+    return attempt.status, attempt.suspicion_score
+
+
+def record_until_flagged(monitor, attempt_id):
+    state = monitor.attempt_state(attempt_id, 7)
+    while not monitor.record(attempt_id, state, NO_FACE)['flagged']:
+        pass
+
+
+def test_in_progress_attempt_is_flagged(app):
+    attempt_id = make_attempt('in_progress')
+    record_until_flagged(ProctoringMonitor(flag_threshold=2.0, flush_size=100), attempt_id)
+    status, score = status_and_score(attempt_id)
+    assert status == 'flagged' and score >= 2.0
+
+
+def test_late_batch_keeps_completed_attempt_completed(app):
+    attempt_id = make_attempt('in_progress')
+    monitor = ProctoringMonitor(flag_threshold=2.0, flush_size=100)
+    state = monitor.attempt_state(attempt_id, 7)
+    monitor.record(attempt_id, state, NO_FACE)
+    # the attempt finished on another worker before this batch reached the threshold
+    db.session.execute(db.text("UPDATE exam_attempt SET status = 'completed' WHERE id = :id"),
+                       {'id': attempt_id})
+    db.session.commit()
+    record_until_flagged(monitor, attempt_id)
+    status, score = status_and_score(attempt_id)
+    assert status == 'completed' and score >= 2.0
@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from utils.inference import InferenceError
+from utils.scoring_engine import ScoringEngine, ScoringUnavailable
+
+
+class FakeModel:
+    def __init__(self, delay=None, fail=False):
+        self.delay = delay or threading.Event()
+        self.fail = fail
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if self.fail:
+            raise RuntimeError('CUDA out of memory')
+        self.delay.wait(5)
+        return np.array([[1.0, 0.0] if 'paris' in t.lower() else [0.0, 1.0] for t in texts], dtype=np.float32)
+
+
+def test_scores_best_reference():
+    gate = threading.Event()
+    gate.set()
+    engine = ScoringEngine(FakeModel(gate), max_wait_ms=0)
+    refs = np.array([[0.0, 1.0], [1.0, 0.0]], dtype=np.float32)
+    assert engine.score('Paris', refs, timeout=5) == pytest.approx(1.0)
+
+
+def test_timeout_is_retryable():
+    gate = threading.Event()
+    engine = ScoringEngine(FakeModel(gate), max_wait_ms=0)
+    try:
+        with pytest.raises(ScoringUnavailable, match='timed out'):
+            engine.score('Paris', np.ones((1, 2), dtype=np.float32), timeout=0.05)
+    finally:
+        gate.set()
+
+
+def test_batch_failure_is_retryable():
+    engine = ScoringEngine(FakeModel(fail=True), max_wait_ms=0)
+    with pytest.raises(ScoringUnavailable, match='out of memory') as info:
+        engine.score('Paris', np.ones((1, 2), dtype=np.float32), timeout=5)
+    assert isinstance(info.value, InferenceError)
+
+
+def test_semantic_similarity_raises_instead_of_scoring_zero(monkeypatch):
+    import service
+    app = Flask(__name__)
+    app.config['SCORING_TIMEOUT_SECONDS'] = 0.05
+    gate = threading.Event()
+    monkeypatch.setattr(service, '_scoring_engine', ScoringEngine(FakeModel(gate), max_wait_ms=0))
+    monkeypatch.setattr(service, 'reference_embeddings', lambda qid, refs: np.ones((len(refs), 2), np.float32))
+    try:
+        with app.app_context(), pytest.raises(ScoringUnavailable):
+            service.semantic_similarity('Paris', 'Paris is the capital', question_id=1)
+    finally:
+        gate.set()
+    assert service.semantic_similarity('', 'Paris is the capital') == 0.0
@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.scoring_policy import ScoringPolicy, reference_texts
+
+SIMS = [0.0, 0.39, 0.4, 0.5, 0.65, 0.7, 0.85, 0.9, 1.0]
+
+
+def credit(policy, sims=SIMS, default=0.6):
+    return ScoringPolicy.from_dict(policy).credit(sims, default).tolist()
+
+
+def test_threshold_credit_uses_own_or_global_threshold():
+    assert credit({'mode': 'threshold', 'threshold': 0.7}) == [0, 0, 0, 0, 0, 1, 1, 1, 1]
+    assert credit({'mode': 'threshold'}, default=0.5) == [0, 0, 0, 1, 1, 1, 1, 1, 1]
+
+
+def test_linear_credit_ramps_between_floor_and_ceiling():
+    got = credit({'mode': 'linear', 'floor': 0.4, 'ceiling': 0.9})
+    assert got == pytest.approx([0, 0, 0, 0.2, 0.5, 0.6, 0.9, 1, 1])
+
+
+def test_piecewise_credit_takes_highest_reached_step():
+    steps = [[0.8, 1.0], [0.5, 0.25], [0.65, 0.5]]  # unsorted on purpose
+    assert credit({'mode': 'piecewise', 'steps': steps}) == [0, 0, 0, 0.25, 0.5, 0.5, 1, 1, 1]
+
+
+def test_award_many_rounds_and_applies_keywords():
+    policy = ScoringPolicy.from_dict({'mode': 'linear', 'floor': 0.0, 'ceiling': 1.0,
+                                      'keywords': ['chlorophyll', 'light energy'], 'keyword_mode': 'all'})
+    texts = ['Chlorophyll absorbs light energy.', 'chlorophyll only', 'LIGHT ENERGY and chlorophyll']
+    points = policy.award_many([0.74, 0.9, 0.26], texts, 10, 0.5)
+    assert points.tolist() == [7, 0, 3]
+    assert points.dtype.kind == 'i'
+
+
+def test_keyword_any_mode_and_whole_word_match():
+    policy = ScoringPolicy.from_dict({'keywords': ['cell', 'nucleus'], 'keyword_mode': 'any'})
+    assert policy.award(0.9, 'the nucleus', 5, 0.5) == 5
+    assert policy.award(0.9, 'cellular stuff', 5, 0.5) == 0  # 'cell' is not a word here
+    assert policy.award(0.4, 'the cell', 5, 0.5) == 0
+
+
+def test_award_matches_award_many():
+    policy = ScoringPolicy.from_dict({'mode': 'piecewise', 'steps': [[0.5, 0.5], [0.9, 1.0]]})
+    sims = np.linspace(0, 1, 11)
+    many = policy.award_many(sims, [''] * len(sims), 4, 0.5).tolist()
+    assert many == [policy.award(s, '', 4, 0.5) for s in sims]
+
+
+@pytest.mark.parametrize('data, message', [
+    ({'mode': 'nope'}, 'mode must be one of'),
+    ({'mode': 'threshold', 'threshold': 1.5}, 'between 0 and 1'),
+    ({'mode': 'linear', 'floor': 0.8, 'ceiling': 0.5}, 'ceiling must be greater'),
+    ({'mode': 'piecewise', 'steps': []}, 'non-empty steps'),
+    ({'mode': 'piecewise', 'steps': [[0.5]]}, 'pairs'),
+    ({'keywords': ['ok', ' ']}, 'keywords'),
+    ({'keyword_mode': 'most'}, 'keyword_mode'),
+    ({'references': 'Paris'}, 'references'),
+])
+def test_invalid_policies_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        ScoringPolicy.from_dict(data)
+
+
+def test_parse_round_trips_through_json():
+    data = {'mode': 'piecewise', 'steps': [[0.5, 0.25], [0.8, 1.0]],
+            'keywords': ['paris'], 'keyword_mode': 'all', 'references': ['the french capital']}
+    policy = ScoringPolicy.parse(json.dumps(data))
+    assert ScoringPolicy.parse(policy.to_json()).to_dict() == data
+    assert ScoringPolicy.parse(None) is None and ScoringPolicy.parse('') is None
+    with pytest.raises(ValueError, match='not valid JSON'):
+        ScoringPolicy.parse('{')
+
+
+def test_reference_texts_puts_expected_first_without_duplicates():
+    policy = ScoringPolicy.from_dict({'references': ['Paris', 'the French capital', 'the French capital']})
+    assert reference_texts('Paris', policy) == ('Paris', 'the French capital')
+    assert reference_texts('', policy) == ('Paris', 'the French capital')
+    assert reference_texts('Paris', None) == ('Paris',)
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from utils.database import db
+from utils.transcript_buffer import TranscriptBuffer
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 't.db')
+    db.init_app(app)
+    with app.app_context():
+        import model  # noqa: F401 -- registers the tables
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def answer(app):
+    from model import Answer
+    ans = Answer(attempt_id=1, question_id=1, spoken_text='')
+    db.session.add(ans)
+    db.session.commit()
+    return ans
+
+
+def make_buffer(app, journal_dir, **kwargs):
+    # the background flush never fires during a test
+    return TranscriptBuffer(app, durability='journal', flush_interval_ms=10 ** 9,
+                            flush_max_fragments=100, journal_dir=str(journal_dir), **kwargs)
+
+
+def crash(buffer):
+    # a dead process leaves its journal behind and releases the lock
+    buffer._journal._file.close()
+
+
+def spoken_text(answer_id):
+    from model import Answer
+    db.session.expire_all()
+    return db.session.get(Answer, answer_id).spoken_text
+
+
+def test_replays_fragments_left_after_a_crash(app, answer, tmp_path):
+    first = make_buffer(app, tmp_path / 'j')
+    first.append(1, 1, answer, 'the capital')
+    first.append(1, 1, answer, 'is')
+    first.flush(1, 1)
+    first.append(1, 1, answer, 'paris')
+    crash(first)
+    assert spoken_text(answer.id) == 'the capital is'
+
+    second = make_buffer(app, tmp_path / 'j')
+    assert second.replay_journals() == 1
+    assert spoken_text(answer.id) == 'the capital is paris'
+    assert os.listdir(tmp_path / 'j') == [os.path.basename(second._journal.path)]
+
+
+def test_live_journal_is_not_replayed(app, answer, tmp_path):
+    first = make_buffer(app, tmp_path / 'j')
+    first.append(1, 1, answer, 'paris')
+    second = make_buffer(app, tmp_path / 'j')
+    assert first._journal.path != second._journal.path
+    assert second.replay_journals() == 0
+    assert spoken_text(answer.id) == ''
+
+
+def test_flush_marker_keeps_fragments_journaled_during_the_flush(app, answer, tmp_path):
+    directory = tmp_path / 'j'
+    directory.mkdir()
+    records = [
+        {'answer_id': answer.id, 'seq': 1, 'text': 'the capital'},
+        {'answer_id': answer.id, 'seq': 2, 'text': 'is'},   # appended while seq 1 was being written
+        {'answer_id': answer.id, 'flushed': 1},
+        {'answer_id': answer.id, 'seq': 3, 'text': 'paris'},
+    ]
+    (directory / 'transcript-1-dead.journal').write_text(
+        ''.join(json.dumps(r) + '\n' for r in records) + '{"answer_id": 1, "te')  # torn last line
+    buffer = make_buffer(app, directory)
+    assert buffer.replay_journals() == 1
+    assert spoken_text(answer.id) == 'is paris'
+
+
+def test_compaction_keeps_only_pending_fragments(app, answer, tmp_path):
+    first = make_buffer(app, tmp_path / 'j', journal_compact_bytes=1)
+    for word in ('the', 'capital', 'is'):
+        first.append(1, 1, answer, word)
+    first.flush(1, 1)
+    first.append(1, 1, answer, 'paris')
+    assert first.compact_journal()
+    with open(first._journal.path, encoding='utf-8') as f:
+        assert [json.loads(line)['text'] for line in f] == ['paris']
+    first.append(1, 1, answer, 'france')
+    crash(first)
+
+    assert make_buffer(app, tmp_path / 'j').replay_journals() == 1
+    assert spoken_text(answer.id) == 'the capital is paris france'
+
+
+def test_fragments_flushed_after_grading_are_kept_aside(app, answer, tmp_path):
+    from model import Answer
+    buffer = make_buffer(app, tmp_path / 'j')
+    buffer.append(1, 1, answer, 'paris')
+    # move-next ran on another worker and graded the answer first
+    db.session.get(Answer, answer.id).spoken_text = 'the capital'
+    db.session.get(Answer, answer.id).finalized = True
+    db.session.commit()
+    buffer.flush(1, 1)
+    db.session.expire_all()
+    graded = db.session.get(Answer, answer.id)
+    assert (graded.spoken_text, graded.late_text) == ('the capital', 'paris')
@@ -0,0 +1,261 @@
+"""
+Educator analytics for one exam, aggregated in the database.
+
+Attempt-level figures (finished / flagged / pass counts, score sum, time to
+complete, score histogram) come from the ExamStats / ExamScoreBucket summary
+rows when ANALYTICS_SUMMARY_TABLES is on. Those rows are adjusted by delta
+inside the transaction that finishes an attempt (record_attempt), and rebuilt
+with GROUP BY queries when missing or when the exam's max points changed.
+Status counts, per-question figures and the count of answers per grading tier
+(Answer.scored_by) are always live GROUP BY queries over the (exam_id, status)
+and (question_id, finalized) indexes, since answers can still be graded after
+their attempt has finished.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from sqlalchemy import Integer, and_, case, cast, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from utils.database import db
+
+BUCKETS = 10
+
+
+class AttemptSnapshot(NamedTuple):
+    finished: bool
+    flagged: bool
+    score: float
+    duration: float | None
+
+
+def _utc_naive(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def snapshot(attempt) -> AttemptSnapshot:
+    started, completed = _utc_naive(attempt.started_at), _utc_naive(attempt.completed_at)
+    duration = (completed - started).total_seconds() if started and completed else None
+    return AttemptSnapshot(completed is not None, attempt.status == 'flagged',
+                           float(attempt.total_score or 0), duration)
+
+
+def pass_points(max_points: int, pass_ratio: float) -> float:
+    return max_points * pass_ratio
+
+
+def score_bucket(score: float, max_points: int) -> int | None:
+    if max_points <= 0:
+        return None
+    return min(BUCKETS - 1, max(0, math.floor(score * BUCKETS / max_points)))
+
+
+def _duration_expr():
+    from model import ExamAttempt as A
+    if db.engine.dialect.name == 'postgresql':
+        return func.extract('epoch', A.completed_at - A.started_at)
+    return (func.julianday(A.completed_at) - func.julianday(A.started_at)) * 86400.0
+
+
+def _bucket_expr(score, max_points: int):
+    raw = score * BUCKETS / float(max_points)
+    if db.engine.dialect.name == 'postgresql':
+        raw = func.floor(raw)
+    raw = cast(raw, Integer)
+    return case((raw >= BUCKETS, BUCKETS - 1), (raw < 0, 0), else_=raw)
+
+
+# attempt-level totals straight from exam_attempt
+def live_totals(exam_id: int, max_points: int, pass_ratio: float) -> dict:
+    from model import ExamAttempt as A
+    score = func.coalesce(A.total_score, 0)
+    duration = _duration_expr()
+    finished = and_(A.exam_id == exam_id, A.completed_at.is_not(None))
+    row = db.session.execute(select(
+        func.count(),
+        func.coalesce(func.sum(case((A.status == 'flagged', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((score >= pass_points(max_points, pass_ratio), 1), else_=0)), 0),
+        func.coalesce(func.sum(score), 0),
+        func.coalesce(func.sum(duration), 0),
+        func.count(duration)
+    ).where(finished)).one()
+    buckets = {}
+    if max_points > 0:
+        bucket = _bucket_expr(score, max_points)
+        buckets = dict(db.session.execute(select(bucket, func.count()).where(finished).group_by(bucket)).all())
+    return {
+        'finished': int(row[0]),
+        'flagged': int(row[1]),
+        'passed': int(row[2]) if max_points > 0 else 0,
+        'score_sum': float(row[3]),
+        'duration_sum': float(row[4]),
+        'duration_count': int(row[5]),
+        'max_points': max_points,
+        'buckets': {int(b): int(n) for b, n in buckets.items()}
+    }
+
+
+# replace an exam's summary rows with live totals; caller commits
+def rebuild_summary(exam_id: int, max_points: int, pass_ratio: float) -> dict:
+    from model import ExamStats, ExamScoreBucket
+    totals = live_totals(exam_id, max_points, pass_ratio)
+    db.session.execute(delete(ExamScoreBucket).where(ExamScoreBucket.exam_id == exam_id))
+    db.session.execute(delete(ExamStats).where(ExamStats.exam_id == exam_id))
+    db.session.execute(insert(ExamStats).values(
+        exam_id=exam_id, updated_at=datetime.now(timezone.utc),
+        **{k: v for k, v in totals.items() if k != 'buckets'}
+    ))
+    if totals['buckets']:
+        db.session.execute(insert(ExamScoreBucket), [
+            {'exam_id': exam_id, 'bucket': b, 'count': n} for b, n in totals['buckets'].items()
+        ])
+    return totals
+
+
+def _add_to_bucket(exam_id: int, bucket: int, delta: int) -> None:
+    from model import ExamScoreBucket
+    stmt = (update(ExamScoreBucket)
+            .where(ExamScoreBucket.exam_id == exam_id, ExamScoreBucket.bucket == bucket)
+            .values(count=ExamScoreBucket.count + delta))
+    if db.session.execute(stmt).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(ExamScoreBucket).values(exam_id=exam_id, bucket=bucket, count=delta))
+    except IntegrityError:
+        db.session.execute(stmt)
+
+
+# fold one attempt's change (before -> now) into the summary, in the caller's transaction
+def record_attempt(attempt, before: AttemptSnapshot, max_points: int, pass_ratio: float) -> None:
+    from model import ExamStats
+    db.session.flush()
+    after = snapshot(attempt)
+    if after == before:
+        return
+    limit = pass_points(max_points, pass_ratio)
+
+    def contribution(s: AttemptSnapshot) -> dict:
+        if not s.finished:
+            return {'finished': 0, 'flagged': 0, 'passed': 0, 'score_sum': 0.0,
+                    'duration_sum': 0.0, 'duration_count': 0}
+        return {
+            'finished': 1,
+            'flagged': int(s.flagged),
+            'passed': int(max_points > 0 and s.score >= limit),
+            'score_sum': s.score,
+            'duration_sum': s.duration or 0.0,
+            'duration_count': int(s.duration is not None)
+        }
+
+    new, old = contribution(after), contribution(before)
+    stmt = (update(ExamStats)
+            .where(ExamStats.exam_id == attempt.exam_id, ExamStats.max_points == max_points)
+            .values(updated_at=datetime.now(timezone.utc),
+                    **{k: getattr(ExamStats, k) + (new[k] - old[k]) for k in new}))
+    if not db.session.execute(stmt).rowcount:
+        # no summary yet (or max points changed): the rebuild already sees this attempt
+        try:
+            with db.session.begin_nested():
+                rebuild_summary(attempt.exam_id, max_points, pass_ratio)
+            return
+        except IntegrityError:
+            # another worker rebuilt it concurrently, without this attempt
+            if not db.session.execute(stmt).rowcount:
+                return
+
+    for snap, sign in ((before, -1), (after, 1)):
+        bucket = score_bucket(snap.score, max_points) if snap.finished else None
+        if bucket is not None:
+            _add_to_bucket(attempt.exam_id, bucket, sign)
+
+
+def _attempt_totals(exam_id: int, max_points: int, pass_ratio: float, use_summary: bool) -> tuple[dict, str]:
+    from model import ExamStats, ExamScoreBucket
+    if not use_summary:
+        return live_totals(exam_id, max_points, pass_ratio), 'live'
+    stats = db.session.get(ExamStats, exam_id)
+    if stats is None or stats.max_points != max_points:
+        totals = rebuild_summary(exam_id, max_points, pass_ratio)
+        db.session.commit()
+        return totals, 'summary'
+    buckets = db.session.execute(
+        select(ExamScoreBucket.bucket, ExamScoreBucket.count).where(ExamScoreBucket.exam_id == exam_id)
+    ).all()
+    totals = {k: getattr(stats, k) for k in
+              ('finished', 'flagged', 'passed', 'score_sum', 'duration_sum', 'duration_count', 'max_points')}
+    totals['buckets'] = {int(b): int(n) for b, n in buckets}
+    return totals, 'summary'
+
+
+def exam_analytics(exam_id: int, max_points: int, pass_ratio: float, use_summary: bool = True) -> dict:
+    from model import Answer, ExamAttempt, Question
+
+    by_status = dict(db.session.execute(
+        select(ExamAttempt.status, func.count()).where(ExamAttempt.exam_id == exam_id).group_by(ExamAttempt.status)
+    ).all())
+    totals, source = _attempt_totals(exam_id, max_points, pass_ratio, use_summary)
+    finished = totals['finished']
+
+    per_question = db.session.execute(
+        select(Question.id, Question.order, Question.question_text, Question.points,
+               func.count(Answer.id), func.avg(Answer.similarity_score), func.avg(Answer.points_awarded),
+               func.coalesce(func.sum(case((Answer.points_awarded >= Question.points, 1), else_=0)), 0))
+        .select_from(Question)
+        .outerjoin(Answer, and_(Answer.question_id == Question.id, Answer.finalized.is_(True)))
+        .where(Question.exam_id == exam_id)
+        .group_by(Question.id, Question.order, Question.question_text, Question.points)
+        .order_by(Question.order)
+    ).all()
+
+    scored_by = dict(db.session.execute(
+        select(Answer.scored_by, func.count())
+        .join(Question, Question.id == Answer.question_id)
+        .where(Question.exam_id == exam_id, Answer.finalized.is_(True))
+        .group_by(Answer.scored_by)
+    ).all())
+
+    def rate(n, d):
+        return round(n / d, 4) if d else None
+
+    return {
+        'exam_id': exam_id,
+        'source': source,
+        'max_points': max_points,
+        'pass_ratio': pass_ratio,
+        'attempts': {
+            'total': sum(by_status.values()),
+            'by_status': {status or 'unknown': int(n) for status, n in by_status.items()},
+            'finished': finished,
+            'flagged': totals['flagged']
+        },
+        'score': {
+            'mean': rate(totals['score_sum'], finished),
+            'pass_rate': rate(totals['passed'], finished) if max_points > 0 else None,
+            'distribution': [{
+                'from_pct': b * 100 // BUCKETS,
+                'to_pct': (b + 1) * 100 // BUCKETS,
+                'count': totals['buckets'].get(b, 0)
+            } for b in range(BUCKETS)] if max_points > 0 else []
+        },
+        'scored_by': {tier or 'unknown': int(n) for tier, n in scored_by.items()},
+        'time_to_complete_seconds': {
+            'mean': rate(totals['duration_sum'], totals['duration_count'])
+        },
+        'questions': [{
+            'question_id': qid,
+            'order': order,
+            'question_text': text,
+            'points': points,
+            'answered': int(answered),
+            'avg_similarity': round(float(avg_sim), 4) if avg_sim is not None else None,
+            'avg_points': round(float(avg_pts), 3) if avg_pts is not None else None,
+            'correct_rate': rate(int(correct), int(answered))
+        } for qid, order, text, points, answered, avg_sim, avg_pts, correct in per_question]
+    }
@@ -0,0 +1,52 @@
+"""
+Shared answer helpers used by the answer and transcript blueprints.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import IntegrityError
+
+from model import Answer
+from utils.database import db
+
+
+def _insert_ignore(values: dict):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return (insert(Answer).values(**values)
+            .on_conflict_do_nothing(index_elements=['attempt_id', 'question_id']))
+
+
+# atomic get-or-create of the draft answer; safe against concurrent requests for the same question
+def get_or_create_draft_answer(attempt_id: int, question_id: int) -> Answer:
+    ans = Answer.query.filter_by(attempt_id=attempt_id, question_id=question_id).first()
+    if ans is not None:
+        return ans
+
+    values = {
+        'attempt_id': int(attempt_id),
+        'question_id': int(question_id),
+        'spoken_text': '',
+        'similarity_score': None,
+        'points_awarded': None,
+        'finalized': False,
+        'created_at': datetime.now(timezone.utc)
+    }
+    stmt = _insert_ignore(values)
+    if stmt is not None:
+        db.session.execute(stmt)
+        db.session.commit()
+    else:
+        try:
+            db.session.add(Answer(**values))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+    return Answer.query.filter_by(attempt_id=attempt_id, question_id=question_id).one()
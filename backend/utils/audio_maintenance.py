@@ -0,0 +1,170 @@
+"""
+Background upkeep of stored answer audio.
+
+Transcoding: once an answer has been graded, its upload is re-encoded to
+AUDIO_TRANSCODE ('flac' lossless, 'opus' speech-grade lossy, 'none' keeps the
+original) by a single background thread with ffmpeg. The new object keeps the
+upload's content digest, every answer / grading_job row pointing at the old
+key is moved to the new one, and the original is deleted. Audio still
+referenced by a queued or running grading job is not transcoded; a job
+queued for the same upload while ffmpeg runs keeps the original, which is
+then deleted once that job finishes and schedules it again. Uploads that
+dedupe against the original just before it goes resolve to the transcoded
+copy (AudioStore.resolve).
+
+Retention (opt-in): with AUDIO_RETENTION_DAYS > 0 a sweep every
+AUDIO_RETENTION_SWEEP_SECONDS deletes audio whose answers were all created
+before the cutoff and clears Answer.audio_file_path on them. Transcripts and
+scores are kept.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from utils.audio_store import (CODECS, content_key, ffmpeg_available, key_digest, key_extension,
+                               transcode_file)
+from utils.database import db
+
+PENDING_JOB_STATES = ('queued', 'running')
+
+
+def _file_digest(path: str, chunk_bytes: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioMaintenance:
+    def __init__(self, app, store, codec: str = 'flac', opus_bitrate: str = '24k',
+                 retention_days: float = 0, sweep_seconds: float = 3600, batch_size: int = 500):
+        if codec not in ('none', *CODECS):
+            raise ValueError(f"Unknown AUDIO_TRANSCODE '{codec}' (choose from none, {', '.join(CODECS)})")
+        self.app = app
+        self.store = store
+        self.codec = codec
+        self.opus_bitrate = opus_bitrate
+        self.retention_days = float(retention_days)
+        self.sweep_seconds = max(1.0, float(sweep_seconds))
+        self.batch_size = max(1, int(batch_size))
+        if codec != 'none' and not ffmpeg_available(store.ffmpeg_bin):
+            print(f"{store.ffmpeg_bin} not found; answer audio is kept untranscoded")
+            self.codec = 'none'
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audio-transcode')
+        self._scheduled: set[str] = set()
+        self._lock = threading.Lock()
+        if self.retention_days > 0:
+            self._thread = threading.Thread(target=self._sweep_loop, name='audio-retention', daemon=True)
+            self._thread.start()
+
+    # queue a graded answer's audio for transcoding
+    def schedule_transcode(self, key: str | None) -> None:
+        if not key or self.codec == 'none' or key_extension(key) == CODECS[self.codec][0]:
+            return
+        with self._lock:
+            if key in self._scheduled:
+                return
+            self._scheduled.add(key)
+        self._pool.submit(self._run_transcode, key)
+
+    def _run_transcode(self, key: str) -> None:
+        with self.app.app_context():
+            try:
+                self.transcode(key)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Audio transcode error ({key}): {e}")
+            finally:
+                with self._lock:
+                    self._scheduled.discard(key)
+
+    def _in_use(self, keys) -> bool:
+        from model import GradingJob
+        return db.session.scalar(
+            select(GradingJob.id)
+            .where(GradingJob.audio_file_path.in_(list(keys)), GradingJob.status.in_(PENDING_JOB_STATES))
+            .limit(1)
+        ) is not None
+
+    # point answers and finished jobs at the new key; True when no pending job still
+    # names the old one, checked in the same transaction
+    def _move_references(self, old: str, new: str) -> bool:
+        from model import Answer, GradingJob
+        db.session.execute(update(Answer).where(Answer.audio_file_path == old).values(audio_file_path=new))
+        db.session.execute(
+            update(GradingJob)
+            .where(GradingJob.audio_file_path == old, GradingJob.status.not_in(PENDING_JOB_STATES))
+            .values(audio_file_path=new)
+        )
+        unused = not self._in_use([old])
+        db.session.commit()
+        return unused
+
+    # re-encode one object; returns the new key, or None when it was left as is
+    def transcode(self, key: str) -> str | None:
+        if self.codec == 'none' or self._in_use([key]):
+            return None
+        ext = CODECS[self.codec][0]
+        with self.store.local_path(key) as src:
+            new_key = content_key(key_digest(key) or _file_digest(src), ext)
+            if not self.store.exists(new_key):
+                spool = self.store._spool_file('.' + ext)
+                spool.close()
+                try:
+                    transcode_file(src, spool.name, self.codec, self.store.ffmpeg_bin, self.opus_bitrate)
+                    self.store.put_file(spool.name, new_key)
+                finally:
+                    if os.path.exists(spool.name):
+                        os.remove(spool.name)
+        # a job may have been queued for this upload while ffmpeg ran
+        if self._move_references(key, new_key):
+            self.store.delete(key)
+        return new_key
+
+    # delete audio whose answers are all older than the retention window
+    def purge_expired(self, now: datetime | None = None) -> int:
+        from model import Answer
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+        recent = (select(Answer.audio_file_path)
+                  .where(Answer.audio_file_path.is_not(None), Answer.created_at >= cutoff))
+        expired = db.session.scalars(
+            select(Answer.audio_file_path).distinct()
+            .where(Answer.audio_file_path.is_not(None), Answer.created_at < cutoff,
+                   Answer.audio_file_path.not_in(recent))
+            .limit(self.batch_size)
+        ).all()
+        db.session.rollback()
+        purged = 0
+        for key in expired:
+            if self._in_use([key]):
+                continue
+            self.store.delete(key)
+            db.session.execute(update(Answer).where(Answer.audio_file_path == key).values(audio_file_path=None))
+            db.session.commit()
+            purged += 1
+        return purged
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_seconds)
+            with self.app.app_context():
+                try:
+                    while self.purge_expired() >= self.batch_size:
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Audio retention sweep error: {e}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
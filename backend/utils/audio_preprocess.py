@@ -0,0 +1,204 @@
+"""
+NumPy preprocessing of recorded answers before speech-to-text.
+
+    read WAV -> downmix to mono -> resample to AUDIO_TARGET_SAMPLE_RATE
+             -> energy VAD: trim leading/trailing silence, shorten long pauses
+             -> normalise speech loudness to AUDIO_TARGET_DBFS (peak-limited)
+             -> 16-bit PCM for STTBackend.transcribe_pcm
+
+The VAD works on 30 ms frames. A frame is speech when its RMS level is at
+least AUDIO_VAD_MARGIN_DB above the recording's noise floor (10th percentile
+frame level, capped at the margin below the 95th percentile so a recording
+without pauses is kept whole). The absolute AUDIO_VAD_FLOOR_DBFS only rejects
+near-digital silence: it is checked after the recording's gain has been
+normalised (loudest frame to -1 dBFS, at most AUDIO_VAD_MAX_GAIN_DB), so
+speech from a quiet microphone still counts. Speech regions are padded by
+AUDIO_VAD_PAD_MS on both sides, and any remaining pause longer than
+AUDIO_VAD_MAX_PAUSE_MS is cut down to that length, so word boundaries survive
+while dead air does not reach the recogniser. When no frame passes, the whole
+recording is recognised untrimmed rather than assumed silent; its stats then
+report speech_seconds = 0.
+"""
+
+from __future__ import annotations
+
+import wave
+from typing import NamedTuple
+
+import numpy as np
+
+FRAME_MS = 30
+_EPS = 1e-10
+
+
+class AudioStats(NamedTuple):
+    file_seconds: float
+    speech_seconds: float
+    sample_rate: int
+    channels: int
+
+
+class PreparedAudio(NamedTuple):
+    pcm: bytes
+    sample_rate: int
+    stats: AudioStats
+
+
+# float32 samples in [-1, 1], shape (frames, channels)
+def read_wav(path: str) -> tuple[np.ndarray, int]:
+    with wave.open(path, 'rb') as wf:
+        channels, width, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16))
+        samples = (np.where(ints >= 1 << 23, ints - (1 << 24), ints)).astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    return samples.reshape(-1, channels), rate
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    return samples.mean(axis=1, dtype=np.float32) if samples.ndim == 2 else samples.astype(np.float32)
+
+
+def _lowpass_kernel(cutoff: float, taps: int = 63) -> np.ndarray:
+    # windowed-sinc FIR; cutoff as a fraction of the input sample rate
+    n = np.arange(taps) - (taps - 1) / 2.0
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+# band-limit to the new Nyquist frequency, then interpolate onto the target grid
+def resample(x: np.ndarray, rate: int, target: int) -> np.ndarray:
+    if rate == target or len(x) == 0:
+        return x.astype(np.float32, copy=False)
+    if target < rate:
+        x = np.convolve(x, _lowpass_kernel(0.5 * target / rate * 0.9), mode='same')
+    n_out = int(round(len(x) * target / rate))
+    positions = np.arange(n_out, dtype=np.float64) * (rate / target)
+    return np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+
+
+def frame_levels(x: np.ndarray, frame: int) -> np.ndarray:
+    n = len(x) // frame
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = x[:n * frame].reshape(n, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1) + _EPS)
+    return 20 * np.log10(rms)
+
+
+def _dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    if radius <= 0 or not mask.any():
+        return mask
+    window = np.ones(2 * radius + 1, dtype=np.int32)
+    return np.convolve(mask.astype(np.int32), window, mode='same') > 0
+
+
+class AudioPreprocessor:
+    def __init__(self, target_rate: int = 16000, margin_db: float = 12.0, floor_dbfs: float = -50.0,
+                 pad_ms: float = 200, max_pause_ms: float = 400, target_dbfs: float = -20.0,
+                 peak_dbfs: float = -1.0, max_gain_db: float = 40.0):
+        self.target_rate = int(target_rate)
+        self.margin_db = float(margin_db)
+        self.floor_dbfs = float(floor_dbfs)
+        self.pad_ms = float(pad_ms)
+        self.max_pause_ms = float(max_pause_ms)
+        self.target_dbfs = float(target_dbfs)
+        self.peak_dbfs = float(peak_dbfs)
+        self.max_gain_db = max(0.0, float(max_gain_db))
+
+    @classmethod
+    def from_config(cls, config) -> 'AudioPreprocessor':
+        return cls(
+            target_rate=config.get('AUDIO_TARGET_SAMPLE_RATE', 16000),
+            margin_db=config.get('AUDIO_VAD_MARGIN_DB', 12.0),
+            floor_dbfs=config.get('AUDIO_VAD_FLOOR_DBFS', -50.0),
+            pad_ms=config.get('AUDIO_VAD_PAD_MS', 200),
+            max_pause_ms=config.get('AUDIO_VAD_MAX_PAUSE_MS', 400),
+            target_dbfs=config.get('AUDIO_TARGET_DBFS', -20.0),
+            max_gain_db=config.get('AUDIO_VAD_MAX_GAIN_DB', 40.0)
+        )
+
+    def _frame(self, rate: int) -> int:
+        return max(1, rate * FRAME_MS // 1000)
+
+    # gain (dB) that would bring the loudest frame to peak_dbfs, capped at max_gain_db
+    def _gain_db(self, levels: np.ndarray) -> float:
+        return float(np.clip(self.peak_dbfs - levels.max(), 0.0, self.max_gain_db))
+
+    # per-frame speech decision
+    def speech_mask(self, x: np.ndarray, rate: int) -> np.ndarray:
+        levels = frame_levels(x, self._frame(rate))
+        if len(levels) == 0:
+            return np.zeros(0, dtype=bool)
+        noise_floor, loud = np.percentile(levels, [10, 95])
+        # a recording without pauses has its "noise floor" at speech level; keep it whole
+        threshold = min(noise_floor + self.margin_db, loud - self.margin_db)
+        return (levels >= threshold) & (levels + self._gain_db(levels) >= self.floor_dbfs)
+
+    def has_speech(self, pcm: bytes, rate: int) -> bool:
+        x = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        levels = frame_levels(x, self._frame(rate))
+        return bool(len(levels)) and float(levels.max()) + self._gain_db(levels) >= self.floor_dbfs
+
+    # keep speech frames, padding, and pauses shortened to max_pause_ms
+    def trim(self, x: np.ndarray, rate: int) -> np.ndarray:
+        frame = self._frame(rate)
+        speech = self.speech_mask(x, rate)
+        if not speech.any():
+            return x[:0]
+        keep = _dilate(speech, int(round(self.pad_ms / FRAME_MS)))
+        max_pause = max(0, int(round(self.max_pause_ms / FRAME_MS)))
+        # within the spoken span, a gap longer than max_pause keeps only its first max_pause frames
+        first, last = np.flatnonzero(keep)[[0, -1]]
+        run = 0
+        for i in range(first, last + 1):
+            if keep[i]:
+                run = 0
+            else:
+                run += 1
+                keep[i] = run <= max_pause
+        keep[:first] = False
+        keep[last + 1:] = False
+        sample_mask = np.repeat(keep, frame)
+        tail = len(x) - len(sample_mask)
+        if tail > 0:
+            sample_mask = np.concatenate([sample_mask, np.zeros(tail, dtype=bool)])
+        return x[sample_mask]
+
+    def normalize(self, x: np.ndarray, rate: int) -> np.ndarray:
+        if len(x) == 0:
+            return x
+        speech = self.speech_mask(x, rate)
+        frame = self._frame(rate)
+        voiced = x[:len(speech) * frame].reshape(-1, frame)[speech] if speech.any() else x
+        rms = float(np.sqrt(np.mean(np.square(voiced)) + _EPS))
+        gain = 10 ** (self.target_dbfs / 20) / rms
+        peak = float(np.max(np.abs(x)))
+        if peak > 0:
+            gain = min(gain, 10 ** (self.peak_dbfs / 20) / peak)
+        return np.clip(x * gain, -1.0, 1.0)
+
+    def process(self, samples: np.ndarray, rate: int) -> PreparedAudio:
+        channels = samples.shape[1] if samples.ndim == 2 else 1
+        file_seconds = len(samples) / float(rate) if rate else 0.0
+        mono = resample(downmix(samples), rate, self.target_rate)
+        trimmed = self.trim(mono, self.target_rate)
+        speech_seconds = len(trimmed) / float(self.target_rate)
+        # nothing passed the VAD: let the recogniser hear everything rather than assume silence
+        speech = self.normalize(trimmed if len(trimmed) else mono, self.target_rate)
+        pcm = (speech * 32767.0).astype('<i2').tobytes()
+        stats = AudioStats(round(file_seconds, 3), round(speech_seconds, 3), int(rate), int(channels))
+        return PreparedAudio(pcm, self.target_rate, stats)
+
+    def load(self, path: str) -> PreparedAudio:
+        samples, rate = read_wav(path)
+        return self.process(samples, rate)
@@ -0,0 +1,307 @@
+"""
+Storage for uploaded answer audio, selected with Config.AUDIO_STORE:
+
+- 'local' : files under Config.UPLOAD_FOLDER
+- 's3'    : an S3-compatible bucket via boto3 (AUDIO_S3_ENDPOINT_URL points
+            it at MinIO or another local stand-in)
+
+Uploads are streamed in AUDIO_CHUNK_BYTES chunks into a spool file while
+being hashed, so no request body is held in memory. Objects are content
+addressed: the key is the SHA-256 of the uploaded bytes plus the container's
+extension (ab/cd/abcd...1234.wav), so a resubmission never overwrites another
+answer's audio and identical uploads are stored once. A transcoded copy keeps
+the digest of the original upload and only changes the extension, which lets
+later uploads of the same recording dedupe against it.
+
+Keys stored before content addressing (plain paths such as
+uploads/answer_1_2.wav) still resolve on the local backend.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import NamedTuple
+
+# target codec -> (extension, ffmpeg encoder arguments)
+CODECS = {
+    'flac': ('flac', ['-c:a', 'flac', '-compression_level', '8']),
+    'opus': ('opus', ['-c:a', 'libopus', '-application', 'voip']),
+}
+CONTENT_TYPES = {
+    'wav': 'audio/wav',
+    'flac': 'audio/flac',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+    'webm': 'audio/webm',
+}
+
+_CONTENT_KEY = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.(\w+)$')
+
+
+class AudioTooLarge(ValueError):
+    pass
+
+
+class UnsupportedAudio(ValueError):
+    pass
+
+
+class StoredAudio(NamedTuple):
+    key: str
+    size: int
+    digest: str
+    created: bool
+
+
+def content_key(digest: str, ext: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+# digest of a content-addressed key; None for legacy paths
+def key_digest(key: str) -> str | None:
+    match = _CONTENT_KEY.match(key or '')
+    return match.group(1) if match else None
+
+
+def key_extension(key: str) -> str:
+    return os.path.splitext(key or '')[1].lstrip('.').lower()
+
+
+# container from the first bytes of the upload
+def sniff_format(head: bytes) -> str | None:
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:4] == b'OggS':
+        return 'opus' if b'OpusHead' in head else 'ogg'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    return None
+
+
+def ffmpeg_available(binary: str = 'ffmpeg') -> bool:
+    return shutil.which(binary) is not None
+
+
+def _run_ffmpeg(binary: str, args) -> None:
+    result = subprocess.run([binary, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', *args],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()[:300]}")
+
+
+def transcode_file(src: str, dst: str, codec: str, binary: str = 'ffmpeg', opus_bitrate: str = '24k') -> None:
+    ext, encoder = CODECS[codec]
+    if codec == 'opus':
+        encoder = [*encoder, '-b:a', opus_bitrate]
+    _run_ffmpeg(binary, ['-i', src, '-vn', *encoder, '-f', 'ogg' if ext == 'opus' else ext, dst])
+
+
+# 16-bit mono 16 kHz WAV, the format every STT backend accepts
+def decode_to_wav(src: str, dst: str, binary: str = 'ffmpeg') -> None:
+    _run_ffmpeg(binary, ['-i', src, '-vn', '-ac', '1', '-ar', '16000', '-sample_fmt', 's16', '-f', 'wav', dst])
+
+
+class AudioStore:
+    name = 'base'
+
+    def __init__(self, spool_dir: str, chunk_bytes: int = 65536, max_bytes: int = 0, ffmpeg_bin: str = 'ffmpeg'):
+        self.spool_dir = spool_dir
+        self.chunk_bytes = max(4096, int(chunk_bytes))
+        self.max_bytes = max(0, int(max_bytes))
+        self.ffmpeg_bin = ffmpeg_bin
+        os.makedirs(spool_dir, exist_ok=True)
+
+    # backend primitives
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put_file(self, path: str, key: str) -> None:
+        """Store the local file at `path` under `key`; the file may be moved away."""
+        raise NotImplementedError
+
+    def local_path(self, key: str):
+        """Context manager yielding a readable local path for `key`."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _spool_file(self, suffix: str = ''):
+        return tempfile.NamedTemporaryFile(dir=self.spool_dir, suffix=suffix, delete=False)
+
+    # stream an upload into the store in fixed-size chunks
+    def save(self, stream) -> StoredAudio:
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+        spool = self._spool_file()
+        try:
+            with spool:
+                while True:
+                    chunk = stream.read(self.chunk_bytes)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise AudioTooLarge(f"Audio exceeds {self.max_bytes} bytes")
+                    if len(head) < 64:
+                        head += chunk[:64 - len(head)]
+                    digest.update(chunk)
+                    spool.write(chunk)
+            ext = sniff_format(head)
+            if ext is None:
+                raise UnsupportedAudio('Unsupported audio format (send WAV, FLAC, Ogg/Opus or WebM)')
+            hexdigest = digest.hexdigest()
+            # an identical upload, possibly already transcoded, is reused as is
+            for candidate in dict.fromkeys([ext, *(e for e, _ in CODECS.values())]):
+                key = content_key(hexdigest, candidate)
+                if self.exists(key):
+                    return StoredAudio(key, size, hexdigest, False)
+            key = content_key(hexdigest, ext)
+            self.put_file(spool.name, key)
+            return StoredAudio(key, size, hexdigest, True)
+        finally:
+            if os.path.exists(spool.name):
+                os.remove(spool.name)
+
+    # `key`, or a transcoded copy of the same upload once AudioMaintenance has
+    # replaced the original
+    def resolve(self, key: str) -> str:
+        digest = key_digest(key)
+        if digest is None or self.exists(key):
+            return key
+        for ext, _ in CODECS.values():
+            if self.exists(content_key(digest, ext)):
+                return content_key(digest, ext)
+        return key
+
+    # local WAV copy for speech-to-text; other containers are decoded with ffmpeg
+    @contextmanager
+    def wav_path(self, key: str):
+        key = self.resolve(key)
+        with self.local_path(key) as path:
+            if key_extension(key) == 'wav':
+                yield path
+                return
+            if not ffmpeg_available(self.ffmpeg_bin):
+                raise RuntimeError(f"ffmpeg is required to decode {key_extension(key)} audio")
+            spool = self._spool_file('.wav')
+            spool.close()
+            try:
+                decode_to_wav(path, spool.name, self.ffmpeg_bin)
+                yield spool.name
+            finally:
+                os.remove(spool.name)
+
+
+class LocalAudioStore(AudioStore):
+    name = 'local'
+
+    def __init__(self, root: str, **kwargs):
+        self.root = os.path.abspath(root)
+        super().__init__(spool_dir=os.path.join(self.root, '.incoming'), **kwargs)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if key_digest(key) is None and not os.path.exists(path) and os.path.isfile(key):
+            return key  # legacy path from before content addressing
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid audio key: {key}")
+        return path
+
+    def exists(self, key):
+        return os.path.isfile(self._path(key))
+
+    def put_file(self, path, key):
+        dest = self._path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(path, dest)
+
+    @contextmanager
+    def local_path(self, key):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Audio not found: {key}")
+        yield path
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3AudioStore(AudioStore):
+    name = 's3'
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: str | None = None,
+                 region: str | None = None, client=None, **kwargs):
+        if not bucket:
+            raise ValueError('AUDIO_S3_BUCKET is required for the s3 audio store')
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.prefix = prefix
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region or None)
+        self.client = client
+
+    def _object(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put_file(self, path, key):
+        # upload_file switches to multipart uploads for large files
+        content_type = CONTENT_TYPES.get(key_extension(key), 'application/octet-stream')
+        self.client.upload_file(path, self.bucket, self._object(key), ExtraArgs={'ContentType': content_type})
+
+    @contextmanager
+    def local_path(self, key):
+        spool = self._spool_file(os.path.splitext(key)[1])
+        spool.close()
+        try:
+            self.client.download_file(self.bucket, self._object(key), spool.name)
+            yield spool.name
+        finally:
+            os.remove(spool.name)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object(key))
+
+
+def create_audio_store(config) -> AudioStore:
+    name = config.get('AUDIO_STORE', 'local')
+    common = {
+        'chunk_bytes': config.get('AUDIO_CHUNK_BYTES', 65536),
+        'max_bytes': config.get('AUDIO_MAX_BYTES', 0),
+        'ffmpeg_bin': config.get('AUDIO_FFMPEG_BIN', 'ffmpeg'),
+    }
+    if name == 'local':
+        return LocalAudioStore(config['UPLOAD_FOLDER'], **common)
+    if name == 's3':
+        return S3AudioStore(
+            bucket=config.get('AUDIO_S3_BUCKET'),
+            prefix=config.get('AUDIO_S3_PREFIX', ''),
+            endpoint_url=config.get('AUDIO_S3_ENDPOINT_URL'),
+            region=config.get('AUDIO_S3_REGION'),
+            spool_dir=os.path.join(config['UPLOAD_FOLDER'], '.incoming'),
+            **common
+        )
+    raise ValueError(f"Unknown AUDIO_STORE '{name}' (choose from local, s3)")
@@ -0,0 +1,69 @@
+"""
+Per-answer registry of open speech-to-text streams.
+
+/transcript/audio feeds raw PCM frames into the stream for (attempt, question)
+while the student speaks; move-next finishes the stream so the final
+transcript is ready the moment the student navigates away. Streams idle for
+longer than `idle_timeout` seconds are discarded.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class AudioStreamSession:
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.bytes_received = 0
+        self.last_seen = time.monotonic()
+        self._carry = b''
+
+    # keep feeds aligned to whole 16-bit samples across chunk boundaries
+    def feed(self, data: bytes) -> str:
+        data = self._carry + data
+        usable = len(data) // 2 * 2
+        self._carry = data[usable:]
+        self.bytes_received += usable
+        self.last_seen = time.monotonic()
+        if not usable:
+            return self.stream.text
+        return self.stream.feed(data[:usable])
+
+    def finish(self) -> str:
+        return self.stream.finish()
+
+
+class AudioStreamRegistry:
+    def __init__(self, idle_timeout: float = 120.0):
+        self.idle_timeout = float(idle_timeout)
+        self._sessions: dict[tuple[int, int], AudioStreamSession] = {}
+        self._lock = threading.Lock()
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.idle_timeout
+        for key in [k for k, s in self._sessions.items() if s.last_seen < cutoff]:
+            del self._sessions[key]
+
+    def get_or_open(self, attempt_id: int, question_id: int, open_stream) -> AudioStreamSession:
+        key = (int(attempt_id), int(question_id))
+        with self._lock:
+            self._sweep()
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = AudioStreamSession(open_stream())
+            return session
+
+    def pop(self, attempt_id: int, question_id: int) -> AudioStreamSession | None:
+        with self._lock:
+            return self._sessions.pop((int(attempt_id), int(question_id)), None)
+
+    # finish an open stream and return its final transcript (None if no stream)
+    def finish(self, attempt_id: int, question_id: int) -> str | None:
+        session = self.pop(attempt_id, question_id)
+        if session is None:
+            return None
+        with session.lock:
+            return session.finish()
@@ -0,0 +1,38 @@
+"""
+Shared change counters for cacheable listings.
+
+A counter lives in the database (ContentVersion) so every worker process sees
+the same value: writers bump it inside their own transaction and readers build
+ETags from it with a single primary-key lookup instead of re-reading the list.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import update
+
+from utils.database import db
+
+EXAMS = 'exams'
+
+
+# per-exam counter behind utils/exam_cache.py; bump it whenever the exam or its questions change
+def exam_key(exam_id: int) -> str:
+    return f"exam:{int(exam_id)}"
+
+
+def current_version(name: str) -> int:
+    from model import ContentVersion
+    row = db.session.get(ContentVersion, name)
+    return int(row.version) if row is not None else 0
+
+
+# call before the writer's commit so the bump lands in the same transaction
+def bump_version(name: str) -> None:
+    from model import ContentVersion
+    result = db.session.execute(
+        update(ContentVersion)
+        .where(ContentVersion.name == name)
+        .values(version=ContentVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(ContentVersion(name=name, version=1))
@@ -1,27 +1,58 @@
-
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
-# check if a table has a specific column
+# database profiles: tuned engine options per backend (see Config.DB_* / SQLITE_*)
+
+def normalize_database_uri(uri: str) -> str:
+    # Heroku-style URLs still say postgres://, which SQLAlchemy 1.4+ rejects
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def database_profile(uri: str) -> str:
+    if uri.startswith('sqlite'):
+        return 'sqlite'
+    if uri.startswith('postgresql'):
+        return 'postgres'
+    return 'default'
 
-def table_has_column(table_name: str, column_name: str) -> bool:
-    res = db.session.execute(text(f"PRAGMA table_info('{table_name}')")).fetchall()
-    cols = [row[1] for row in res]
-    return column_name in cols
+def engine_options(config) -> dict:
+    profile = database_profile(config['SQLALCHEMY_DATABASE_URI'])
+    if profile == 'sqlite':
+        # sqlite3's own busy handler, in seconds; PRAGMA busy_timeout below covers new connections too
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0}}
+    if profile == 'postgres':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        }
+    return {}
 
-def ensure_answer_finalized_column():
-    # Ensure the 'answer' table exists
-    tables = db.session.execute(text(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='answer'"
-    )).fetchall()
-    if not tables:
+def _sqlite_pragmas(config, in_memory: bool) -> list:
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+    if not in_memory:
+        pragmas.insert(0, f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+    return pragmas
+
+def configure_engine(engine, config) -> None:
+    if engine.dialect.name != 'sqlite':
         return
-    
-    # Add 'finalized' if missing
-    if not table_has_column('answer', 'finalized'):
-        print("Adding missing 'finalized' column to 'answer' table...")
-        db.session.execute(text("ALTER TABLE answer ADD COLUMN finalized BOOLEAN DEFAULT 0"))
-        db.session.commit()
-        print("'finalized' column added.")
\ No newline at end of file
+    pragmas = _sqlite_pragmas(config, engine.url.database in (None, '', ':memory:'))
+
+    @event.listens_for(engine, 'connect')
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
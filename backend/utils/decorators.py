@@ -1,14 +1,19 @@
 from functools import wraps
 from flask import request, jsonify
-from service import verify_token
+from service import verify_claims
 
+# one auth check for every blueprint; claims come from the token (cached), not the DB
 def token_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        user_id = verify_token(token)
-        if not user_id:
+        claims = verify_claims(token)
+        if not claims:
             return jsonify({'error': 'Invalid token'}), 401
-        request.user_id = user_id
+        request.token = token
+        request.user_id = claims['user_id']
+        request.user_role = claims['role']
+        request.user_name = claims['name']
+        request.user_claims = claims
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
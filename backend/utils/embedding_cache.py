@@ -0,0 +1,68 @@
+"""
+In-process LRU cache for expected-answer embeddings.
+
+Entries are keyed by (question_id, answer_digest) so an edited expected answer
+never matches a stale vector, even before the question is explicitly invalidated.
+A value is a (references, dim) matrix, one row per accepted answer.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def answer_digest(text: str) -> str:
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict[tuple[int, str], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question_id: int, digest: str):
+        key = (int(question_id), digest)
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, question_id: int, digest: str, vec) -> None:
+        key = (int(question_id), digest)
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = vec
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # drop every cached vector for a question (all answer versions)
+    def invalidate(self, question_id: int) -> None:
+        qid = int(question_id)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == qid]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,107 @@
+"""
+In-process, versioned cache of each exam's ordered question list.
+
+An ExamContent snapshot is immutable: the exam header, questions in order and
+an id -> position index, so "current" and "next question" lookups are dict
+hits instead of SQL queries. Each snapshot carries the exam's shared counter
+(ContentVersion row exam_key(exam_id)) as read before it was loaded; get()
+re-reads that row with one primary-key lookup and reloads when a writer in
+any worker process has bumped it since. invalidate() only drops the local copy.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import NamedTuple
+
+from utils.content_version import current_version, exam_key
+from utils.database import db
+from utils.scoring_policy import ScoringPolicy, policy_for
+
+
+class CachedQuestion(NamedTuple):
+    id: int
+    exam_id: int
+    question_text: str
+    expected_answer: str
+    points: int
+    order: int
+    scoring_policy: ScoringPolicy | None = None
+
+    # fields safe to send to students
+    def public(self) -> dict:
+        return {
+            'id': self.id,
+            'question_text': self.question_text,
+            'points': self.points,
+            'order': self.order
+        }
+
+
+class ExamContent:
+    def __init__(self, exam, questions, version: int):
+        self.version = version
+        self.exam_id = exam.id
+        self.title = exam.title
+        self.description = exam.description
+        self.duration_minutes = exam.duration_minutes
+        self.is_active = exam.is_active
+        self.questions = tuple(
+            CachedQuestion(q.id, q.exam_id, q.question_text, q.expected_answer, q.points, q.order,
+                           policy_for(q))
+            for q in questions
+        )
+        self._position = {q.id: i for i, q in enumerate(self.questions)}
+        self.max_points = sum(int(q.points or 0) for q in self.questions)
+
+    def question(self, question_id) -> CachedQuestion | None:
+        pos = self._position.get(int(question_id))
+        return self.questions[pos] if pos is not None else None
+
+    def next_after(self, question_id) -> CachedQuestion | None:
+        pos = self._position.get(int(question_id))
+        if pos is None or pos + 1 >= len(self.questions):
+            return None
+        return self.questions[pos + 1]
+
+    def first_unanswered(self, answered_ids) -> CachedQuestion | None:
+        answered = set(answered_ids)
+        for q in self.questions:
+            if q.id not in answered:
+                return q
+        return None
+
+    def public_questions(self) -> list[dict]:
+        return [q.public() for q in self.questions]
+
+
+class ExamContentCache:
+    def __init__(self):
+        self._entries: dict[int, ExamContent] = {}
+        self._lock = threading.Lock()
+
+    def get(self, exam_id: int) -> ExamContent | None:
+        from model import Exam, Question
+        exam_id = int(exam_id)
+        # read before the questions, so an edit racing with the load only makes the copy newer
+        version = current_version(exam_key(exam_id))
+        with self._lock:
+            content = self._entries.get(exam_id)
+        if content is not None and content.version == version:
+            return content
+
+        exam = db.session.get(Exam, exam_id)
+        if exam is None:
+            return None
+        questions = Question.query.filter_by(exam_id=exam_id).order_by(Question.order).all()
+        content = ExamContent(exam, questions, version)
+        with self._lock:
+            # a slower load of an older version must not replace a newer copy
+            cached = self._entries.get(exam_id)
+            if cached is None or cached.version <= version:
+                self._entries[exam_id] = content
+        return content
+
+    def invalidate(self, exam_id: int) -> None:
+        with self._lock:
+            self._entries.pop(int(exam_id), None)
@@ -0,0 +1,155 @@
+"""
+Database-backed grading queue for uploaded audio answers.
+
+submit-answer stores the audio (utils/audio_store.py), inserts a GradingJob
+row and returns at once; a bounded worker pool runs speech-to-text + SBERT
+scoring off the request thread, then hands the audio to AudioMaintenance for
+transcoding. Failed attempts are retried up to GRADING_MAX_ATTEMPTS.
+Inference being busy or down (InferenceError: the remote sidecar, or a local
+SBERT score timing out) fails the attempt the same way, so overload delays
+grading instead of finalizing a 0.
+
+Several processes (gunicorn workers, pods) share the table. A worker claims a
+job with a single conditional UPDATE (queued -> running, owner, lease_until),
+so each attempt runs in exactly one process, and only the owner may finish or
+fail it. At startup, queued jobs are picked up again and running jobs are
+requeued only once their lease (GRADING_LEASE_SECONDS) has expired, i.e. when
+the process that claimed them is gone.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, select, update
+
+from utils.database import db
+
+
+class GradingQueue:
+    def __init__(self, app, max_workers: int = 4, max_attempts: int = 3, retry_delay: float = 2.0,
+                 lease_seconds: float = 600.0):
+        self.app = app
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_delay = max(0.0, float(retry_delay))
+        self.lease = timedelta(seconds=max(1.0, float(lease_seconds)))
+        self.owner = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix='grading')
+
+    def enqueue(self, job_id: int) -> None:
+        self._pool.submit(self._run, job_id)
+
+    # re-submit work interrupted by a restart; running jobs only once their lease expired
+    def resume_pending(self) -> int:
+        from model import GradingJob
+        now = datetime.now(timezone.utc)
+        db.session.execute(
+            update(GradingJob)
+            .where(GradingJob.status == 'running',
+                   or_(GradingJob.lease_until.is_(None), GradingJob.lease_until < now))
+            .values(status='queued', owner=None, lease_until=None, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        job_ids = db.session.scalars(select(GradingJob.id).where(GradingJob.status == 'queued')).all()
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        return len(job_ids)
+
+    def _run(self, job_id: int) -> None:
+        with self.app.app_context():
+            try:
+                self._grade(job_id)
+            except Exception as e:
+                db.session.rollback()
+                self._record_failure(job_id, str(e))
+
+    # queued -> running for this queue only; False when another worker holds or finished the job
+    def _claim(self, job_id: int) -> bool:
+        from model import GradingJob
+        now = datetime.now(timezone.utc)
+        result = db.session.execute(
+            update(GradingJob)
+            .where(GradingJob.id == job_id, GradingJob.status == 'queued')
+            .values(status='running', owner=self.owner, lease_until=now + self.lease,
+                    attempts=db.func.coalesce(GradingJob.attempts, 0) + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    # running -> status, only while this queue still owns the job
+    def _release(self, job_id: int, status: str, error: str | None) -> bool:
+        from model import GradingJob
+        result = db.session.execute(
+            update(GradingJob)
+            .where(GradingJob.id == job_id, GradingJob.status == 'running', GradingJob.owner == self.owner)
+            .values(status=status, owner=None, lease_until=None, last_error=error,
+                    updated_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def _grade(self, job_id: int) -> None:
+        from model import GradingJob, Answer, Question
+        from service import transcribe_audio, score_answer
+
+        if not self._claim(job_id):
+            return
+        job = db.session.get(GradingJob, job_id)
+
+        answer = db.session.get(Answer, job.answer_id)
+        question = db.session.get(Question, answer.question_id) if answer else None
+        if answer is None or question is None:
+            raise LookupError('Answer or question no longer exists')
+
+        with self.app.extensions['audio_store'].wav_path(job.audio_file_path) as audio_path:
+            spoken_text, stats = transcribe_audio(audio_path)
+        if stats is not None:
+            answer.audio_seconds = stats.file_seconds
+            answer.speech_seconds = stats.speech_seconds
+        if spoken_text is None:
+            raise RuntimeError('Could not process audio')
+        # an empty transcript is only final when the VAD found no speech either (the
+        # recogniser then heard the whole untrimmed recording); otherwise retry
+        if not spoken_text and (stats is None or stats.speech_seconds > 0):
+            raise RuntimeError('No speech recognised')
+
+        similarity, awarded, tier = score_answer(spoken_text, question)
+
+        answer.spoken_text = spoken_text
+        answer.audio_file_path = job.audio_file_path
+        answer.similarity_score = similarity
+        answer.points_awarded = int(awarded)
+        answer.scored_by = tier
+        answer.finalized = True
+        if not self._release(job_id, 'done', None):
+            # the lease expired and another worker requeued the job; its result wins
+            db.session.rollback()
+            return
+        db.session.commit()
+        self.app.extensions['audio_maintenance'].schedule_transcode(job.audio_file_path)
+
+    def _record_failure(self, job_id: int, error: str) -> None:
+        from model import GradingJob
+        job = db.session.get(GradingJob, job_id)
+        if job is None or job.owner != self.owner:
+            print(f"Grading job {job_id} failed before it was claimed: {error}")
+            return
+        attempts = job.attempts or 0
+        retry = attempts < self.max_attempts
+        released = self._release(job_id, 'queued' if retry else 'failed', error)
+        db.session.commit()
+        print(f"Grading job {job_id} attempt {attempts} failed: {error}")
+        if retry and released:
+            timer = threading.Timer(self.retry_delay, self.enqueue, args=(job_id,))
+            timer.daemon = True
+            timer.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,212 @@
+"""
+Client side of the inference sidecar (serve_inference.py).
+
+With INFERENCE_MODE=remote the web tier loads no models. service.py swaps in
+the adapters below, which speak a small HTTP protocol to the sidecar:
+
+    POST /v1/encode          {"texts": [...]}        -> float32 matrix, X-Shape: n,d
+    POST /v1/transcribe      16-bit PCM (?rate=) or WAV body -> {"text": ...}
+    POST /v1/analyze-frame   JPEG/PNG body                 -> proctoring result
+    GET  /healthz, /v1/stats
+
+The adapters keep the interfaces the rest of the code already uses: an
+`encode` method for ScoringEngine and the embedding cache, an STTBackend, and
+the ProctoringEngine analyze/stats calls. Micro-batching and audio
+preprocessing therefore still run in the web tier, and each batch is a single
+request.
+
+Backpressure: at most INFERENCE_MAX_IN_FLIGHT requests per web worker are
+outstanding; callers wait up to INFERENCE_QUEUE_TIMEOUT_SECONDS for a slot
+and then get InferenceBusy, as they do when the sidecar answers 503.
+Requests that take longer than INFERENCE_TIMEOUT_SECONDS raise
+InferenceTimeout.
+"""
+
+from __future__ import annotations
+
+import base64
+import http.client
+import json
+import socket
+import threading
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from utils.stt import STTBackend
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+class InferenceBusy(InferenceError):
+    pass
+
+
+class InferenceTimeout(InferenceError):
+    pass
+
+
+class ModelUnavailable(InferenceError):
+    pass
+
+
+class InferenceClient:
+    def __init__(self, base_url: str, timeout: float = 30.0, max_in_flight: int = 16,
+                 queue_timeout: float = 5.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', '') or not parts.hostname:
+            raise ValueError(f"INFERENCE_URL must be http://host:port, got {base_url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = float(timeout)
+        self.queue_timeout = float(queue_timeout)
+        self._slots = threading.BoundedSemaphore(max(1, int(max_in_flight)))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._counts = {'requests': 0, 'busy': 0, 'timeouts': 0, 'errors': 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._counts[name] += 1
+
+    # one keep-alive connection per calling thread
+    def _connection(self, fresh: bool = False) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('busy')
+            raise InferenceBusy('Too many inference requests in flight')
+        try:
+            self._count('requests')
+            for retry in (False, True):
+                conn = self._connection(fresh=retry)
+                try:
+                    conn.request(method, self.base_path + path, body=body, headers=headers or {})
+                    response = conn.getresponse()
+                    data = response.read()
+                    break
+                except socket.timeout:
+                    conn.close()
+                    self._local.conn = None
+                    self._count('timeouts')
+                    raise InferenceTimeout(f"Inference request {path} timed out after {self.timeout}s")
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # the sidecar closed an idle keep-alive connection; reconnect once
+                    if retry:
+                        self._count('errors')
+                        raise InferenceError('Inference service closed the connection')
+                except OSError as e:
+                    self._local.conn = None
+                    self._count('errors')
+                    raise InferenceError(f"Inference service unreachable: {e}") from e
+        finally:
+            self._slots.release()
+        if response.status == 200:
+            return response, data
+        error = _error_message(data)
+        if response.status == 503 and error.get('code') == 'busy':
+            self._count('busy')
+            raise InferenceBusy(error.get('error', 'Inference service busy'))
+        if response.status == 503:
+            raise ModelUnavailable(error.get('error', 'Model unavailable'))
+        if response.status == 504:
+            self._count('timeouts')
+            raise InferenceTimeout(error.get('error', 'Inference timed out'))
+        self._count('errors')
+        raise InferenceError(f"Inference service returned {response.status}: {error.get('error', '')}")
+
+    def _json(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> dict:
+        _, data = self.request(method, path, body, headers)
+        return json.loads(data)
+
+    def encode(self, texts) -> np.ndarray:
+        body = json.dumps({'texts': list(texts)}).encode('utf-8')
+        response, data = self.request('POST', '/v1/encode', body, {'Content-Type': 'application/json'})
+        n, d = (int(v) for v in response.getheader('X-Shape', '0,0').split(','))
+        return np.frombuffer(data, dtype='<f4').reshape(n, d)
+
+    def transcribe_pcm(self, pcm: bytes, sample_rate: int, language: str | None = None) -> str:
+        params = {'rate': int(sample_rate), **({'language': language} if language else {})}
+        query = '?' + urlencode(params)
+        return self._json('POST', '/v1/transcribe' + query, pcm, {'Content-Type': 'audio/l16'}).get('text', '')
+
+    def transcribe_wav(self, data: bytes) -> str:
+        return self._json('POST', '/v1/transcribe', data, {'Content-Type': 'audio/wav'}).get('text', '')
+
+    def analyze_frame(self, data: bytes) -> dict:
+        return self._json('POST', '/v1/analyze-frame', bytes(data), {'Content-Type': 'application/octet-stream'})
+
+    def health(self) -> dict:
+        return self._json('GET', '/healthz')
+
+    def server_stats(self) -> dict:
+        return self._json('GET', '/v1/stats')
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._counts)
+
+
+def _error_message(data: bytes) -> dict:
+    try:
+        payload = json.loads(data)
+        return payload if isinstance(payload, dict) else {}
+    except ValueError:
+        return {'error': data[:200].decode('utf-8', errors='replace')}
+
+
+# stands in for SentenceTransformer wherever only .encode is used
+class RemoteSentenceModel:
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.client.encode([sentences])[0]
+        return self.client.encode(sentences)
+
+
+class RemoteSTTBackend(STTBackend):
+    name = 'remote'
+    passthrough = (InferenceError,)  # busy / unavailable: the grading job is retried
+
+    def __init__(self, client: InferenceClient, pool_size: int = 1, language: str = 'en-US', preprocessor=None):
+        self.client = client
+        super().__init__(None, pool_size, language, preprocessor)
+
+    def _create_worker(self):
+        return self.client
+
+    def _transcribe(self, client, audio_file_path):
+        with open(audio_file_path, 'rb') as f:
+            return client.transcribe_wav(f.read())
+
+    def _transcribe_pcm(self, client, pcm, sample_rate):
+        return client.transcribe_pcm(pcm, sample_rate, self.language)
+
+
+class RemoteProctoringEngine:
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def warm(self) -> int:
+        return int(self.client.health().get('workers', 0))
+
+    def analyze_bytes(self, data) -> dict:
+        return self.client.analyze_frame(data)
+
+    def analyze_data_url(self, frame_data: str) -> dict:
+        _, encoded = frame_data.split(',', 1)
+        return self.analyze_bytes(base64.b64decode(encoded))
+
+    def stats(self) -> dict:
+        return {'remote': True, 'client': self.client.stats(), 'server': self.client.server_stats()}
@@ -0,0 +1,271 @@
+"""
+Inference sidecar: hosts SBERT, speech-to-text and the proctoring nets in a
+pool of worker processes, separate from the Flask web tier.
+
+Each of the INFERENCE_WORKERS spawn-started processes loads its own model set
+once (eagerly with INFERENCE_PRELOAD) and pins torch/OpenCV to
+INFERENCE_TORCH_THREADS threads, so the pool uses about one core per worker.
+Model memory is paid once per worker rather than once per web worker. A
+threaded HTTP front end (protocol in utils/inference.py) hands each request
+to the pool. At most INFERENCE_MAX_PENDING requests are admitted at a time;
+any others are refused at once with 503 {"code": "busy"} and a Retry-After
+header, so overload is pushed back to the web tier instead of queueing without
+bound. A request that is not finished within INFERENCE_REQUEST_TIMEOUT_SECONDS
+gets 504; its admission slot stays taken until the worker actually finishes.
+
+Speech arrives already preprocessed by the web tier, so workers run their STT
+backend with AUDIO_PREPROCESS off.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+# per-process model state in the workers
+_config: dict = {}
+_models: dict = {}
+
+
+def _init_worker(config: dict) -> None:
+    _config.update(config)
+    threads = max(1, int(config.get('INFERENCE_TORCH_THREADS', 1)))
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if config.get('INFERENCE_PRELOAD', True):
+        _warm_worker()
+
+
+def _warm_worker() -> int:
+    for name, loader in (('sbert', _sbert), ('stt', _stt), ('proctoring', _proctoring)):
+        try:
+            model = loader()
+            if name in ('stt', 'proctoring'):
+                model.warm()
+        except Exception as e:
+            print(f"[inference worker {os.getpid()}] {name} warm-up failed: {e}")
+    return os.getpid()
+
+
+def _sbert():
+    if 'sbert' not in _models:
+        from sentence_transformers import SentenceTransformer
+        _models['sbert'] = SentenceTransformer(_config['SBERT_MODEL_NAME'])
+    return _models['sbert']
+
+
+# one backend per language, since recognisers fix their language when built
+def _stt(language: str | None = None):
+    language = language or _config.get('STT_LANGUAGE', 'en-US')
+    key = ('stt', language)
+    if key not in _models:
+        from utils.stt import create_stt_backend
+        _models[key] = create_stt_backend({**_config, 'STT_LANGUAGE': language,
+                                           'AUDIO_PREPROCESS': False, 'STT_POOL_SIZE': 1})
+    return _models[key]
+
+
+def _proctoring():
+    if 'proctoring' not in _models:
+        import cv2
+        from utils.proctoring import ProctoringEngine
+        cv2.setNumThreads(max(1, int(_config.get('INFERENCE_TORCH_THREADS', 1))))
+        _models['proctoring'] = ProctoringEngine(
+            _config['PROCTOR_CONFIG_FILE'], _config['PROCTOR_MODEL_FILE'],
+            pool_size=1, max_batch_size=1, max_wait_ms=0
+        )
+    return _models['proctoring']
+
+
+# task functions run inside the worker processes
+def encode_task(texts):
+    vectors = _sbert().encode(list(texts), batch_size=max(1, len(texts)))
+    return np.ascontiguousarray(np.asarray(vectors, dtype='<f4'))
+
+
+def transcribe_pcm_task(pcm: bytes, sample_rate: int, language: str | None = None) -> str:
+    return _stt(language).transcribe_pcm(pcm, sample_rate)
+
+
+def transcribe_wav_task(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+        f.write(data)
+    try:
+        return _stt().transcribe(f.name) or ''
+    finally:
+        os.remove(f.name)
+
+
+def analyze_frame_task(data: bytes) -> dict:
+    from utils.proctoring import FaceModelUnavailable
+    try:
+        return _proctoring().analyze_bytes(data)
+    except FaceModelUnavailable as e:
+        return {'error': str(e), 'code': 'model_unavailable'}
+    except ValueError as e:
+        return {'error': str(e), 'code': 'bad_request'}
+
+
+class InferenceServer:
+    def __init__(self, config: dict, workers: int = 0, max_pending: int = 64, request_timeout: float = 60.0):
+        self.config = config
+        self.workers = int(workers) or os.cpu_count() or 1
+        self.request_timeout = float(request_timeout)
+        self.max_pending = max(1, int(max_pending))
+        self._admission = threading.BoundedSemaphore(self.max_pending)
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker, initargs=(config,))
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0, 'pending': 0}
+        self._busy_ms = {'encode': 0.0, 'transcribe': 0.0, 'analyze-frame': 0.0}
+        self.started = time.time()
+
+    def _bump(self, key: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += delta
+
+    # start every worker process (and load its models) before serving
+    def warm(self) -> int:
+        pids = {f.result() for f in [self._pool.submit(_warm_worker) for _ in range(self.workers)]}
+        return len(pids)
+
+    # None when the server is saturated; otherwise the task's result
+    def run(self, kind: str, fn, *args):
+        if not self._admission.acquire(blocking=False):
+            self._bump('rejected')
+            return None
+        self._bump('requests')
+        self._bump('pending')
+        start = time.perf_counter()
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._finish(kind, start)
+            raise
+        # a timed-out task keeps its worker busy, so its slot is only freed when it ends
+        future.add_done_callback(lambda _: self._finish(kind, start))
+        try:
+            return future.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._bump('timeouts')
+            raise
+
+    def _finish(self, kind: str, start: float) -> None:
+        self._bump('pending', -1)
+        self._admission.release()
+        with self._stats_lock:
+            self._busy_ms[kind] += (time.perf_counter() - start) * 1000.0
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {**self._stats, 'workers': self.workers, 'max_pending': self.max_pending,
+                    'busy_ms': {k: round(v, 1) for k, v in self._busy_ms.items()},
+                    'uptime_seconds': round(time.time() - self.started, 1)}
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = 'application/json', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status: int, payload: dict, headers=None):
+                self._send(status, json.dumps(payload).encode('utf-8'), headers=headers)
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path == '/healthz':
+                    self._json(200, {'status': 'ok', 'workers': server.workers,
+                                     'sbert_model': server.config.get('SBERT_MODEL_NAME'),
+                                     'stt_backend': server.config.get('STT_BACKEND')})
+                elif path == '/v1/stats':
+                    self._json(200, server.stats())
+                else:
+                    self._json(404, {'error': 'Not found'})
+
+            def do_POST(self):
+                parts = urlsplit(self.path)
+                query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                body = self._body()
+                try:
+                    if parts.path == '/v1/encode':
+                        texts = json.loads(body or b'{}').get('texts')
+                        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                            return self._json(400, {'error': 'texts must be a list of strings'})
+                        result = server.run('encode', encode_task, texts) if texts else np.zeros((0, 0), '<f4')
+                        if result is None:
+                            return self._busy()
+                        return self._send(200, result.tobytes(), 'application/octet-stream',
+                                          {'X-Shape': f"{result.shape[0]},{result.shape[1]}"})
+                    if parts.path == '/v1/transcribe':
+                        if self.headers.get('Content-Type', '').startswith('audio/wav'):
+                            result = server.run('transcribe', transcribe_wav_task, body)
+                        else:
+                            result = server.run('transcribe', transcribe_pcm_task, body,
+                                                int(query.get('rate', 16000)), query.get('language'))
+                        if result is None:
+                            return self._busy()
+                        return self._json(200, {'text': result or ''})
+                    if parts.path == '/v1/analyze-frame':
+                        result = server.run('analyze-frame', analyze_frame_task, body)
+                        if result is None:
+                            return self._busy()
+                        code = result.pop('code', None) if 'error' in result else None
+                        if code == 'model_unavailable':
+                            return self._json(503, {'error': result['error'], 'code': code})
+                        if code == 'bad_request':
+                            return self._json(400, {'error': result['error']})
+                        return self._json(200, result)
+                    return self._json(404, {'error': 'Not found'})
+                except FutureTimeout:
+                    return self._json(504, {'error': f"Inference took longer than {server.request_timeout}s"})
+                except (ValueError, json.JSONDecodeError) as e:
+                    return self._json(400, {'error': str(e)})
+                except Exception as e:
+                    server._bump('errors')
+                    print(f"Inference error ({parts.path}): {e}")
+                    return self._json(500, {'error': str(e)})
+
+            def _busy(self):
+                self._json(503, {'error': 'Inference service busy', 'code': 'busy'}, {'Retry-After': '1'})
+
+        return Handler
+
+    def serve(self, host: str = '127.0.0.1', port: int = 5100) -> None:
+        httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        httpd.daemon_threads = True
+        print(f"Inference service on http://{host}:{port} with {self.workers} workers")
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
+            self._pool.shutdown(wait=False, cancel_futures=True)
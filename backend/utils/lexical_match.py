@@ -0,0 +1,67 @@
+"""
+Cheap lexical tier in front of SBERT for short-fact answers.
+
+Answers and accepted references are normalised (lower case, punctuation
+dropped, a leading article dropped, whitespace collapsed) and compared in
+microseconds. The tier only decides what cannot be wrong and never marks an
+answer as wrong:
+
+exact : normalised answer equals a reference                    -> match
+token : answer and reference have the same content words in the
+        same order once filler ("it's", "i think") is dropped   -> match
+
+Everything else -- extra or missing words, any spelling difference (a
+one-letter slip is as likely "Ireland" for "Iceland" as an STT typo),
+numbers, synonyms such as "USA" vs. "United States" -- is undecided and goes
+to SBERT. A match is recorded with
+similarity 1.0, which the question's scoring policy (or the global
+threshold) then turns into points.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import NamedTuple
+
+TIERS = ('empty', 'exact', 'token', 'semantic')
+
+_WORD = re.compile(r"[^\w]+", re.UNICODE)
+_ARTICLES = frozenset({'a', 'an', 'the'})
+# words that carry no answer content; negations and conjunctions are deliberately absent
+_FILLER = frozenset({'it', 'its', 's', 'is', 'i', 'think', 'believe', 'my', 'answer', 'that', 'this', 'would', 'be'})
+
+
+class LexicalDecision(NamedTuple):
+    tier: str
+    similarity: float
+
+
+# only a leading article goes: "Vitamin A" must not become "vitamin"
+def _drop_article(words):
+    return words[1:] if len(words) > 1 and words[0] in _ARTICLES else words
+
+
+def tokens(text: str) -> tuple[str, ...]:
+    return tuple(_drop_article(_WORD.sub(' ', (text or '').lower()).split()))
+
+
+def _content(words: tuple[str, ...]) -> tuple[str, ...]:
+    return _drop_article(tuple(w for w in words if w not in _FILLER))
+
+
+class LexicalPrefilter:
+    # decision for one answer against all accepted references; None means "ask SBERT"
+    def decide(self, answer: str, references) -> LexicalDecision | None:
+        answer = tokens(answer)
+        if not answer:
+            return LexicalDecision('empty', 0.0)
+        refs = [tokens(r) for r in references if r]
+        refs = [r for r in refs if r]
+        if not refs:
+            return None
+        if any(answer == r for r in refs):
+            return LexicalDecision('exact', 1.0)
+        content = _content(answer)
+        if content and any(content == _content(r) for r in refs):
+            return LexicalDecision('token', 1.0)
+        return None
@@ -0,0 +1,177 @@
+"""
+Minimal versioned schema migrations.
+
+db.create_all() builds fresh databases straight from model.py (indexes
+included); the migrations below bring databases created by older versions up
+to date. Applied versions are recorded in `schema_migrations`, and every step
+inspects the live schema through SQLAlchemy's inspector so it is safe to run
+on both SQLite and Postgres and idempotent on fresh databases.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from utils.database import db
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(100), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False),
+)
+
+
+def _has_column(conn, table_name: str, column_name: str) -> bool:
+    return column_name in {c['name'] for c in inspect(conn).get_columns(table_name)}
+
+
+def _add_column(conn, table_name: str, column_name: str, ddl: str) -> None:
+    if inspect(conn).has_table(table_name) and not _has_column(conn, table_name, column_name):
+        print(f"Adding missing '{column_name}' column to '{table_name}' table...")
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+
+
+def _create_model_indexes(conn, model, *names) -> None:
+    for index in model.__table__.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def _answer_finalized(conn):
+    _add_column(conn, 'answer', 'finalized', 'finalized BOOLEAN DEFAULT FALSE')
+
+
+def _attempt_suspicion_score(conn):
+    _add_column(conn, 'exam_attempt', 'suspicion_score', 'suspicion_score FLOAT DEFAULT 0')
+
+
+# keep one answer per (attempt, question) -- finalized first, then newest -- before adding the unique index
+def _unique_answer_per_question(conn):
+    from model import Answer
+    rows = conn.execute(text(
+        "SELECT id, attempt_id, question_id, finalized FROM answer "
+        "WHERE (attempt_id, question_id) IN ("
+        "  SELECT attempt_id, question_id FROM answer GROUP BY attempt_id, question_id HAVING COUNT(*) > 1"
+        ") ORDER BY attempt_id, question_id"
+    )).fetchall()
+    groups: dict[tuple[int, int], list] = {}
+    for row in rows:
+        groups.setdefault((row.attempt_id, row.question_id), []).append(row)
+    for dupes in groups.values():
+        keep = max(dupes, key=lambda r: (bool(r.finalized), r.id))
+        drop = [r.id for r in dupes if r.id != keep.id]
+        print(f"Merging duplicate answers {drop} into {keep.id}")
+        conn.execute(text("UPDATE grading_job SET answer_id = :keep WHERE answer_id IN :drop")
+                     .bindparams(bindparam('drop', expanding=True)), {'keep': keep.id, 'drop': drop})
+        conn.execute(text("DELETE FROM answer WHERE id IN :drop")
+                     .bindparams(bindparam('drop', expanding=True)), {'drop': drop})
+    _create_model_indexes(conn, Answer, 'uq_answer_attempt_question')
+
+
+def _lookup_indexes(conn):
+    from model import Question, ExamAttempt, Exam
+    _create_model_indexes(conn, Question, 'ix_question_exam_order')
+    _create_model_indexes(conn, ExamAttempt, 'ix_exam_attempt_student')
+    _create_model_indexes(conn, Exam, 'ix_exam_educator_active')
+
+
+def _content_versions(conn):
+    from model import ContentVersion
+    from utils.content_version import EXAMS
+    ContentVersion.__table__.create(conn, checkfirst=True)
+    if conn.execute(select(ContentVersion.name).where(ContentVersion.name == EXAMS)).first() is None:
+        conn.execute(ContentVersion.__table__.insert().values(name=EXAMS, version=0))
+
+
+def _analytics_indexes(conn):
+    from model import Answer, ExamAttempt
+    _create_model_indexes(conn, Answer, 'ix_answer_question_finalized')
+    _create_model_indexes(conn, ExamAttempt, 'ix_exam_attempt_exam_status')
+
+
+def _question_scoring_policy(conn):
+    _add_column(conn, 'question', 'scoring_policy', 'scoring_policy TEXT')
+
+
+def _answer_scored_by(conn):
+    _add_column(conn, 'answer', 'scored_by', 'scored_by VARCHAR(16)')
+
+
+def _answer_audio_durations(conn):
+    _add_column(conn, 'answer', 'audio_seconds', 'audio_seconds FLOAT')
+    _add_column(conn, 'answer', 'speech_seconds', 'speech_seconds FLOAT')
+
+
+def _grading_job_lease(conn):
+    _add_column(conn, 'grading_job', 'owner', 'owner VARCHAR(64)')
+    _add_column(conn, 'grading_job', 'lease_until', 'lease_until TIMESTAMP')
+
+
+def _answer_late_text(conn):
+    _add_column(conn, 'answer', 'late_text', 'late_text TEXT')
+
+
+MIGRATIONS = [
+    (1, 'answer_finalized', _answer_finalized),
+    (2, 'attempt_suspicion_score', _attempt_suspicion_score),
+    (3, 'unique_answer_per_question', _unique_answer_per_question),
+    (4, 'lookup_indexes', _lookup_indexes),
+    (5, 'content_versions', _content_versions),
+    (6, 'analytics_indexes', _analytics_indexes),
+    (7, 'question_scoring_policy', _question_scoring_policy),
+    (8, 'answer_scored_by', _answer_scored_by),
+    (9, 'answer_audio_durations', _answer_audio_durations),
+    (10, 'grading_job_lease', _grading_job_lease),
+    (11, 'answer_late_text', _answer_late_text),
+]
+
+
+# db.create_all(); workers starting together may race to create the same table,
+# and the loser just runs it again
+def create_tables(attempts: int = 3) -> None:
+    for attempt in range(attempts):
+        try:
+            db.create_all()
+            return
+        except SQLAlchemyError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.2 * (attempt + 1))
+
+
+def _is_applied(version: int) -> bool:
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(schema_migrations.c.version).where(schema_migrations.c.version == version)
+        ).first() is not None
+
+
+def run_migrations() -> list[int]:
+    applied_now = []
+    with db.engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+    applied = {v for (v,) in db.session.execute(select(schema_migrations.c.version))}
+    db.session.close()
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        # each step commits atomically together with its bookkeeping row
+        try:
+            with db.engine.begin() as conn:
+                step(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.now(timezone.utc)
+                ))
+        except Exception:
+            # another worker starting at the same time got there first
+            if _is_applied(version):
+                continue
+            raise
+        applied_now.append(version)
+        print(f"Applied migration {version}: {name}")
+    return applied_now
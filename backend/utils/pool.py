@@ -0,0 +1,63 @@
+"""
+Small blocking pool of warm, non-thread-safe resources (recognizers, nets, ...).
+
+Instances are built lazily by `factory` up to `size` and then reused; a caller
+that finds the pool exhausted waits for one to be released.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class ResourcePool:
+    def __init__(self, factory, size: int = 1):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _take(self, timeout: float | None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def acquire(self, timeout: float | None = None):
+        item = self._take(timeout)
+        try:
+            yield item
+        finally:
+            self._idle.put(item)
+
+    # build every instance up front so no request pays the load cost
+    def warm(self) -> int:
+        items = []
+        try:
+            while True:
+                with self._lock:
+                    if self._created >= self.size:
+                        break
+                items.append(self._take(timeout=0))
+        finally:
+            for item in items:
+                self._idle.put(item)
+        return self._created
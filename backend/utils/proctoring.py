@@ -0,0 +1,163 @@
+"""
+Proctoring engine: face detection (OpenCV DNN SSD) + eye check (Haar cascade).
+
+cv2.dnn.Net and CascadeClassifier are not safe to share between threads.
+Face detection is therefore owned by a MicroBatcher thread: frames from many
+concurrent students are resized on their request threads, collected for up to
+PROCTOR_BATCH_WAIT_MS and pushed through the SSD net as one N-image blob, and
+the per-image detections are fanned back out. Eye cascades stay on the request
+threads, drawn from a ResourcePool warmed at startup. Every analysis reports
+per-stage timings and the engine keeps running totals.
+"""
+
+from __future__ import annotations
+
+import base64
+import threading
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from utils.batching import MicroBatcher
+from utils.pool import ResourcePool
+
+STAGES = ('decode', 'resize', 'forward', 'cascade')
+
+
+class FaceModelUnavailable(RuntimeError):
+    pass
+
+
+class ProctoringEngine:
+    def __init__(self, config_file: str, model_file: str, pool_size: int = 2, confidence: float = 0.5,
+                 max_batch_size: int = 16, max_wait_ms: float = 20.0):
+        self.config_file = config_file
+        self.model_file = model_file
+        self.confidence = confidence
+        self.cascades = ResourcePool(self._create_cascade, pool_size)
+        self._net = None
+        self._net_lock = threading.Lock()
+        self._batcher = MicroBatcher(self._detect_batch, max_batch_size, max_wait_ms, name='proctoring-dnn')
+        self._totals = {stage: 0.0 for stage in STAGES}
+        self._frames = 0
+        self._stats_lock = threading.Lock()
+
+    def _get_net(self):
+        with self._net_lock:
+            if self._net is None:
+                try:
+                    self._net = cv2.dnn.readNetFromCaffe(self.config_file, self.model_file)
+                except cv2.error as e:
+                    raise FaceModelUnavailable(str(e)) from e
+            return self._net
+
+    @staticmethod
+    def _create_cascade():
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        if cascade.empty():
+            raise FaceModelUnavailable('Could not load haarcascade_eye.xml')
+        return cascade
+
+    def warm(self) -> int:
+        self._get_net()
+        return self.cascades.warm()
+
+    # one forward pass for the whole batch; detections column 0 is the image index
+    def _detect_batch(self, resized_frames):
+        net = self._get_net()
+        t = time.perf_counter()
+        blob = cv2.dnn.blobFromImages(resized_frames, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        net.setInput(blob)
+        rows = net.forward()[0, 0]
+        forward_ms = (time.perf_counter() - t) * 1000.0
+        image_ids = rows[:, 0].astype(int)
+        return [(rows[image_ids == i], forward_ms, len(resized_frames)) for i in range(len(resized_frames))]
+
+    # JPEG/PNG bytes -> BGR array; np.frombuffer wraps the request buffer without copying
+    @staticmethod
+    def decode_bytes(data) -> np.ndarray:
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError('Could not decode image')
+        return frame
+
+    @classmethod
+    def decode_data_url(cls, frame_data: str) -> np.ndarray:
+        _, encoded = frame_data.split(',', 1)
+        return cls.decode_bytes(base64.b64decode(encoded))
+
+    def _record(self, timings: dict) -> None:
+        with self._stats_lock:
+            self._frames += 1
+            for stage in STAGES:
+                self._totals[stage] += timings.get(stage, 0.0)
+
+    def analyze_data_url(self, frame_data: str) -> dict:
+        start = time.perf_counter()
+        frame = self.decode_data_url(frame_data)
+        decode_ms = (time.perf_counter() - start) * 1000.0
+        return self.analyze(frame, {'decode': decode_ms})
+
+    def analyze_bytes(self, data) -> dict:
+        start = time.perf_counter()
+        frame = self.decode_bytes(data)
+        decode_ms = (time.perf_counter() - start) * 1000.0
+        return self.analyze(frame, {'decode': decode_ms})
+
+    def analyze(self, frame: np.ndarray, timings: dict | None = None) -> dict:
+        timings = dict(timings or {})
+        (h, w) = frame.shape[:2]
+
+        t = time.perf_counter()
+        resized = cv2.resize(frame, (300, 300))
+        timings['resize'] = (time.perf_counter() - t) * 1000.0
+
+        detections, timings['forward'], batch_size = self._batcher(resized)
+
+        faces = []
+        for row in detections:
+            confidence = float(row[2])
+            if confidence > self.confidence:
+                box = row[3:7] * np.array([w, h, w, h])
+                (startX, startY, endX, endY) = box.astype("int")
+                startX, startY = max(0, startX), max(0, startY)
+                endX, endY = min(w - 1, endX), min(h - 1, endY)
+                faces.append((startX, startY, endX, endY))
+
+        t = time.perf_counter()
+        eye_movement_detected = False
+        if faces:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            with self.cascades.acquire() as eye_cascade:
+                for (sx1, sy1, sx2, sy2) in faces:
+                    sy, ey = max(0, sy1), min(gray.shape[0], sy2)
+                    sx, ex = max(0, sx1), min(gray.shape[1], sx2)
+                    if sy >= ey or sx >= ex:
+                        continue
+                    roi_gray = gray[sy:ey, sx:ex]
+                    eyes = eye_cascade.detectMultiScale(roi_gray)
+                    if len(eyes) != 2:
+                        eye_movement_detected = True
+                        break
+        timings['cascade'] = (time.perf_counter() - t) * 1000.0
+
+        self._record(timings)
+        return {
+            'face_detected': len(faces) > 0,
+            'multiple_faces': len(faces) > 1,
+            'eye_movement_detected': eye_movement_detected,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'batch_size': batch_size,
+            'timings_ms': {stage: round(timings.get(stage, 0.0), 3) for stage in STAGES}
+        }
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            frames = self._frames
+            return {
+                'frames': frames,
+                'avg_ms': {stage: (self._totals[stage] / frames if frames else 0.0) for stage in STAGES},
+                'batching': self._batcher.stats()
+            }
@@ -0,0 +1,149 @@
+"""
+Server-side proctoring monitor.
+
+Each face-check verdict becomes a compact ProctoringEvent (attempt id, flag
+bitmask, timestamp). Events are buffered in memory and written with one bulk
+INSERT once PROCTOR_EVENT_FLUSH_SIZE rows or PROCTOR_EVENT_FLUSH_SECONDS have
+accumulated, so a crash can lose at most one unflushed buffer.
+
+A per-attempt rolling suspicion score (exponential decay plus per-flag
+weights) decides when the attempt is flagged, and drives the sampling
+interval handed back to the client: clean students back off towards
+PROCTOR_INTERVAL_MAX_MS, anomalies tighten it to PROCTOR_INTERVAL_MIN_MS.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, update
+
+from utils.database import db
+
+FLAG_NO_FACE = 1
+FLAG_MULTIPLE_FACES = 2
+FLAG_EYE_MOVEMENT = 4
+
+FLAG_WEIGHTS = {
+    FLAG_NO_FACE: 1.0,
+    FLAG_MULTIPLE_FACES: 2.0,
+    FLAG_EYE_MOVEMENT: 0.5,
+}
+
+
+def verdict_flags(result: dict) -> int:
+    flags = 0
+    if not result.get('face_detected'):
+        flags |= FLAG_NO_FACE
+    if result.get('multiple_faces'):
+        flags |= FLAG_MULTIPLE_FACES
+    if result.get('eye_movement_detected'):
+        flags |= FLAG_EYE_MOVEMENT
+    return flags
+
+
+class _AttemptState:
+    __slots__ = ('student_id', 'score', 'flagged', 'dirty')
+
+    def __init__(self, student_id: int, score: float, flagged: bool):
+        self.student_id = student_id
+        self.score = score
+        self.flagged = flagged
+        self.dirty = False
+
+
+class ProctoringMonitor:
+    def __init__(self, decay: float = 0.8, flag_threshold: float = 4.0,
+                 min_interval_ms: int = 1000, max_interval_ms: int = 15000,
+                 flush_size: int = 200, flush_seconds: float = 5.0):
+        self.decay = decay
+        self.flag_threshold = flag_threshold
+        self.min_interval_ms = int(min_interval_ms)
+        self.max_interval_ms = int(max_interval_ms)
+        self.flush_size = max(1, int(flush_size))
+        self.flush_seconds = float(flush_seconds)
+        self._states: dict[int, _AttemptState] = {}
+        self._pending: list[dict] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    # cached per-attempt state; None if the attempt is missing or not the caller's
+    def attempt_state(self, attempt_id: int, user_id: int) -> _AttemptState | None:
+        from model import ExamAttempt
+        with self._lock:
+            state = self._states.get(attempt_id)
+        if state is None:
+            attempt = db.session.get(ExamAttempt, attempt_id)
+            if attempt is None:
+                return None
+            state = _AttemptState(attempt.student_id, float(attempt.suspicion_score or 0.0),
+                                  attempt.status == 'flagged')
+            with self._lock:
+                state = self._states.setdefault(attempt_id, state)
+        return state if state.student_id == user_id else None
+
+    def next_interval_ms(self, state: _AttemptState, flags: int) -> int:
+        if flags:
+            return self.min_interval_ms
+        ratio = min(1.0, state.score / self.flag_threshold)
+        return int(self.max_interval_ms - (self.max_interval_ms - self.min_interval_ms) * ratio)
+
+    def record(self, attempt_id: int, state: _AttemptState, result: dict) -> dict:
+        flags = verdict_flags(result)
+        weight = sum(w for bit, w in FLAG_WEIGHTS.items() if flags & bit)
+        newly_flagged = False
+        with self._lock:
+            state.score = state.score * self.decay + weight
+            state.dirty = True
+            if not state.flagged and state.score >= self.flag_threshold:
+                state.flagged = newly_flagged = True
+            self._pending.append({
+                'attempt_id': attempt_id,
+                'flags': flags,
+                'created_at': datetime.now(timezone.utc)
+            })
+            due = (newly_flagged or len(self._pending) >= self.flush_size
+                   or time.monotonic() - self._last_flush >= self.flush_seconds)
+        if due:
+            self.flush()
+        return {
+            'suspicion_score': round(state.score, 3),
+            'flagged': state.flagged,
+            'next_interval_ms': self.next_interval_ms(state, flags)
+        }
+
+    # bulk-insert buffered events and write back changed scores / flags
+    def flush(self) -> int:
+        from model import ExamAttempt, ProctoringEvent
+        with self._lock:
+            rows, self._pending = self._pending, []
+            changed = [(aid, s.score, s.flagged) for aid, s in self._states.items() if s.dirty]
+            for aid, _, _ in changed:
+                self._states[aid].dirty = False
+            self._last_flush = time.monotonic()
+        if not rows and not changed:
+            return 0
+        try:
+            if rows:
+                db.session.execute(insert(ProctoringEvent), rows)
+            for aid, score, flagged in changed:
+                db.session.execute(update(ExamAttempt).where(ExamAttempt.id == aid)
+                                   .values(suspicion_score=score))
+                if flagged:
+                    # a late batch must not re-open a completed attempt as flagged
+                    db.session.execute(update(ExamAttempt)
+                                       .where(ExamAttempt.id == aid, ExamAttempt.status == 'in_progress')
+                                       .values(status='flagged'))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Proctoring event flush error: {e}")
+            return 0
+        return len(rows)
+
+    # drop cached state once an attempt is finished
+    def forget(self, attempt_id: int) -> None:
+        with self._lock:
+            self._states.pop(attempt_id, None)
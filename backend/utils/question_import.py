@@ -0,0 +1,143 @@
+"""
+Streaming bulk import of question banks (CSV or JSON Lines).
+
+Rows are read and validated lazily, inserted into `question` with one
+executemany INSERT per chunk of IMPORT_CHUNK_SIZE rows, and each chunk's
+expected answers are embedded with a single batched encode call before the
+next chunk is read, so memory stays bounded by the chunk size however large
+the file is. Invalid rows are skipped and reported with their line numbers.
+
+Columns / keys: question_text, expected_answer, points (optional, default 10),
+scoring_policy (optional; an object in JSONL, a JSON string in CSV).
+Questions are appended after the exam's existing ones in file order.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from itertools import islice
+from typing import Iterator, NamedTuple
+
+from sqlalchemy import func, insert, select
+
+from utils.content_version import bump_version, exam_key
+from utils.database import db
+from utils.scoring_policy import ScoringPolicy
+
+FORMATS = ('csv', 'jsonl')
+MAX_REPORTED_ERRORS = 100
+
+
+class RowError(NamedTuple):
+    line: int
+    error: str
+
+
+class ImportedQuestion(NamedTuple):
+    id: int
+    expected_answer: str
+    scoring_policy: str | None
+
+
+def detect_format(filename: str | None = None, mimetype: str | None = None) -> str | None:
+    name = (filename or '').lower()
+    if name.endswith('.csv') or mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt: str) -> Iterator[tuple[int, dict | None]]:
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def validate_rows(rows) -> Iterator[dict | RowError]:
+    for line, row in rows:
+        if row is None:
+            yield RowError(line, 'not a JSON object')
+            continue
+        question_text = str(row.get('question_text') or '').strip()
+        expected_answer = str(row.get('expected_answer') or '').strip()
+        if not question_text or not expected_answer:
+            yield RowError(line, 'question_text and expected_answer are required')
+            continue
+        points = row.get('points')
+        try:
+            points = 10 if points in (None, '') else int(points)
+        except (TypeError, ValueError):
+            yield RowError(line, f"points must be an integer, got {points!r}")
+            continue
+        if points <= 0:
+            yield RowError(line, 'points must be positive')
+            continue
+        try:
+            policy = ScoringPolicy.parse(row.get('scoring_policy'))
+        except ValueError as e:
+            yield RowError(line, f"invalid scoring_policy: {e}")
+            continue
+        yield {'question_text': question_text, 'expected_answer': expected_answer, 'points': points,
+               'scoring_policy': policy.to_json() if policy else None}
+
+
+def _chunks(items, size: int):
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def import_questions(exam_id: int, stream, fmt: str, chunk_size: int = 500, embed: bool = True) -> dict:
+    from model import Question
+    from service import prewarm_expected_embeddings
+
+    order = db.session.scalar(select(func.coalesce(func.max(Question.order), 0))
+                              .where(Question.exam_id == exam_id))
+    imported = skipped = 0
+    errors: list[dict] = []
+    for chunk in _chunks(validate_rows(read_rows(stream, fmt)), max(1, int(chunk_size))):
+        values = []
+        for row in chunk:
+            if isinstance(row, RowError):
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(row._asdict())
+                continue
+            order += 1
+            values.append({**row, 'exam_id': exam_id, 'order': order})
+        if not values:
+            continue
+        inserted = db.session.execute(
+            insert(Question).returning(Question.id, Question.expected_answer, Question.scoring_policy,
+                                      sort_by_parameter_order=True),
+            values
+        ).all()
+        bump_version(exam_key(exam_id))
+        db.session.commit()
+        imported += len(inserted)
+        if embed:
+            try:
+                prewarm_expected_embeddings([ImportedQuestion(*r) for r in inserted], new=True)
+            except Exception as e:
+                print(f"Embedding prewarm error: {e}")
+
+    return {'exam_id': exam_id, 'imported': imported, 'skipped': skipped, 'errors': errors}
@@ -0,0 +1,267 @@
+"""
+Batch re-grading of finalized answers after a threshold or model change.
+
+Finalized answers are streamed by id in chunks (keyset pagination, so memory
+is bounded by the chunk size). For each chunk the scorer embeds only texts it
+has not seen before -- student answers and accepted reference answers share
+one digest-keyed LRU -- with a single encode call, then scores the chunk with
+one row-wise cosine (best match per answer when a question accepts several
+references) and re-awards points under each question's scoring policy. When a
+lexical prefilter is given, answers it decides on its own (utils.lexical_match)
+never reach the model, as in live grading, and the deciding tier is stored.
+Changed rows are written back with one bulk UPDATE per chunk; totals of the
+affected finished attempts are recomputed in SQL at the end and the exams'
+analytics summaries are dropped so they rebuild.
+
+With workers > 1 chunks are scored in a spawn-based process pool (each worker
+loads its own model); the parent keeps all database I/O. rescore_only skips
+embedding entirely and re-applies the threshold to stored similarities.
+dry_run computes the same diff without writing anything.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import delete, func, select, update
+
+from utils.database import db
+from utils.lexical_match import LexicalDecision
+from utils.scoring_policy import policy_for, reference_texts
+from utils.similarity import best_match, normalize
+
+MAX_REPORTED_DIFFS = 1000
+
+
+class AnswerRow(NamedTuple):
+    id: int
+    attempt_id: int
+    exam_id: int
+    spoken_text: str
+    expected_answer: str
+    points: int
+    scoring_policy: str | None
+    similarity_score: float | None
+    points_awarded: int | None
+    scored_by: str | None
+
+
+class ChunkScorer:
+    def __init__(self, model, cache_size: int = 50000):
+        self.model = model
+        self.cache_size = max(1, int(cache_size))
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.encoded = 0
+
+    def embed(self, texts) -> np.ndarray:
+        digests = [hashlib.sha256(t.encode('utf-8')).hexdigest() for t in texts]
+        missing = {}
+        for d, t in zip(digests, texts):
+            if d not in self._cache and d not in missing:
+                missing[d] = t
+        if missing:
+            # cached as unit vectors so scoring is a dot product
+            vectors = normalize(self.model.encode(list(missing.values()), batch_size=64))
+            self.encoded += len(missing)
+            for d, vec in zip(missing, vectors):
+                self._cache[d] = vec
+        out = np.stack([self._cache[d] for d in digests])
+        for d in digests:
+            self._cache.move_to_end(d)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return out
+
+    # best cosine similarity per (student text, reference texts) pair; empty answers score 0
+    def similarities(self, pairs) -> list[float]:
+        sims = np.zeros(len(pairs), dtype=np.float32)
+        idx = [i for i, (text, refs) in enumerate(pairs) if text.strip() and refs]
+        if idx:
+            counts = np.array([len(pairs[i][1]) for i in idx])
+            student = self.embed([pairs[i][0] for i in idx])
+            references = self.embed([r for i in idx for r in pairs[i][1]])
+            sims[idx] = best_match(student, references, counts)
+        return [float(s) for s in sims]
+
+
+_worker_scorer: ChunkScorer | None = None
+
+def _init_worker(model_name: str, cache_size: int) -> None:
+    global _worker_scorer
+    from sentence_transformers import SentenceTransformer
+    _worker_scorer = ChunkScorer(SentenceTransformer(model_name), cache_size)
+
+def _score_in_worker(pairs):
+    return _worker_scorer.similarities(pairs)
+
+
+def iter_finalized_chunks(exam_id: int | None = None, chunk_size: int = 500):
+    from model import Answer, Question
+    after_id = 0
+    while True:
+        stmt = (select(Answer.id, Answer.attempt_id, Question.exam_id, Answer.spoken_text,
+                       Question.expected_answer, Question.points, Question.scoring_policy,
+                       Answer.similarity_score, Answer.points_awarded, Answer.scored_by)
+                .join(Question, Question.id == Answer.question_id)
+                .where(Answer.finalized.is_(True), Answer.id > after_id)
+                .order_by(Answer.id).limit(chunk_size))
+        if exam_id is not None:
+            stmt = stmt.where(Question.exam_id == exam_id)
+        rows = [AnswerRow(r[0], r[1], r[2], r[3] or '', r[4] or '', int(r[5] or 0), r[6], r[7], r[8], r[9])
+                for r in db.session.execute(stmt)]
+        db.session.rollback()  # end the read transaction between chunks
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+def _policies(rows, cache: dict):
+    for r in rows:
+        if r.scoring_policy not in cache:
+            cache[r.scoring_policy] = policy_for(r)
+    return [cache[r.scoring_policy] for r in rows]
+
+
+def _pairs(rows, policies):
+    return [(r.spoken_text, reference_texts(r.expected_answer, p)) for r, p in zip(rows, policies)]
+
+
+# lexical decision per pair (None: needs SBERT), mirroring service.score_answer
+def _decide(pairs, lexical):
+    decided = []
+    for text, refs in pairs:
+        if not text.strip():
+            decided.append(LexicalDecision('empty', 0.0))
+        else:
+            decided.append(lexical.decide(text, refs) if lexical is not None else None)
+    return decided
+
+
+def _undecided(pairs, decided):
+    return [p for p, d in zip(pairs, decided) if d is None]
+
+
+# lexical results merged with the SBERT similarities of the undecided pairs, in row order
+def _merge(decided, sims):
+    sims = iter(sims)
+    merged = [(d.similarity, d.tier) if d is not None else (next(sims), 'semantic') for d in decided]
+    return [s for s, _ in merged], [t for _, t in merged]
+
+
+def _diff_chunk(rows, policies, sims, tiers, threshold: float):
+    sims = np.asarray(sims, dtype=np.float64)
+    points = np.array([r.points for r in rows])
+    awarded = np.where(sims >= threshold, points, 0)
+    # questions with a policy: one vectorized award per (policy, points) group in the chunk
+    groups: dict[tuple[int, int], list[int]] = {}
+    for i, policy in enumerate(policies):
+        if policy is not None:
+            groups.setdefault((id(policy), rows[i].points), []).append(i)
+    for (_, max_points), idx in groups.items():
+        policy = policies[idx[0]]
+        awarded[idx] = policy.award_many(sims[idx], [rows[i].spoken_text for i in idx], max_points, threshold)
+    changes = []
+    for r, sim, pts, tier in zip(rows, sims, awarded, tiers):
+        old_sim = None if r.similarity_score is None else float(r.similarity_score)
+        if (int(pts) != int(r.points_awarded or 0) or old_sim is None or abs(old_sim - sim) > 1e-6
+                or tier != r.scored_by):
+            changes.append((r, float(sim), int(pts), tier))
+    return changes
+
+
+def _apply_changes(changes) -> None:
+    from model import Answer
+    db.session.execute(update(Answer), [
+        {'id': r.id, 'similarity_score': sim, 'points_awarded': pts, 'scored_by': tier}
+        for r, sim, pts, tier in changes
+    ])
+    db.session.commit()
+
+
+def _refresh_totals(attempt_ids, exam_ids, batch: int = 500) -> None:
+    from model import Answer, ExamAttempt, ExamScoreBucket, ExamStats
+    total = (select(func.coalesce(func.sum(Answer.points_awarded), 0))
+             .where(Answer.attempt_id == ExamAttempt.id, Answer.finalized.is_(True))
+             .scalar_subquery())
+    ids = sorted(attempt_ids)
+    for i in range(0, len(ids), batch):
+        db.session.execute(update(ExamAttempt)
+                           .where(ExamAttempt.id.in_(ids[i:i + batch]), ExamAttempt.completed_at.is_not(None))
+                           .values(total_score=total))
+    if exam_ids:
+        db.session.execute(delete(ExamScoreBucket).where(ExamScoreBucket.exam_id.in_(exam_ids)))
+        db.session.execute(delete(ExamStats).where(ExamStats.exam_id.in_(exam_ids)))
+    db.session.commit()
+
+
+def regrade(model=None, model_name: str | None = None, threshold: float = 0.5, exam_id: int | None = None,
+            chunk_size: int = 500, workers: int = 1, dry_run: bool = False, rescore_only: bool = False,
+            cache_size: int = 50000, lexical=None, progress=None) -> dict:
+    summary = {'scanned': 0, 'changed': 0, 'points_delta': 0, 'attempts': 0, 'dry_run': dry_run, 'diffs': []}
+    attempt_delta: dict[int, int] = {}
+    exam_ids: set[int] = set()
+    parsed: dict = {}
+
+    def handle(rows, policies, sims, tiers):
+        changes = _diff_chunk(rows, policies, sims, tiers, threshold)
+        summary['scanned'] += len(rows)
+        summary['changed'] += len(changes)
+        for r, sim, pts, tier in changes:
+            delta = pts - int(r.points_awarded or 0)
+            summary['points_delta'] += delta
+            attempt_delta[r.attempt_id] = attempt_delta.get(r.attempt_id, 0) + delta
+            exam_ids.add(r.exam_id)
+            if len(summary['diffs']) < MAX_REPORTED_DIFFS:
+                summary['diffs'].append({
+                    'answer_id': r.id, 'attempt_id': r.attempt_id,
+                    'similarity': [r.similarity_score, round(sim, 6)],
+                    'points': [r.points_awarded, pts],
+                    'scored_by': [r.scored_by, tier]
+                })
+        if changes and not dry_run:
+            _apply_changes(changes)
+        if progress:
+            progress(summary)
+
+    chunks = iter_finalized_chunks(exam_id, chunk_size)
+    if rescore_only:
+        for rows in chunks:
+            handle(rows, _policies(rows, parsed), [float(r.similarity_score or 0.0) for r in rows],
+                   [r.scored_by for r in rows])
+    elif workers <= 1:
+        scorer = ChunkScorer(model, cache_size)
+        for rows in chunks:
+            policies = _policies(rows, parsed)
+            pairs = _pairs(rows, policies)
+            decided = _decide(pairs, lexical)
+            handle(rows, policies, *_merge(decided, scorer.similarities(_undecided(pairs, decided))))
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(model_name, cache_size)) as pool:
+            pending = {}
+            for rows in chunks:
+                policies = _policies(rows, parsed)
+                pairs = _pairs(rows, policies)
+                decided = _decide(pairs, lexical)
+                pending[pool.submit(_score_in_worker, _undecided(pairs, decided))] = (rows, policies, decided)
+                # keep at most two chunks per worker in flight
+                while len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        rows, policies, decided = pending.pop(fut)
+                        handle(rows, policies, *_merge(decided, fut.result()))
+            for fut in list(pending):
+                rows, policies, decided = pending.pop(fut)
+                handle(rows, policies, *_merge(decided, fut.result()))
+
+    summary['attempts'] = sum(1 for d in attempt_delta.values() if d)
+    if not dry_run and attempt_delta:
+        _refresh_totals(attempt_delta, exam_ids)
+    return summary
@@ -0,0 +1,59 @@
+"""
+Micro-batched SBERT scoring engine.
+
+Concurrent evaluate/submit/move-next requests hand (student answer, reference
+embeddings) pairs to one engine; each batch is encoded with a single
+SentenceTransformer.encode call and scored with one vectorized cosine step
+(utils/similarity.py, dot products of unit vectors).
+A question may accept several reference answers: its references are a
+(k, dim) matrix and the answer scores its best match, so extra references
+add rows to the same cosine step rather than extra encode calls.
+
+A score that times out (SCORING_TIMEOUT_SECONDS, e.g. under exam-start load)
+or whose batch fails raises ScoringUnavailable. It is an InferenceError, so
+routes answer 503 and the grading queue retries rather than finalizing a 0.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from utils.batching import MicroBatcher
+from utils.inference import InferenceError
+from utils.similarity import best_match, normalize
+
+
+class ScoringUnavailable(InferenceError):
+    pass
+
+
+class ScoringEngine:
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        # per-batch result buffer; only the batcher thread writes it
+        self._best = np.empty(max(1, int(max_batch_size)), dtype=np.float32)
+        self._batcher = MicroBatcher(self._score_batch, max_batch_size, max_wait_ms, name='sbert-scoring')
+
+    def _score_batch(self, items):
+        texts = [text for text, _ in items]
+        student = normalize(self.model.encode(texts, batch_size=len(texts)))
+        refs = [np.asarray(ref, dtype=np.float32).reshape(-1, student.shape[1]) for _, ref in items]
+        counts = [len(r) for r in refs]
+        # each item's best match among its reference rows
+        out = self._best[:len(items)] if len(items) <= len(self._best) else None
+        best = best_match(student, normalize(np.concatenate(refs)), counts, out=out)
+        return [float(s) for s in best]
+
+    # blocks the calling request until its batch has been scored
+    def score(self, student_answer: str, reference, timeout: float | None = None) -> float:
+        try:
+            return self._batcher((student_answer, reference), timeout=timeout)
+        except FutureTimeout:
+            raise ScoringUnavailable(f"SBERT scoring timed out after {timeout}s") from None
+        except Exception as e:
+            raise ScoringUnavailable(f"SBERT scoring failed: {e}") from e
+
+    def stats(self) -> dict:
+        return self._batcher.stats()
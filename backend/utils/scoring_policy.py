@@ -0,0 +1,177 @@
+"""
+Per-question scoring policies (Question.scoring_policy, a JSON object).
+
+    {"mode": "threshold", "threshold": 0.7}
+    {"mode": "linear", "floor": 0.4, "ceiling": 0.85}
+    {"mode": "piecewise", "steps": [[0.5, 0.25], [0.65, 0.5], [0.8, 1.0]]}
+    ... plus optionally
+    "keywords": ["photosynthesis", "chlorophyll"], "keyword_mode": "all" | "any",
+    "references": ["another accepted answer", ...]
+
+threshold : full points at or above `threshold` (default EVAL_SIMILARITY_THRESHOLD)
+linear    : credit rises linearly from 0 at `floor` to full points at `ceiling`
+piecewise : credit is the fraction of the highest step whose similarity is reached
+keywords  : must-have words/phrases; if they are missing the answer gets 0
+references: accepted answers besides Question.expected_answer; the similarity
+            is the best match over all of them, computed in one matrix pass
+
+Questions without a policy keep the original all-or-nothing rule.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MODES = ('threshold', 'linear', 'piecewise')
+KEYWORD_MODES = ('all', 'any')
+
+_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    return ' ' + _WORD.sub(' ', (text or '').lower()).strip() + ' '
+
+
+def _unit(value, name: str) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not 0.0 <= value <= 1.0:
+        raise ValueError(f"{name} must be between 0 and 1")
+    return value
+
+
+class ScoringPolicy:
+    def __init__(self, mode: str = 'threshold', threshold: float | None = None,
+                 floor: float | None = None, ceiling: float | None = None, steps=None,
+                 keywords=(), keyword_mode: str = 'all', references=()):
+        self.mode = mode
+        self.threshold = threshold
+        self.floor = floor
+        self.ceiling = ceiling
+        self.steps = tuple(steps or ())
+        self.keywords = tuple(keywords)
+        self.keyword_mode = keyword_mode
+        self.references = tuple(references)
+        self._keyword_patterns = tuple(_normalize(k) for k in self.keywords)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ScoringPolicy':
+        if not isinstance(data, dict):
+            raise ValueError('scoring_policy must be an object')
+        mode = data.get('mode', 'threshold')
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        kwargs = {'mode': mode}
+        if mode == 'threshold' and data.get('threshold') is not None:
+            kwargs['threshold'] = _unit(data['threshold'], 'threshold')
+        elif mode == 'linear':
+            floor, ceiling = _unit(data.get('floor'), 'floor'), _unit(data.get('ceiling'), 'ceiling')
+            if ceiling <= floor:
+                raise ValueError('ceiling must be greater than floor')
+            kwargs.update(floor=floor, ceiling=ceiling)
+        elif mode == 'piecewise':
+            steps = data.get('steps')
+            if not isinstance(steps, list) or not steps:
+                raise ValueError('piecewise policies need a non-empty steps list')
+            try:
+                steps = sorted((_unit(s, 'step similarity'), _unit(f, 'step credit')) for s, f in steps)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"steps must be [similarity, credit] pairs: {e}")
+            kwargs['steps'] = steps
+
+        keywords = data.get('keywords') or []
+        if not isinstance(keywords, list) or not all(isinstance(k, str) and k.strip() for k in keywords):
+            raise ValueError('keywords must be a list of non-empty strings')
+        keyword_mode = data.get('keyword_mode', 'all')
+        if keyword_mode not in KEYWORD_MODES:
+            raise ValueError(f"keyword_mode must be one of {', '.join(KEYWORD_MODES)}")
+        references = data.get('references') or []
+        if not isinstance(references, list) or not all(isinstance(r, str) and r.strip() for r in references):
+            raise ValueError('references must be a list of non-empty strings')
+        return cls(keywords=[k.strip() for k in keywords], keyword_mode=keyword_mode,
+                   references=[r.strip() for r in references], **kwargs)
+
+    # stored JSON (or an already decoded dict) -> policy; None when unset
+    @classmethod
+    def parse(cls, raw) -> 'ScoringPolicy | None':
+        if raw is None or raw == '':
+            return None
+        if isinstance(raw, ScoringPolicy):
+            return raw
+        if isinstance(raw, str):
+            try:
+                raw = json.loads(raw)
+            except ValueError:
+                raise ValueError('scoring_policy is not valid JSON')
+        return cls.from_dict(raw)
+
+    def to_dict(self) -> dict:
+        data = {'mode': self.mode}
+        if self.mode == 'threshold' and self.threshold is not None:
+            data['threshold'] = self.threshold
+        elif self.mode == 'linear':
+            data.update(floor=self.floor, ceiling=self.ceiling)
+        elif self.mode == 'piecewise':
+            data['steps'] = [list(s) for s in self.steps]
+        if self.keywords:
+            data.update(keywords=list(self.keywords), keyword_mode=self.keyword_mode)
+        if self.references:
+            data['references'] = list(self.references)
+        return data
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    # fraction of the question's points for each similarity (vectorized)
+    def credit(self, similarities, default_threshold: float) -> np.ndarray:
+        import numpy as np
+        sims = np.asarray(similarities, dtype=np.float64)
+        if self.mode == 'linear':
+            return np.clip((sims - self.floor) / (self.ceiling - self.floor), 0.0, 1.0)
+        if self.mode == 'piecewise':
+            bounds = np.array([s for s, _ in self.steps])
+            fractions = np.array([0.0] + [f for _, f in self.steps])
+            return fractions[np.searchsorted(bounds, sims, side='right')]
+        threshold = self.threshold if self.threshold is not None else default_threshold
+        return (sims >= threshold).astype(np.float64)
+
+    def keywords_present(self, text: str) -> bool:
+        if not self._keyword_patterns:
+            return True
+        normalized = _normalize(text)
+        hits = (p in normalized for p in self._keyword_patterns)
+        return all(hits) if self.keyword_mode == 'all' else any(hits)
+
+    def award_many(self, similarities, texts, max_points: int, default_threshold: float) -> np.ndarray:
+        import numpy as np
+        credit = self.credit(similarities, default_threshold)
+        if self._keyword_patterns:
+            credit = credit * np.array([self.keywords_present(t) for t in texts], dtype=np.float64)
+        return np.rint(credit * int(max_points)).astype(int)
+
+    def award(self, similarity: float, text: str, max_points: int, default_threshold: float) -> int:
+        return int(self.award_many([similarity], [text], max_points, default_threshold)[0])
+
+
+# parsed policy of a Question row; a malformed stored value falls back to the global rule
+def policy_for(question) -> ScoringPolicy | None:
+    try:
+        return ScoringPolicy.parse(getattr(question, 'scoring_policy', None))
+    except ValueError as e:
+        print(f"Ignoring invalid scoring policy on question {question.id}: {e}")
+        return None
+
+
+# accepted answers for a question: the expected answer first, then the policy's extras
+def reference_texts(expected_answer: str, policy: ScoringPolicy | None) -> tuple[str, ...]:
+    refs = [expected_answer] if expected_answer else []
+    if policy is not None:
+        refs.extend(r for r in policy.references if r not in refs)
+    return tuple(refs)
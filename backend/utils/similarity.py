@@ -0,0 +1,57 @@
+"""
+Cosine similarity kernels for float32 sentence embeddings.
+
+`normalize` scales rows to unit length once; after that a cosine is a plain
+dot product and needs no per-call validation or norm computation:
+
+    one_to_one(a, b)                   (d,), (d,)        -> float
+    one_to_many(a, refs)               (d,), (k, d)      -> (k,)
+    many_to_many(a, b)                 (n, d), (m, d)    -> (n, m)
+    paired(a, b)                       (n, d), (n, d)    -> (n,)
+    best_match(queries, refs, counts)  (n, d), (sum(counts), d) -> (n,)
+
+Inputs other than `normalize`'s must already be unit rows (zero rows stay
+zero and score 0). Every batch kernel takes an optional preallocated `out`
+array, so a hot loop can reuse one buffer instead of allocating per call.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+# unit-length rows (float32); rows of zeros are left as zeros
+def normalize(x, out: np.ndarray | None = None) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    rows = x.reshape(-1, x.shape[-1])
+    norms = np.sqrt(np.einsum('ij,ij->i', rows, rows))[:, None]
+    if out is None:
+        out = np.empty_like(x)
+    np.divide(rows, norms, out=out.reshape(rows.shape), where=norms > 0)
+    out.reshape(rows.shape)[norms[:, 0] == 0] = 0.0
+    return out
+
+
+def one_to_one(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b))
+
+
+def one_to_many(a: np.ndarray, refs: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    return np.matmul(refs, a, out=out)
+
+
+def many_to_many(a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    return np.matmul(a, b.T, out=out)
+
+
+def paired(a: np.ndarray, b: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    return np.einsum('ij,ij->i', a, b, out=out)
+
+
+# best similarity of each query against its own group of references;
+# queries[i] owns the next counts[i] (>= 1) rows of refs
+def best_match(queries: np.ndarray, refs: np.ndarray, counts, out: np.ndarray | None = None) -> np.ndarray:
+    counts = np.asarray(counts)
+    flat = paired(np.repeat(queries, counts, axis=0), refs)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.maximum.reduceat(flat, starts, out=out)
@@ -0,0 +1,286 @@
+"""
+Pluggable speech-to-text backends, selected with Config.STT_BACKEND:
+
+- 'google'      : speech_recognition + Google Web Speech API (needs network)
+- 'vosk'        : offline Kaldi models via the `vosk` package (STT_MODEL_PATH)
+- 'whisper_cpp' : offline whisper.cpp via `pywhispercpp` (STT_MODEL_PATH)
+
+Offline models are loaded once per worker process and the per-utterance
+recognizers are kept warm in a ResourcePool of STT_POOL_SIZE.
+
+With AUDIO_PREPROCESS on, recorded files go through utils/audio_preprocess.py
+first (mono, 16 kHz, silence trimmed, loudness normalised) and the backend
+only recognises the remaining speech; recordings without speech are not
+recognised at all. Streaming segments without speech are skipped as well.
+
+Every backend can also open an incremental stream fed with 16-bit mono PCM
+while the student speaks (see utils/audio_stream.py). Vosk decodes natively
+frame by frame; the other backends recognise the audio in short segments cut
+at the quietest point near each segment boundary.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import wave
+
+import numpy as np
+
+from utils.pool import ResourcePool
+
+
+class STTBackend:
+    name = 'base'
+    network = False  # recognition is a billed call to a remote API
+    passthrough = ()  # errors transcribe_file re-raises instead of reporting "no transcript"
+
+    def __init__(self, model_path: str | None = None, pool_size: int = 1, language: str = 'en-US',
+                 preprocessor=None):
+        self.model_path = model_path
+        self.language = language
+        self.preprocessor = preprocessor
+        self.pool = ResourcePool(self._create_worker, pool_size)
+
+    def _create_worker(self):
+        raise NotImplementedError
+
+    def _transcribe(self, worker, audio_file_path: str) -> str:
+        raise NotImplementedError
+
+    def _transcribe_pcm(self, worker, pcm: bytes, sample_rate: int) -> str:
+        raise NotImplementedError
+
+    def transcribe_pcm(self, pcm: bytes, sample_rate: int) -> str:
+        with self.pool.acquire() as worker:
+            return (self._transcribe_pcm(worker, pcm, sample_rate) or '').strip()
+
+    def open_stream(self, sample_rate: int = 16000, segment_seconds: float = 5.0):
+        return SegmentedSTTStream(self, sample_rate, segment_seconds)
+
+    def warm(self) -> None:
+        self.pool.warm()
+
+    # transcript ('' when the recogniser heard nothing, None on error) plus speech vs. file
+    # duration (stats are None without preprocessing)
+    def transcribe_file(self, audio_file_path: str):
+        stats = None
+        try:
+            if self.preprocessor is None:
+                with self.pool.acquire() as worker:
+                    text = self._transcribe(worker, audio_file_path)
+            else:
+                audio = self.preprocessor.load(audio_file_path)
+                stats = audio.stats
+                if not audio.pcm:
+                    return '', stats
+                with self.pool.acquire() as worker:
+                    text = self._transcribe_pcm(worker, audio.pcm, audio.sample_rate)
+            return (text or '').strip(), stats
+        except self.passthrough:
+            raise
+        except Exception as e:
+            print(f"Speech recognition error ({self.name}): {e}")
+            return None, stats
+
+    def transcribe(self, audio_file_path: str) -> str | None:
+        return self.transcribe_file(audio_file_path)[0]
+
+
+class GoogleSTTBackend(STTBackend):
+    name = 'google'
+    network = True
+
+    def _create_worker(self):
+        import speech_recognition as sr
+        return sr.Recognizer()
+
+    def _transcribe(self, recognizer, audio_file_path):
+        import speech_recognition as sr
+        with sr.AudioFile(audio_file_path) as source:
+            audio = recognizer.record(source)
+        return recognizer.recognize_google(audio, language=self.language)
+
+    def _transcribe_pcm(self, recognizer, pcm, sample_rate):
+        import speech_recognition as sr
+        try:
+            return recognizer.recognize_google(sr.AudioData(pcm, sample_rate, 2), language=self.language)
+        except sr.UnknownValueError:
+            return ''  # silence or unintelligible segment
+
+
+class VoskSTTBackend(STTBackend):
+    name = 'vosk'
+
+    def __init__(self, model_path=None, pool_size=1, language='en-US', preprocessor=None):
+        super().__init__(model_path, pool_size, language, preprocessor)
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def _get_model(self):
+        # vosk.Model is read-only after load and shared by all recognizers
+        with self._model_lock:
+            if self._model is None:
+                import vosk
+                if not self.model_path:
+                    raise RuntimeError('STT_MODEL_PATH is required for the vosk backend')
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path)
+        return self._model
+
+    def _create_worker(self):
+        return {}  # sample rate -> KaldiRecognizer
+
+    def _recognizer(self, worker, sample_rate):
+        import vosk
+        rec = worker.get(sample_rate)
+        if rec is None:
+            rec = worker[sample_rate] = vosk.KaldiRecognizer(self._get_model(), sample_rate)
+        return rec
+
+    def warm(self):
+        self._get_model()
+        super().warm()
+
+    def _transcribe(self, worker, audio_file_path):
+        with wave.open(audio_file_path, 'rb') as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                raise ValueError('vosk backend expects mono 16-bit PCM WAV')
+            rec = self._recognizer(worker, wf.getframerate())
+            rec.Reset()
+            while True:
+                data = wf.readframes(4000)
+                if not data:
+                    break
+                rec.AcceptWaveform(data)
+        return json.loads(rec.FinalResult()).get('text', '')
+
+    def _transcribe_pcm(self, worker, pcm, sample_rate):
+        rec = self._recognizer(worker, sample_rate)
+        rec.Reset()
+        rec.AcceptWaveform(pcm)
+        return json.loads(rec.FinalResult()).get('text', '')
+
+    def open_stream(self, sample_rate=16000, segment_seconds=5.0):
+        import vosk
+        # a stream owns its recognizer for the whole answer, so it is not taken from the pool
+        return VoskSTTStream(vosk.KaldiRecognizer(self._get_model(), sample_rate))
+
+
+class WhisperCppSTTBackend(STTBackend):
+    name = 'whisper_cpp'
+
+    def _create_worker(self):
+        # each whisper.cpp context is single-threaded, so the pool holds one per slot
+        from pywhispercpp.model import Model
+        if not self.model_path:
+            raise RuntimeError('STT_MODEL_PATH is required for the whisper_cpp backend')
+        return Model(self.model_path, language=self.language.split('-')[0])
+
+    def _transcribe(self, model, audio_file_path):
+        segments = model.transcribe(audio_file_path)
+        return ' '.join(seg.text.strip() for seg in segments)
+
+    def _transcribe_pcm(self, model, pcm, sample_rate):
+        if sample_rate != 16000:
+            raise ValueError('whisper_cpp backend expects 16 kHz PCM')
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments = model.transcribe(samples)
+        return ' '.join(seg.text.strip() for seg in segments)
+
+
+class SegmentedSTTStream:
+    def __init__(self, backend: STTBackend, sample_rate: int, segment_seconds: float):
+        self.backend = backend
+        self.sample_rate = int(sample_rate)
+        self.segment_bytes = max(2, int(self.sample_rate * segment_seconds)) * 2
+        self._pending = bytearray()
+        self._segments: list[str] = []
+
+    @property
+    def text(self) -> str:
+        return ' '.join(s for s in self._segments if s)
+
+    # cut at the lowest-energy 20 ms frame in the tail (last second, at most half) of the segment
+    def _split_point(self, pcm: bytes) -> int:
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        frame = max(1, self.sample_rate // 50)
+        window = samples[len(samples) - min(self.sample_rate, len(samples) // 2):]
+        n_frames = len(window) // frame
+        if n_frames < 2:
+            return len(pcm)
+        energy = (window[:n_frames * frame].reshape(n_frames, frame) ** 2).mean(axis=1)
+        quietest = int(np.argmin(energy))
+        offset = len(samples) - len(window) + quietest * frame
+        return max(2, offset * 2)
+
+    def _recognise(self, pcm: bytes) -> None:
+        preprocessor = self.backend.preprocessor
+        if preprocessor is not None and not preprocessor.has_speech(pcm, self.sample_rate):
+            return
+        try:
+            self._segments.append(self.backend.transcribe_pcm(pcm, self.sample_rate))
+        except Exception as e:
+            print(f"Streaming recognition error ({self.backend.name}): {e}")
+
+    def feed(self, pcm: bytes) -> str:
+        self._pending.extend(pcm)
+        while len(self._pending) >= self.segment_bytes:
+            cut = self._split_point(bytes(self._pending[:self.segment_bytes]))
+            self._recognise(bytes(self._pending[:cut]))
+            del self._pending[:cut]
+        return self.text
+
+    def finish(self) -> str:
+        if len(self._pending) >= 2:
+            self._recognise(bytes(self._pending[:len(self._pending) // 2 * 2]))
+        self._pending.clear()
+        return self.text
+
+
+class VoskSTTStream:
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self._segments: list[str] = []
+        self._partial = ''
+
+    @property
+    def text(self) -> str:
+        return ' '.join(s for s in self._segments + [self._partial] if s)
+
+    def feed(self, pcm: bytes) -> str:
+        if self.recognizer.AcceptWaveform(pcm):
+            self._segments.append(json.loads(self.recognizer.Result()).get('text', ''))
+            self._partial = ''
+        else:
+            self._partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        return self.text
+
+    def finish(self) -> str:
+        self._segments.append(json.loads(self.recognizer.FinalResult()).get('text', ''))
+        self._partial = ''
+        return self.text
+
+
+STT_BACKENDS = {
+    GoogleSTTBackend.name: GoogleSTTBackend,
+    VoskSTTBackend.name: VoskSTTBackend,
+    WhisperCppSTTBackend.name: WhisperCppSTTBackend,
+}
+
+
+def create_stt_backend(config) -> STTBackend:
+    name = config.get('STT_BACKEND', 'google')
+    backend_cls = STT_BACKENDS.get(name)
+    if backend_cls is None:
+        raise ValueError(f"Unknown STT_BACKEND '{name}' (choose from {', '.join(STT_BACKENDS)})")
+    preprocessor = None
+    if config.get('AUDIO_PREPROCESS', True):
+        from utils.audio_preprocess import AudioPreprocessor
+        preprocessor = AudioPreprocessor.from_config(config)
+    return backend_cls(
+        model_path=config.get('STT_MODEL_PATH'),
+        pool_size=config.get('STT_POOL_SIZE', 1),
+        language=config.get('STT_LANGUAGE', 'en-US'),
+        preprocessor=preprocessor
+    )
@@ -0,0 +1,82 @@
+"""
+In-process LRU cache of verified JWT claims.
+
+Entries are keyed by the SHA-256 digest of the raw token (the token itself is
+never stored) and expire after TOKEN_CACHE_TTL_SECONDS or at the token's own
+`exp`, whichever comes first. Revoked token ids (`jti`) are remembered until
+their tokens expire, so a revoked token is rejected by this process at once;
+other worker processes see the revocation (RevokedToken table) once their
+cached entry for the token expires.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256((token or '').encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        # digest -> (claims, expires_at as epoch seconds)
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._revoked: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] <= now or entry[0].get('jti') in self._revoked:
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, digest: str, claims: dict) -> None:
+        expires_at = min(time.time() + self.ttl, float(claims.get('exp') or 0))
+        with self._lock:
+            self._entries[digest] = (claims, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, jti: str | None) -> bool:
+        if not jti:
+            return False
+        with self._lock:
+            return jti in self._revoked
+
+    # remember a revoked token id until the token would have expired anyway
+    def revoke(self, jti: str, exp: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._revoked[jti] = float(exp)
+            for key in [k for k, v in self._revoked.items() if v <= now]:
+                del self._revoked[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'revoked': len(self._revoked),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,312 @@
+"""
+Write-coalescing buffer for /transcript/append.
+
+Recognised fragments are kept per (attempt, question) and flushed to
+Answer.spoken_text in one UPDATE once TRANSCRIPT_FLUSH_MAX_FRAGMENTS have
+accumulated or the oldest pending fragment is TRANSCRIPT_FLUSH_INTERVAL_MS old
+(a background thread handles quiet answers). The UPDATE appends in SQL
+(spoken_text || ' ' || :chunk), so it never rewrites text another worker added.
+Readers (move-next, evaluate-answer) call flush() first. The buffer is per
+process, so fragments another worker still holds can reach the database after
+the answer was graded; they are appended to Answer.late_text (and logged)
+rather than dropped, leaving the graded transcript as it was scored.
+
+Journal records carry a per-process sequence number, and a flush marker names
+the last fragment it wrote, so fragments journaled while a flush was in flight
+are still replayed. Each journal is named after the pid plus a random suffix
+and held under an exclusive flock while its process lives (where fcntl
+exists; elsewhere the pid is probed). Once a journal outgrows
+TRANSCRIPT_JOURNAL_COMPACT_BYTES it is rewritten with only the fragments that
+are still pending.
+
+TRANSCRIPT_DURABILITY picks the guarantee:
+- 'sync'    : every fragment is committed before the response (old behaviour)
+- 'journal' : fragments are appended to a per-process journal file before the
+              response; journals left behind by dead processes are replayed on
+              startup. With TRANSCRIPT_JOURNAL_FSYNC every record is fsynced, so
+              they also survive a machine crash, not just a process crash
+- 'memory'  : fragments live only in memory until flushed; a crash loses at
+              most one flush interval
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, update
+
+from utils.database import db
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to probing the pid in the file name
+    fcntl = None
+
+DURABILITY_MODES = ('sync', 'journal', 'memory')
+
+
+def _join(base: str, fragments) -> str:
+    return ' '.join(p for p in [base or '', *fragments] if p).strip()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _try_lock(f) -> bool:
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+# True when the process that wrote the journal has exited
+def _owner_gone(path: str, f) -> bool:
+    if fcntl is not None:
+        return _try_lock(f)
+    try:
+        pid = int(os.path.basename(path)[len('transcript-'):-len('.journal')].split('-')[0])
+    except ValueError:
+        return False
+    return pid != os.getpid() and not _pid_alive(pid)
+
+
+# fragments of each answer that no flush marker covers
+def _unflushed(lines) -> dict[int, list[str]]:
+    pending: dict[int, list[tuple[int, str]]] = {}
+    for line in lines:
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue  # torn final line
+        answer_id, flushed = rec.get('answer_id'), rec.get('flushed')
+        if flushed is True:  # marker written before sequence numbers
+            pending.pop(answer_id, None)
+        elif flushed is not None:
+            pending[answer_id] = [(seq, text) for seq, text in pending.get(answer_id, ()) if seq > flushed]
+        else:
+            pending.setdefault(answer_id, []).append((rec.get('seq', 0), rec['text']))
+    return {answer_id: [text for _, text in frs] for answer_id, frs in pending.items() if frs}
+
+
+class _Entry:
+    __slots__ = ('answer_id', 'base', 'pending', 'seqs', 'since', 'flush_lock')
+
+    def __init__(self, answer_id: int, base: str):
+        self.answer_id = answer_id
+        self.base = base or ''
+        self.pending: list[str] = []
+        self.seqs: list[int] = []  # journal sequence number of each pending fragment
+        self.since = 0.0
+        # one writer per answer so fragments are neither duplicated nor reordered
+        self.flush_lock = threading.Lock()
+
+
+class _Journal:
+    def __init__(self, directory: str, fsync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        # the random suffix keeps a recycled pid from appending to a dead process's journal
+        self.path = os.path.join(directory, f"transcript-{os.getpid()}-{uuid.uuid4().hex[:12]}.journal")
+        self._lock = threading.Lock()
+        self._file = self._publish([])
+
+    # write under a temporary name, lock, then rename into place, so no other
+    # process ever sees the journal unlocked
+    def _publish(self, records):
+        tmp = os.path.join(self.directory, f".{os.path.basename(self.path)}.tmp")
+        f = open(tmp, 'w', encoding='utf-8')
+        if fcntl is not None:
+            _try_lock(f)
+        f.writelines(json.dumps(rec, separators=(',', ':')) + '\n' for rec in records)
+        self._sync(f)
+        os.replace(tmp, self.path)
+        return f
+
+    def _sync(self, f) -> None:
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def write(self, record: dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self._sync(self._file)
+
+    def size(self) -> int:
+        with self._lock:
+            return self._file.tell()
+
+    # replace the journal with just these records
+    def rewrite(self, records) -> None:
+        with self._lock:
+            old, self._file = self._file, self._publish(records)
+            old.close()
+
+    # unflushed fragments from journals of processes that died; the caller
+    # removes each path before asking for the next one
+    def orphaned(self):
+        for path in glob.glob(os.path.join(self.directory, 'transcript-*.journal')):
+            if path == self.path:
+                continue
+            try:
+                f = open(path, encoding='utf-8')
+            except FileNotFoundError:
+                continue  # replayed by another process
+            with f:
+                if _owner_gone(path, f):
+                    yield path, _unflushed(f)
+
+
+class TranscriptBuffer:
+    def __init__(self, app, durability: str = 'memory', flush_interval_ms: float = 2000,
+                 flush_max_fragments: int = 8, journal_dir: str | None = None,
+                 journal_compact_bytes: int = 1 << 20, journal_fsync: bool = True):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"TRANSCRIPT_DURABILITY must be one of {', '.join(DURABILITY_MODES)}")
+        self.app = app
+        self.durability = durability
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.flush_max_fragments = max(1, int(flush_max_fragments))
+        self.journal_compact_bytes = max(0, int(journal_compact_bytes))
+        self._entries: dict[tuple[int, int], _Entry] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._journal = _Journal(journal_dir, journal_fsync) if durability == 'journal' else None
+        if durability != 'sync':
+            self._thread = threading.Thread(target=self._flush_loop, name='transcript-flush', daemon=True)
+            self._thread.start()
+
+    def append(self, attempt_id: int, question_id: int, answer, text: str) -> str:
+        key = (int(attempt_id), int(question_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.answer_id != answer.id:
+                entry = self._entries[key] = _Entry(answer.id, answer.spoken_text)
+            if not entry.pending:
+                entry.since = time.monotonic()
+            self._seq += 1
+            entry.pending.append(text)
+            entry.seqs.append(self._seq)
+            current = _join(entry.base, entry.pending)
+            due = (self.durability == 'sync' or len(entry.pending) >= self.flush_max_fragments)
+            # under the lock so compaction never drops a fragment that is not journaled yet
+            if self._journal is not None:
+                self._journal.write({'answer_id': answer.id, 'seq': self._seq, 'text': text})
+        if due:
+            self.flush(attempt_id, question_id)
+        return current
+
+    # write the entry's pending fragments; they stay pending if the write fails
+    def _flush_key(self, key) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        with entry.flush_lock:
+            with self._lock:
+                taken = list(entry.pending)
+            if not taken:
+                return
+            try:
+                self._write(entry.answer_id, _join('', taken))
+            except Exception:
+                db.session.rollback()
+                raise
+            with self._lock:
+                entry.base = _join(entry.base, taken)
+                last = entry.seqs[len(taken) - 1]
+                del entry.pending[:len(taken)]
+                del entry.seqs[:len(taken)]
+                entry.since = time.monotonic()
+                if self._journal is not None:
+                    self._journal.write({'answer_id': entry.answer_id, 'flushed': last})
+
+    def _write(self, answer_id: int, chunk: str) -> None:
+        if not chunk:
+            return
+        from model import Answer
+        written = db.session.execute(
+            update(Answer)
+            .where(Answer.id == answer_id)
+            .where(Answer.finalized.is_not(True))
+            .values(spoken_text=func.trim(func.coalesce(Answer.spoken_text, '') + ' ' + chunk))
+        ).rowcount
+        if not written:
+            # graded before this worker flushed (move-next ran on another worker)
+            late = db.session.execute(
+                update(Answer)
+                .where(Answer.id == answer_id)
+                .values(late_text=func.trim(func.coalesce(Answer.late_text, '') + ' ' + chunk))
+            ).rowcount
+            if late:
+                print(f"Transcript fragments for answer {answer_id} arrived after grading; kept in late_text")
+        db.session.commit()
+
+    # write pending fragments for one answer; discard=True also forgets the entry
+    def flush(self, attempt_id: int, question_id: int, discard: bool = False) -> None:
+        self._flush_key((int(attempt_id), int(question_id)))
+        if discard:
+            self.discard(attempt_id, question_id)
+
+    def discard(self, attempt_id: int, question_id: int) -> None:
+        with self._lock:
+            self._entries.pop((int(attempt_id), int(question_id)), None)
+
+    def flush_due(self, force: bool = False) -> int:
+        cutoff = time.monotonic() - self.flush_interval
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e.pending and (force or e.since <= cutoff)]
+        for key in keys:
+            self._flush_key(key)
+        return len(keys)
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(max(0.05, self.flush_interval / 2))
+            with self.app.app_context():
+                try:
+                    self.flush_due()
+                    self.compact_journal()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Transcript flush error: {e}")
+
+    # rewrite the journal with only the pending fragments once it outgrows journal_compact_bytes
+    def compact_journal(self, force: bool = False) -> bool:
+        if self._journal is None:
+            return False
+        with self._lock:
+            if not force and self._journal.size() < self.journal_compact_bytes:
+                return False
+            records = sorted(
+                ({'answer_id': e.answer_id, 'seq': seq, 'text': text}
+                 for e in self._entries.values() for seq, text in zip(e.seqs, e.pending)),
+                key=lambda rec: rec['seq'])
+            self._journal.rewrite(records)
+        return True
+
+    # apply fragments journaled by processes that exited before flushing
+    def replay_journals(self) -> int:
+        if self._journal is None:
+            return 0
+        replayed = 0
+        for path, pending in self._journal.orphaned():
+            for answer_id, fragments in pending.items():
+                self._write(answer_id, _join('', fragments))
+                replayed += 1
+            os.remove(path)
+        return replayed
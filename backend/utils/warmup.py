@@ -0,0 +1,117 @@
+"""
+Startup warm-up and readiness, selected with Config.STARTUP_WARMUP:
+
+- 'none'       : every model loads lazily on first use
+- 'preload'    : load the STT models (with STT_PRELOAD) and face-detection
+                 nets without running them; SBERT still loads on first use
+- 'eager'      : also load SBERT, and push one dummy input through every model
+                 before create_app returns, so the first graded answer,
+                 transcript or frame does not pay a cold start
+- 'background' : the eager warm-up on a daemon thread; /healthz answers 503
+                 until it finishes so a load balancer holds traffic back
+
+/healthz also answers 503 while any warm-up step has failed.
+
+Only models used by the registered blueprints (APP_BLUEPRINTS) are touched,
+so an auth-only pod loads none.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+MODES = ('none', 'preload', 'eager', 'background')
+
+# blueprint -> models its routes use
+BLUEPRINT_MODELS = {
+    'exam': ('sbert',),
+    'answer': ('sbert', 'stt'),
+    'transcript': ('stt',),
+    'proctoring': ('proctoring',),
+}
+
+_DUMMY_TEXT = 'warm-up'
+_DUMMY_PCM_SECONDS = 0.5
+
+
+class Warmup:
+    def __init__(self, app, mode: str = 'preload', blueprints=()):
+        if mode not in MODES:
+            raise ValueError(f"Unknown STARTUP_WARMUP '{mode}' (choose from {', '.join(MODES)})")
+        self.app = app
+        self.mode = mode
+        self.blueprints = tuple(blueprints)
+        self.models = [m for m in ('sbert', 'stt', 'proctoring')
+                       if any(m in BLUEPRINT_MODELS.get(bp, ()) for bp in self.blueprints)]
+        self.results: dict[str, dict] = {}
+        self.started = time.time()
+        self._ready = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    # models whose warm-up raised; a pod with any of these is not ready
+    @property
+    def failed(self) -> list[str]:
+        return [name for name, result in self.results.items() if 'error' in result]
+
+    def start(self) -> None:
+        if self.mode == 'background':
+            threading.Thread(target=self._run, name='startup-warmup', daemon=True).start()
+        else:
+            self._run()
+
+    def _run(self) -> None:
+        if self.mode != 'none':
+            dummy = self.mode != 'preload'
+            with self.app.app_context():
+                for name in self.models:
+                    if name == 'sbert' and not dummy:
+                        continue
+                    if name == 'stt' and not self.app.config['STT_PRELOAD']:
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        getattr(self, f"_warm_{name}")(dummy)
+                        self.results[name] = {'ms': round((time.perf_counter() - start) * 1000.0, 1)}
+                    except Exception as e:
+                        print(f"{name} warm-up error: {e}")
+                        self.results[name] = {'error': str(e)}
+        self._ready.set()
+
+    def _warm_sbert(self, dummy: bool) -> None:
+        from service import _get_scoring_engine
+        engine = _get_scoring_engine()
+        if engine is None:
+            raise RuntimeError('SBERT model not loaded')
+        # one encode + cosine through the micro-batcher
+        engine.score(_DUMMY_TEXT, engine.model.encode([_DUMMY_TEXT]),
+                     timeout=self.app.config['SCORING_TIMEOUT_SECONDS'])
+
+    def _warm_stt(self, dummy: bool) -> None:
+        from service import get_stt_backend
+        backend = get_stt_backend()
+        backend.warm()
+        # silence through an offline recogniser; a cloud backend would bill the request
+        if dummy and not backend.network:
+            backend.transcribe_pcm(bytes(2 * int(16000 * _DUMMY_PCM_SECONDS)), 16000)
+
+    def _warm_proctoring(self, dummy: bool) -> None:
+        from service import get_proctoring_engine, warm_proctoring
+        if not warm_proctoring():
+            raise RuntimeError('Face detection model not loaded')
+        engine = get_proctoring_engine()
+        if dummy and hasattr(engine, 'analyze'):
+            import numpy as np
+            engine.analyze(np.zeros((300, 300, 3), dtype=np.uint8))
+
+    def status(self) -> dict:
+        return {
+            'status': 'failed' if self.failed else 'ready' if self.ready else 'warming',
+            'warmup': self.mode,
+            'blueprints': list(self.blueprints),
+            'models': dict(self.results),
+            'uptime_seconds': round(time.time() - self.started, 1)
+        }